@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 
 from WechatAPI.errors import *
+from WechatAPI.http_pool import HttpSessionPool
 
 
 @dataclass
@@ -56,9 +57,16 @@ class WechatAPIClientBase:
 
         self.ignore_protect = False
 
+        # 所有接口共用的连接池，bot_core 启动时会按配置替换
+        self.http_pool = HttpSessionPool()
+
         # 调用所有 Mixin 的初始化方法
         super().__init__()
 
+    async def close(self):
+        """关闭客户端的网络连接"""
+        await self.http_pool.close()
+
     @staticmethod
     def error_handler(json_resp):
         """处理API响应中的错误码
@@ -19,7 +19,7 @@ class HongBaoMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
+        async with self.http_pool.session() as session:
             json_param = {"Wxid": self.wxid, "Xml": xml, "EncryptKey": encrypt_key, "EncryptUserinfo": encrypt_userinfo,"InWay": "1"}
             response = await session.post(f'http://{self.ip}:{self.port}/VXAPI/TenPay/Receivewxhb', json=json_param)
             json_resp = await response.json()
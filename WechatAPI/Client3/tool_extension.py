@@ -5,7 +5,8 @@ from ..errors import UserLoggedOut
 from loguru import logger
 
 class ToolExtensionMixin(WechatAPIClientBase):
-    async def get_msg_image(self, msg_id: str, to_wxid: str = None, data_len: int = 0, start_pos: int = 0) -> bytes:
+    async def get_msg_image(self, msg_id: str, to_wxid: str = None, data_len: int = 0, start_pos: int = 0,
+                            chunk_size: int = 64 * 1024) -> bytes:
         """获取消息中的图片内容。
 
         Args:
@@ -13,6 +14,7 @@ class ToolExtensionMixin(WechatAPIClientBase):
             to_wxid (str, optional): 接收人的wxid，如果不提供则使用自己的wxid
             data_len (int, optional): 图片大小，从图片XML中获取
             start_pos (int, optional): 开始位置，用于分段下载
+            chunk_size (int, optional): 本段最大长度，默认64KB
 
         Returns:
             bytes: 图片的二进制数据
@@ -29,14 +31,13 @@ class ToolExtensionMixin(WechatAPIClientBase):
             to_wxid = self.wxid
 
         # 计算当前段的大小
-        chunk_size = 64 * 1024  # 64KB
         current_chunk_size = min(chunk_size, data_len - start_pos)
 
         if current_chunk_size <= 0:
             logger.warning(f"无效的分段下载参数: start_pos={start_pos}, data_len={data_len}")
             return b""
 
-        async with aiohttp.ClientSession() as session:
+        async with self.http_pool.session() as session:
             # 根据提供的API文档构造请求参数
             json_param = {
                 "Wxid": self.wxid,
@@ -57,7 +58,7 @@ class ToolExtensionMixin(WechatAPIClientBase):
                 json_resp = await response.json()
 
                 if json_resp.get("Success"):
-                    logger.info(f"获取消息图片分段成功: MsgId={msg_id}, StartPos={start_pos}, ChunkSize={current_chunk_size}")
+                    logger.debug(f"获取消息图片分段成功: MsgId={msg_id}, StartPos={start_pos}, ChunkSize={current_chunk_size}")
                     # 尝试从不同的响应格式中获取图片数据
                     data = json_resp.get("Data")
 
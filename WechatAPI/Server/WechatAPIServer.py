@@ -57,12 +57,10 @@ class WechatAPIServer:
             self.error_log_process.join()
 
     def process_stdout_to_log(self):
+        from utils.bot_status import bot_status_registry
+
         # 二维码URL正则表达式 - 更新匹配模式
         qrcode_pattern = re.compile(r'获取到登录二维码: (https?://[^\s]+)')
-        # 修复路径 - 确保使用统一路径
-        root_path = pathlib.Path(os.path.dirname(os.path.abspath(__file__))).parent.parent
-        admin_status_path = root_path / "admin" / "bot_status.json"
-        root_status_path = root_path / "bot_status.json"
 
         while True:
             line = self.process.stdout.readline()
@@ -79,42 +77,15 @@ class WechatAPIServer:
                 qrcode_url = qrcode_match.group(1)
                 logger.success(f"获取到登录二维码: {qrcode_url}")
                 
-                # 更新状态文件
+                # 更新bot状态
                 try:
-                    status_data = {
-                        "status": "waiting_login",
-                        "details": "等待微信扫码登录",
-                        "timestamp": time.time(),
+                    bot_status_registry.update("waiting_login", "等待微信扫码登录", {
                         "qrcode_url": qrcode_url,
                         "expires_in": 240  # 默认240秒过期
-                    }
-                    
-                    # 如果状态文件已存在，则保留原有字段
-                    if admin_status_path.exists():
-                        with open(admin_status_path, "r", encoding="utf-8") as f:
-                            try:
-                                old_status = json.load(f)
-                                # 保留其他字段
-                                for key, value in old_status.items():
-                                    if key not in status_data:
-                                        status_data[key] = value
-                            except:
-                                pass
-                    
-                    # 确保目录存在
-                    admin_status_path.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    # 写入管理后台状态文件
-                    with open(admin_status_path, "w", encoding="utf-8") as f:
-                        json.dump(status_data, f)
-                    
-                    # 同时更新根目录的状态文件，以便所有其他模块能够访问
-                    with open(root_status_path, "w", encoding="utf-8") as f:
-                        json.dump(status_data, f)
-                    
-                    logger.success("已更新二维码URL到状态文件")
+                    })
+                    logger.success("已更新二维码URL到bot状态")
                 except Exception as e:
-                    logger.error(f"更新二维码状态文件失败: {e}")
+                    logger.error(f"更新二维码状态失败: {e}")
 
         # 检查进程是否异常退出
         return_code = self.process.poll()
@@ -122,18 +93,10 @@ class WechatAPIServer:
             logger.error("WechatAPI服务器异常退出，退出码: {}", return_code)
 
     def process_stderr_to_log(self):
-        import re
-        import json
-        import os
-        from pathlib import Path
-        import time
+        from utils.bot_status import bot_status_registry
 
         # 二维码URL正则表达式 - 更新匹配模式
         qrcode_pattern = re.compile(r'获取到登录二维码: (https?://[^\s]+)')
-        # 修复路径 - 确保使用统一路径
-        root_path = Path(os.path.dirname(os.path.abspath(__file__))).parent.parent
-        admin_status_path = root_path / "admin" / "bot_status.json"
-        root_status_path = root_path / "bot_status.json"
 
         while True:
             line = self.process.stderr.readline()
@@ -150,39 +113,12 @@ class WechatAPIServer:
                 qrcode_url = qrcode_match.group(1)
                 logger.success(f"获取到登录二维码: {qrcode_url}")
                 
-                # 更新状态文件
+                # 更新bot状态
                 try:
-                    status_data = {
-                        "status": "waiting_login",
-                        "details": "等待微信扫码登录",
-                        "timestamp": time.time(),
+                    bot_status_registry.update("waiting_login", "等待微信扫码登录", {
                         "qrcode_url": qrcode_url,
                         "expires_in": 240  # 默认240秒过期
-                    }
-                    
-                    # 如果状态文件已存在，则保留原有字段
-                    if admin_status_path.exists():
-                        with open(admin_status_path, "r", encoding="utf-8") as f:
-                            try:
-                                old_status = json.load(f)
-                                # 保留其他字段
-                                for key, value in old_status.items():
-                                    if key not in status_data:
-                                        status_data[key] = value
-                            except:
-                                pass
-                    
-                    # 确保目录存在
-                    admin_status_path.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    # 写入管理后台状态文件
-                    with open(admin_status_path, "w", encoding="utf-8") as f:
-                        json.dump(status_data, f)
-                    
-                    # 同时更新根目录的状态文件，以便所有其他模块能够访问
-                    with open(root_status_path, "w", encoding="utf-8") as f:
-                        json.dump(status_data, f)
-                    
-                    logger.success("已更新二维码URL到状态文件")
+                    })
+                    logger.success("已更新二维码URL到bot状态")
                 except Exception as e:
-                    logger.error(f"更新二维码状态文件失败: {e}")
\ No newline at end of file
+                    logger.error(f"更新二维码状态失败: {e}")
\ No newline at end of file
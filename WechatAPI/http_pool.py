@@ -0,0 +1,125 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+import aiohttp
+from loguru import logger
+
+
+class HttpSessionPool:
+    """客户端共用的 aiohttp 会话（连接池）
+
+    原来每次调用接口都新建一个 ClientSession，每个请求都要重新建立到协议服务的连接。
+    现在同一个事件循环内的所有请求共用一个会话，连接保持 keep-alive 复用。
+    aiohttp 的会话不能跨事件循环使用，管理后台等运行在其他线程的事件循环会各自创建一个会话。
+    """
+
+    def __init__(self,
+                 limit: int = 100,
+                 limit_per_host: int = 0,
+                 keepalive_timeout: float = 30.0,
+                 connect_timeout: float = 10.0,
+                 total_timeout: float = 300.0):
+        self.limit = int(limit)
+        self.limit_per_host = int(limit_per_host)
+        self.keepalive_timeout = float(keepalive_timeout)
+        self.connect_timeout = float(connect_timeout)
+        self.total_timeout = float(total_timeout)
+
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    @classmethod
+    def from_config(cls, config: dict) -> "HttpSessionPool":
+        """根据 main_config.toml 的 [HttpPool] 配置创建连接池"""
+        pool_config = config.get("HttpPool", {})
+        return cls(
+            limit=pool_config.get("limit", 100),
+            limit_per_host=pool_config.get("limit-per-host", 0),
+            keepalive_timeout=pool_config.get("keepalive-timeout", 30.0),
+            connect_timeout=pool_config.get("connect-timeout", 10.0),
+            total_timeout=pool_config.get("total-timeout", 300.0),
+        )
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self.requests += 1
+
+        async def on_connection_create_end(session, context, params):
+            self.connections_created += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.connections_reused += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """获取当前事件循环的会话，不存在或已关闭时创建"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            # 顺便清理已经结束的事件循环留下的会话
+            for old_loop in [l for l in self._sessions if l.is_closed()]:
+                del self._sessions[old_loop]
+
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=self.total_timeout or None,
+                connect=self.connect_timeout or None,
+            )
+            session = aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                            trace_configs=[self._trace_config()])
+            self._sessions[loop] = session
+        return session
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[aiohttp.ClientSession]:
+        """用法和 aiohttp.ClientSession() 一样，但退出时不关闭会话
+
+        Example:
+            async with self.http_pool.session() as session:
+                response = await session.post(url, json=json_param)
+        """
+        yield self.get_session()
+
+    async def close(self):
+        """关闭所有会话，机器人退出时调用"""
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+
+        sessions, self._sessions = self._sessions, {}
+        for loop, session in sessions.items():
+            if session.closed:
+                continue
+            if loop is current_loop:
+                await session.close()
+            elif loop.is_running():
+                asyncio.run_coroutine_threadsafe(session.close(), loop)
+            else:
+                logger.debug("事件循环已停止，跳过关闭其会话")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池统计"""
+        return {
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "keepalive_timeout": self.keepalive_timeout,
+            "sessions": sum(1 for session in list(self._sessions.values()) if not session.closed),
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+        }
@@ -0,0 +1,318 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from loguru import logger
+
+from utils.metrics import LatencyWindow
+
+# 发送优先级通道，数值越小越优先
+LANE_INTERACTIVE = "interactive"  # 对收到消息的回复
+LANE_PUSH = "push"                # 插件主动推送（定时任务等）
+LANE_BULK = "bulk"                # 批量发送、广播
+LANES = (LANE_INTERACTIVE, LANE_PUSH, LANE_BULK)
+
+# 当前上下文中发送消息使用的通道，没有设置时视为插件推送
+send_lane: ContextVar[str] = ContextVar("send_lane", default=LANE_PUSH)
+
+
+@contextmanager
+def use_send_lane(lane: str):
+    """在 with 块内发送的消息使用指定通道
+
+    Example:
+        with use_send_lane(LANE_BULK):
+            for wxid in wxids:
+                await bot.send_text_message(wxid, "通知")
+    """
+    token = send_lane.set(lane)
+    try:
+        yield
+    finally:
+        send_lane.reset(token)
+
+
+class TokenBucket:
+    """令牌桶，rate 为每秒补充的令牌数，burst 为桶容量。rate <= 0 表示不限速"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = now
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """距离下一个令牌可用还需等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        if self.rate <= 0:
+            return
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class SendScheduler:
+    """发送消息调度器
+
+    - 消息按通道区分优先级：交互回复 > 插件推送 > 批量发送
+    - 全局和每个接收人各有一个令牌桶限速，代替原来每条消息固定间隔1秒，
+      保留防风控的发送节奏
+    - 同一通道内按接收人轮流发送，一个接收人积压很多消息时不会阻塞其他人
+    - 同一时间只发送一条消息，和原来的消息队列一样
+    """
+
+    # 接收人令牌桶数量超过该值时清理已经回满的桶
+    _BUCKET_PRUNE_SIZE = 1024
+
+    def __init__(self,
+                 global_rate: float = 1.0,
+                 global_burst: float = 1.0,
+                 recipient_rate: float = 1.0,
+                 recipient_burst: float = 3.0):
+        self.global_rate = float(global_rate)
+        self.global_burst = float(global_burst)
+        self.recipient_rate = float(recipient_rate)
+        self.recipient_burst = float(recipient_burst)
+
+        # 通道 -> 接收人 -> 待发送消息，元素为 (入队时间, func, args, kwargs, future)
+        self._lanes: Dict[str, "OrderedDict[str, Deque[Tuple]]"] = {lane: OrderedDict() for lane in LANES}
+        self._global_bucket = TokenBucket(self.global_rate, self.global_burst, time.monotonic())
+        self._recipient_buckets: Dict[str, TokenBucket] = {}
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.wait_time = {lane: LatencyWindow() for lane in LANES}
+        self.sent = {lane: 0 for lane in LANES}
+        self.failed = 0
+
+    @classmethod
+    def from_config(cls, config: dict) -> "SendScheduler":
+        """根据 main_config.toml 的 [SendQueue] 配置创建调度器"""
+        send_config = config.get("SendQueue", {})
+        return cls(
+            global_rate=send_config.get("global-rate", 1.0),
+            global_burst=send_config.get("global-burst", 1.0),
+            recipient_rate=send_config.get("recipient-rate", 1.0),
+            recipient_burst=send_config.get("recipient-burst", 3.0),
+        )
+
+    @property
+    def depth(self) -> int:
+        """等待发送的消息数"""
+        return sum(len(queue) for lane in self._lanes.values() for queue in list(lane.values()))
+
+    def bind(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """绑定到机器人所在的事件循环，所有消息都在这个循环里排队和限速发送
+
+        机器人启动时显式调用（bot_core），其他线程的事件循环（管理后台、API服务）提交的消息
+        会转交到这里。重新绑定到另一个事件循环时，原来排队中的消息以异常结束，不会一直挂起。
+
+        Args:
+            loop: 要绑定的事件循环，默认为当前正在运行的事件循环
+        """
+        loop = loop or asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self._loop is not None:
+            self._fail_pending(RuntimeError("发送调度器已绑定到新的事件循环，消息未发送"))
+            if self._task is not None and not self._task.done():
+                self._call_in_loop(self._task.cancel)
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def _call_in_loop(self, callback, *args):
+        """在已绑定的事件循环中执行回调，事件循环已关闭时直接执行"""
+        old_loop = self._loop
+        try:
+            if old_loop is not None and old_loop.is_running():
+                old_loop.call_soon_threadsafe(callback, *args)
+                return
+        except RuntimeError:
+            pass
+        callback(*args)
+
+    def _fail_pending(self, error: Exception):
+        """让所有排队中的消息以 error 结束"""
+        dropped = 0
+        for lane in self._lanes.values():
+            for queue in lane.values():
+                for entry in queue:
+                    future = entry[-1]
+                    if not future.done():
+                        self._call_in_loop(self._set_exception, future, error)
+                        dropped += 1
+            lane.clear()
+        if dropped:
+            logger.warning("{} 条未发送的消息已取消: {}", dropped, error)
+
+    @staticmethod
+    def _set_exception(future: asyncio.Future, error: Exception):
+        if not future.done():
+            future.set_exception(error)
+
+    def _ensure_task(self):
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._run())
+
+    async def submit(self, wxid: str, func: Callable[..., Awaitable[Any]], *args,
+                     lane: Optional[str] = None, **kwargs) -> Any:
+        """提交一条待发送的消息，等待实际发送完成并返回发送结果
+
+        Args:
+            wxid: 接收人wxid，用于按接收人限速
+            func: 实际发送消息的协程函数
+            lane: 发送通道，不填时使用当前上下文的 send_lane
+
+        Returns:
+            func 的返回值
+        """
+        if lane not in LANES:
+            lane = send_lane.get()
+            if lane not in LANES:
+                lane = LANE_PUSH
+
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            # 没有显式绑定（单独使用客户端时），绑定到第一次发送所在的事件循环
+            self.bind(loop)
+        elif loop is not self._loop:
+            # 从其他线程的事件循环（如管理后台、API服务）发送，转交给机器人所在的事件循环
+            if not self._loop.is_running():
+                raise RuntimeError("发送调度器绑定的事件循环未运行，无法发送消息")
+            future = asyncio.run_coroutine_threadsafe(
+                self.submit(wxid, func, *args, lane=lane, **kwargs), self._loop)
+            return await asyncio.wrap_future(future)
+
+        self._ensure_task()
+        future = loop.create_future()
+        recipients = self._lanes[lane]
+        queue = recipients.get(wxid)
+        if queue is None:
+            queue = recipients[wxid] = deque()
+        queue.append((time.monotonic(), func, args, kwargs, future))
+        self._wakeup.set()
+        return await future
+
+    def _select(self, now: float) -> Tuple[Optional[Tuple[str, str]], Optional[float]]:
+        """选出下一条可以发送的消息
+
+        Returns:
+            ((通道, 接收人), None) 或 (None, 需要等待的秒数)，没有待发送消息时等待时间为 None
+        """
+        min_wait = None
+        for lane in LANES:
+            for wxid in self._lanes[lane]:
+                bucket = self._recipient_buckets.get(wxid)
+                wait = bucket.wait_time(now) if bucket is not None else 0.0
+                if wait <= 0:
+                    return (lane, wxid), None
+                if min_wait is None or wait < min_wait:
+                    min_wait = wait
+        return None, min_wait
+
+    async def _sleep_or_wakeup(self, timeout: Optional[float]):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            global_wait = self._global_bucket.wait_time(now)
+            if global_wait > 0:
+                # 全局限速期间新到的高优先级消息会在等待结束后优先被选中
+                await asyncio.sleep(global_wait)
+                continue
+
+            selected, wait = self._select(now)
+            if selected is None:
+                await self._sleep_or_wakeup(wait)
+                continue
+
+            lane, wxid = selected
+            recipients = self._lanes[lane]
+            queue = recipients[wxid]
+            enqueued_at, func, args, kwargs, future = queue.popleft()
+            if queue:
+                # 轮到下一个接收人
+                recipients.move_to_end(wxid)
+            else:
+                del recipients[wxid]
+
+            if future.cancelled():
+                continue
+
+            self._global_bucket.take(now)
+            bucket = self._recipient_buckets.get(wxid)
+            if bucket is None:
+                bucket = self._recipient_buckets[wxid] = TokenBucket(self.recipient_rate, self.recipient_burst, now)
+            bucket.take(now)
+            self.wait_time[lane].record(now - enqueued_at)
+
+            try:
+                result = await func(*args, **kwargs)
+                if not future.done():
+                    future.set_result(result)
+                self.sent[lane] += 1
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                self.failed += 1
+                if not future.done():
+                    future.set_exception(e)
+
+            if len(self._recipient_buckets) > self._BUCKET_PRUNE_SIZE:
+                self._prune_buckets(time.monotonic())
+
+    def _prune_buckets(self, now: float):
+        """清理已经回满且没有待发送消息的接收人令牌桶"""
+        pending = {wxid for lane in self._lanes.values() for wxid in lane}
+        for wxid in [w for w, b in self._recipient_buckets.items() if w not in pending and b.is_full(now)]:
+            del self._recipient_buckets[wxid]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取发送队列统计"""
+        return {
+            "global_rate": self.global_rate,
+            "global_burst": self.global_burst,
+            "recipient_rate": self.recipient_rate,
+            "recipient_burst": self.recipient_burst,
+            "depth": self.depth,
+            "failed": self.failed,
+            "lanes": {
+                lane: {
+                    "depth": sum(len(queue) for queue in list(self._lanes[lane].values())),
+                    "recipients": len(self._lanes[lane]),
+                    "sent": self.sent[lane],
+                    "wait_ms": self.wait_time[lane].snapshot(),
+                }
+                for lane in LANES
+            },
+        }
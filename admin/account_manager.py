@@ -15,6 +15,8 @@ from fastapi.responses import JSONResponse, HTMLResponse, RedirectResponse, File
 from fastapi.templating import Jinja2Templates
 from loguru import logger
 
+from utils.bot_status import bot_status_registry
+
 # 创建路由器
 router = APIRouter(prefix="/api/accounts", tags=["accounts"])
 
@@ -162,27 +164,27 @@ def get_current_account() -> Optional[Dict]:
         if not data.get("wxid"):
             return None
 
-        # 如果 robot_stat.json 中没有昵称或微信号，尝试从状态文件中获取
+        # 如果 robot_stat.json 中没有昵称或微信号，尝试从bot状态中获取
         if not data.get("nickname") or not data.get("alias"):
-            # 读取状态文件
-            status_file = Path("admin") / "bot_status.json"
-            if status_file.exists():
-                try:
-                    with open(status_file, "r", encoding="utf-8") as f:
-                        status_data = json.load(f)
-
-                    # 获取昵称和微信号
-                    if not data.get("nickname") and status_data.get("nickname"):
-                        data["nickname"] = status_data.get("nickname")
-                    if not data.get("alias") and status_data.get("alias"):
-                        data["alias"] = status_data.get("alias")
-
-                    # 将更新后的数据保存回 robot_stat.json
+            try:
+                status_data = bot_status_registry.get()
+
+                # 获取昵称和微信号
+                updated = False
+                if not data.get("nickname") and status_data.get("nickname"):
+                    data["nickname"] = status_data.get("nickname")
+                    updated = True
+                if not data.get("alias") and status_data.get("alias"):
+                    data["alias"] = status_data.get("alias")
+                    updated = True
+
+                # 将更新后的数据保存回 robot_stat.json
+                if updated:
                     with open(ACTIVE_ACCOUNT_FILE, "w", encoding="utf-8") as f:
                         json.dump(data, f, ensure_ascii=False, indent=2)
-                    logger.info(f"从状态文件更新了账号信息: {data.get('nickname')}, {data.get('alias')}")
-                except Exception as e:
-                    logger.error(f"从状态文件获取账号信息失败: {e}")
+                    logger.info(f"从bot状态更新了账号信息: {data.get('nickname')}, {data.get('alias')}")
+            except Exception as e:
+                logger.error(f"从bot状态获取账号信息失败: {e}")
 
         return data
     except (json.JSONDecodeError, FileNotFoundError) as e:
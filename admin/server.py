@@ -64,6 +64,10 @@ except ImportError as e:
 from loguru import logger
 import psutil
 import platform
+from utils.system_metrics import system_metrics
+from utils.log_reader import log_reader, find_log_files, parse_time as parse_log_time
+from utils.log_stream import log_stream
+from utils.bot_status import bot_status_registry
 import socket
 import re
 
@@ -312,7 +316,8 @@ def get_system_info():
         # 获取CPU信息
         try:
             cpu_count = psutil.cpu_count(logical=True)
-            cpu_percent = psutil.cpu_percent(interval=0.1)
+            # 使用后台采样器的最近一次结果，不在请求中阻塞等待
+            cpu_percent = system_metrics.latest().get("cpu_percent", 0)
             if cpu_count is None:
                 cpu_count = psutil.cpu_count(logical=False)
         except Exception as e:
@@ -413,41 +418,36 @@ def get_system_status():
         from datetime import datetime, timedelta
         from pathlib import Path
 
-        # 获取CPU使用率
-        cpu_percent = psutil.cpu_percent(interval=0.5)
-
-        # 获取内存使用情况
-        memory = psutil.virtual_memory()
-        memory_percent = memory.percent
-        memory_used = memory.used
-        memory_total = memory.total
-
-        # 获取磁盘使用情况
-        disk = psutil.disk_usage('/')
-        disk_percent = disk.percent
-        disk_used = disk.used
-        disk_total = disk.total
-
-        # 获取网络信息
-        net_io_counters = psutil.net_io_counters()
-        bytes_sent = net_io_counters.bytes_sent
-        bytes_recv = net_io_counters.bytes_recv
+        # CPU、内存、磁盘和网络信息来自后台采样器的最近一次结果，不在请求中阻塞等待
+        metrics = system_metrics.latest()
+        if "disk_total" not in metrics:
+            # 采样器刚启动还没有样本，直接读取（不含 CPU 使用率）
+            memory = psutil.virtual_memory()
+            disk = psutil.disk_usage('/')
+            net_io_counters = psutil.net_io_counters()
+            metrics = dict(metrics,
+                           memory_percent=memory.percent, memory_used=memory.used, memory_total=memory.total,
+                           disk_percent=disk.percent, disk_used=disk.used, disk_total=disk.total,
+                           bytes_sent=net_io_counters.bytes_sent, bytes_recv=net_io_counters.bytes_recv)
+
+        cpu_percent = metrics.get("cpu_percent", 0)
+        memory_percent = metrics["memory_percent"]
+        memory_used = metrics["memory_used"]
+        memory_total = metrics["memory_total"]
+        disk_percent = metrics["disk_percent"]
+        disk_used = metrics["disk_used"]
+        disk_total = metrics["disk_total"]
+        bytes_sent = metrics.get("bytes_sent", 0)
+        bytes_recv = metrics.get("bytes_recv", 0)
 
         # 获取机器人启动时间和运行时间
-        # 首先尝试从bot_status.json获取时间戳
-        status_file = Path(current_dir) / "bot_status.json"
+        # 首先尝试从bot状态获取时间戳
         login_time = None
-
-        if status_file.exists():
-            try:
-                with open(status_file, "r", encoding="utf-8") as f:
-                    status_data = json.load(f)
-                    # 如果状态是online，使用状态文件中的时间戳
-                    if status_data.get("status") == "online" and "timestamp" in status_data:
-                        login_time = datetime.fromtimestamp(status_data["timestamp"])
-                        logger.debug(f"从状态文件获取到登录时间: {login_time}")
-            except Exception as e:
-                logger.error(f"读取状态文件失败: {e}")
+        status_data = bot_status_registry.get()
+        # 如果状态是online，使用状态中的时间戳
+        if status_data.get("status") == "online" and "timestamp" in status_data:
+            login_time = datetime.fromtimestamp(status_data["timestamp"])
+            logger.debug(f"从bot状态获取到登录时间: {login_time}")
 
         # 如果无法从状态文件获取，则尝试从robot_stat.json获取
         if not login_time:
@@ -560,177 +560,57 @@ def get_contacts_from_bot(bot):
         logger.error(f"获取联系人失败: {e}")
         return []
 
-# 直接定义状态更新函数，不依赖导入
+def _qrcode_from_details(details):
+    """从状态详情中提取二维码URL和UUID"""
+    fields = {}
+    match = re.search(r'获取到登录二维码: (https?://[^\s]+)', str(details))
+    if match:
+        fields["qrcode_url"] = match.group(1)
+        logger.debug(f"从状态详情中提取到二维码URL: {fields['qrcode_url']}")
+    match = re.search(r'获取到登录uuid: ([^\s]+)', str(details))
+    if match:
+        fields["uuid"] = match.group(1)
+        logger.debug(f"从状态详情中提取到UUID: {fields['uuid']}")
+    return fields
+
+def _with_qrcode(status_data):
+    """补充二维码URL：优先使用状态详情中的，其次根据UUID构建"""
+    if "details" in status_data:
+        status_data.update(_qrcode_from_details(status_data["details"]))
+    if "uuid" in status_data and "qrcode_url" not in status_data:
+        status_data["qrcode_url"] = f"https://api.pwmqr.com/qrcode/create/?url=http://weixin.qq.com/x/{status_data['uuid']}"
+        logger.debug(f"根据UUID构建二维码URL: {status_data['qrcode_url']}")
+    return status_data
+
+# 状态更新写入进程内的状态注册表，不直接读写状态文件
 def update_bot_status(status, details=None, extra_data=None):
     """更新bot状态，供管理后台读取"""
     try:
-        # 直接使用绝对路径写入状态文件
-        status_file = Path(current_dir) / "bot_status.json"
-
-        # 读取当前状态
-        current_status = {}
-        if status_file.exists():
-            with open(status_file, "r", encoding="utf-8") as f:
-                current_status = json.load(f)
-
-        # 更新状态
-        current_status["status"] = status
-        current_status["timestamp"] = time.time()
-        if details:
-            current_status["details"] = details
-
-            # 检查详情中是否包含二维码URL
-            qrcode_pattern = re.compile(r'获取到登录二维码: (https?://[^\s]+)')
-            match = qrcode_pattern.search(str(details))
-            if match:
-                qrcode_url = match.group(1)
-                logger.debug(f"从状态详情中提取到二维码URL: {qrcode_url}")
-                current_status["qrcode_url"] = qrcode_url
-
-            # 检查详情中是否包含UUID
-            uuid_pattern = re.compile(r'获取到登录uuid: ([^\s]+)')
-            match = uuid_pattern.search(str(details))
-            if match:
-                uuid = match.group(1)
-                logger.debug(f"从状态详情中提取到UUID: {uuid}")
-                current_status["uuid"] = uuid
-
-                # 如果有uuid但没有qrcode_url，尝试构建
-                if "qrcode_url" not in current_status:
-                    current_status["qrcode_url"] = f"https://api.pwmqr.com/qrcode/create/?url=http://weixin.qq.com/x/{uuid}"
-                    logger.debug(f"根据UUID构建二维码URL: {current_status['qrcode_url']}")
-
-        # 添加额外数据
+        fields = _qrcode_from_details(details) if details else {}
         if extra_data and isinstance(extra_data, dict):
-            for key, value in extra_data.items():
-                current_status[key] = value
-
-            # 特别处理extra_data中的二维码信息
+            fields.update(extra_data)
             if "qrcode_url" in extra_data:
                 logger.debug(f"从extra_data中获取二维码URL: {extra_data['qrcode_url']}")
 
-            if "uuid" in extra_data and "qrcode_url" not in current_status:
-                current_status["qrcode_url"] = f"https://api.pwmqr.com/qrcode/create/?url=http://weixin.qq.com/x/{extra_data['uuid']}"
-                logger.debug(f"根据extra_data中的UUID构建二维码URL: {current_status['qrcode_url']}")
-
-        # 确保目录存在
-        status_file.parent.mkdir(parents=True, exist_ok=True)
-
-        # 写入文件
-        with open(status_file, "w", encoding="utf-8") as f:
-            json.dump(current_status, f)
+        current_status = bot_status_registry.update(status, details, fields)
+        if "uuid" in current_status and "qrcode_url" not in current_status:
+            current_status = bot_status_registry.update(None, None, _with_qrcode({"uuid": current_status["uuid"]}))
 
         logger.debug(f"成功更新bot状态: {status}")
-        logger.debug(f"状态文件内容: qrcode_url={current_status.get('qrcode_url', None)}, uuid={current_status.get('uuid', None)}")
-
-        # 复制一份到根目录供其他模块使用
-        try:
-            root_status_file = Path(current_dir).parent / "bot_status.json"
-            with open(root_status_file, "w", encoding="utf-8") as f:
-                json.dump(current_status, f)
-            logger.debug(f"已复制状态文件到根目录: {root_status_file}")
-        except Exception as e:
-            logger.error(f"复制状态文件到根目录失败: {e}")
+        logger.debug(f"状态内容: qrcode_url={current_status.get('qrcode_url', None)}, uuid={current_status.get('uuid', None)}")
     except Exception as e:
         logger.error(f"更新bot状态失败: {e}")
 
-# 从状态文件获取bot状态
+# 从状态注册表获取bot状态
 def get_bot_status():
-    """从状态文件获取bot的最新状态"""
+    """获取bot的最新状态"""
     try:
-        # 使用统一的状态文件路径
-        status_file = Path(current_dir) / "bot_status.json"
-        root_status_file = Path(current_dir).parent / "bot_status.json"
-
-        logger.debug(f"尝试读取状态文件: {status_file}, 备选: {root_status_file}")
-
-        # 优先读取管理后台目录中的状态文件
-        if os.path.exists(status_file):
-            with open(status_file, "r", encoding="utf-8") as f:
-                status_data = json.load(f)
-                # 添加调试日志
-                logger.debug(f"读取状态文件成功: {status_file}")
-                # 特别检查个人信息
-                if "nickname" in status_data:
-                    logger.debug(f"状态文件中包含昵称: {status_data['nickname']}")
-                if "wxid" in status_data:
-                    logger.debug(f"状态文件中包含微信ID: {status_data['wxid']}")
-                if "alias" in status_data:
-                    logger.debug(f"状态文件中包含微信号: {status_data['alias']}")
-                # 特别检查二维码URL
-                if "qrcode_url" in status_data:
-                    logger.debug(f"状态文件中包含二维码URL: {status_data['qrcode_url']}")
-                else:
-                    logger.debug("状态文件中不包含二维码URL")
-
-                # 检查日志信息中是否包含二维码URL
-                if "details" in status_data:
-                    qrcode_pattern = re.compile(r'获取到登录二维码: (https?://[^\s]+)')
-                    match = qrcode_pattern.search(str(status_data['details']))
-                    if match:
-                        qrcode_url = match.group(1)
-                        logger.debug(f"从状态详情中提取到二维码URL: {qrcode_url}")
-                        status_data["qrcode_url"] = qrcode_url
-
-                # 检查是否包含uuid，用于构建二维码
-                if "uuid" in status_data:
-                    logger.debug(f"状态文件中包含UUID: {status_data['uuid']}")
-                    # 如果有uuid但没有qrcode_url，尝试构建
-                    if "qrcode_url" not in status_data:
-                        status_data["qrcode_url"] = f"https://api.pwmqr.com/qrcode/create/?url=http://weixin.qq.com/x/{status_data['uuid']}"
-                        logger.debug(f"根据UUID构建二维码URL: {status_data['qrcode_url']}")
-
-                return status_data
-
-        # 如果管理后台目录中的状态文件不存在，尝试读取根目录中的状态文件
-        if os.path.exists(root_status_file):
-            with open(root_status_file, "r", encoding="utf-8") as f:
-                status_data = json.load(f)
-                logger.debug(f"从根目录读取状态文件成功: {root_status_file}")
-
-                # 特别检查个人信息
-                if "nickname" in status_data:
-                    logger.debug(f"状态文件中包含昵称: {status_data['nickname']}")
-                if "wxid" in status_data:
-                    logger.debug(f"状态文件中包含微信ID: {status_data['wxid']}")
-                if "alias" in status_data:
-                    logger.debug(f"状态文件中包含微信号: {status_data['alias']}")
-
-                # 特别检查二维码URL
-                if "qrcode_url" in status_data:
-                    logger.debug(f"状态文件中包含二维码URL: {status_data['qrcode_url']}")
-                else:
-                    logger.debug("状态文件中不包含二维码URL")
-
-                # 检查日志信息中是否包含二维码URL
-                if "details" in status_data:
-                    qrcode_pattern = re.compile(r'获取到登录二维码: (https?://[^\s]+)')
-                    match = qrcode_pattern.search(str(status_data['details']))
-                    if match:
-                        qrcode_url = match.group(1)
-                        logger.debug(f"从状态详情中提取到二维码URL: {qrcode_url}")
-                        status_data["qrcode_url"] = qrcode_url
-
-                # 检查是否包含uuid，用于构建二维码
-                if "uuid" in status_data:
-                    logger.debug(f"状态文件中包含UUID: {status_data['uuid']}")
-                    # 如果有uuid但没有qrcode_url，尝试构建
-                    if "qrcode_url" not in status_data:
-                        status_data["qrcode_url"] = f"https://api.pwmqr.com/qrcode/create/?url=http://weixin.qq.com/x/{status_data['uuid']}"
-                        logger.debug(f"根据UUID构建二维码URL: {status_data['qrcode_url']}")
-
-                # 同时将数据复制到管理后台目录中
-                try:
-                    with open(status_file, "w", encoding="utf-8") as fw:
-                        json.dump(status_data, fw)
-                    logger.debug("已将根目录状态文件同步到管理后台目录")
-                except Exception as e:
-                    logger.error(f"同步状态文件失败: {e}")
+        status_data = bot_status_registry.get()
+        if status_data:
+            return _with_qrcode(status_data)
 
-                return status_data
-
-        # 尝试从用户提供的日志中提取二维码信息
-        logger.debug("状态文件不存在，尝试从日志中提取二维码信息")
+        # 还没有任何状态时，尝试从日志中提取二维码信息
+        logger.debug("还没有bot状态，尝试从日志中提取二维码信息")
         # 读取最新的日志文件
         log_dir = Path(__file__).parent.parent / "logs"
         if log_dir.exists():
@@ -753,29 +633,16 @@ def get_bot_status():
                             qrcode_url = qrcode_match.group(1)
                             logger.debug(f"从日志中提取到UUID: {uuid} 和二维码URL: {qrcode_url}")
 
-                            # 创建状态数据
-                            status_data = {
-                                "status": "waiting_login",
-                                "timestamp": time.time(),
+                            # 保存到状态注册表
+                            return bot_status_registry.update("waiting_login", f"等待微信扫码登录, 二维码: {qrcode_url}", {
                                 "uuid": uuid,
                                 "qrcode_url": qrcode_url,
-                                "details": f"等待微信扫码登录, 二维码: {qrcode_url}"
-                            }
-
-                            # 保存状态数据到文件
-                            try:
-                                with open(status_file, "w", encoding="utf-8") as fw:
-                                    json.dump(status_data, fw)
-                                logger.debug("已将从日志提取的二维码信息保存到状态文件")
-                            except Exception as e:
-                                logger.error(f"保存状态文件失败: {e}")
-
-                            return status_data
+                            })
                 except Exception as e:
                     logger.error(f"读取日志文件失败: {e}")
 
-        # 状态文件不存在时返回默认状态
-        logger.debug("状态文件不存在，返回默认状态")
+        # 没有状态时返回默认状态
+        logger.debug("还没有bot状态，返回默认状态")
         return {
             "status": "unknown",
             "timestamp": time.time(),
@@ -783,7 +650,7 @@ def get_bot_status():
             "details": "等待状态更新"
         }
     except Exception as e:
-        logger.error(f"读取bot状态文件失败: {e}")
+        logger.error(f"读取bot状态失败: {e}")
         return {"status": "error", "error": str(e), "timestamp": time.time()}
 
 # 读取版本信息
@@ -1489,6 +1356,25 @@ def setup_routes():
             "data": get_system_status()
         }
 
+    # API: 系统指标历史，用于绘制图表 (需要认证)
+    @app.get("/api/system/metrics/history", response_class=JSONResponse)
+    async def api_system_metrics_history(request: Request, seconds: Optional[float] = None, fields: Optional[str] = None):
+        # 检查认证状态
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
+
+        return {
+            "success": True,
+            "data": {
+                "interval": system_metrics.interval,
+                "samples": system_metrics.history(
+                    seconds=seconds,
+                    fields=[field.strip() for field in fields.split(",") if field.strip()] if fields else None
+                )
+            }
+        }
+
     # API: 系统信息 (需要认证)
     @app.get("/api/system/info", response_class=JSONResponse)
     async def api_system_info(request: Request):
@@ -1524,6 +1410,153 @@ def setup_routes():
                 "error": str(e)
             })
 
+    # API: 消息分发队列状态 (需要认证)
+    @app.get("/api/system/dispatch", response_class=JSONResponse)
+    async def api_system_dispatch(request: Request):
+        # 检查认证状态
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
+
+        dispatcher = getattr(bot_instance, "dispatcher", None) if bot_instance else None
+        if dispatcher is None:
+            return {"success": False, "error": "消息分发队列未启动"}
+
+        return {
+            "success": True,
+            "data": dispatcher.get_stats()
+        }
+
+    # API: 发送消息队列状态 (需要认证)
+    @app.get("/api/system/send_queue", response_class=JSONResponse)
+    async def api_system_send_queue(request: Request):
+        # 检查认证状态
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
+
+        client = getattr(bot_instance, "bot", None) if bot_instance else None
+        send_scheduler = getattr(client, "send_scheduler", None)
+        if send_scheduler is None:
+            return {"success": False, "error": "发送队列未初始化"}
+
+        return {
+            "success": True,
+            "data": send_scheduler.get_stats()
+        }
+
+    # API: 协议服务连接池状态 (需要认证)
+    @app.get("/api/system/http_pool", response_class=JSONResponse)
+    async def api_system_http_pool(request: Request):
+        # 检查认证状态
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
+
+        client = getattr(bot_instance, "bot", None) if bot_instance else None
+        http_pool = getattr(client, "http_pool", None)
+        if http_pool is None:
+            return {"success": False, "error": "连接池未初始化"}
+
+        return {
+            "success": True,
+            "data": http_pool.get_stats()
+        }
+
+    # API: 图片分段下载统计 (需要认证)
+    @app.get("/api/system/image_download", response_class=JSONResponse)
+    async def api_system_image_download(request: Request):
+        # 检查认证状态
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
+
+        image_downloader = getattr(bot_instance, "image_downloader", None) if bot_instance else None
+        if image_downloader is None:
+            return {"success": False, "error": "机器人未初始化"}
+
+        return {
+            "success": True,
+            "data": image_downloader.get_stats()
+        }
+
+    # API: XYBotDB 读缓存统计 (需要认证)
+    @app.get("/api/system/db_cache", response_class=JSONResponse)
+    async def api_system_db_cache(request: Request):
+        # 检查认证状态
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
+
+        from database.XYBotDB import XYBotDB
+
+        return {
+            "success": True,
+            "data": XYBotDB().get_cache_stats()
+        }
+
+    # API: 进程内联系人缓存统计 (需要认证)
+    @app.get("/api/system/contact_cache", response_class=JSONResponse)
+    async def api_system_contact_cache(request: Request):
+        # 检查认证状态
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
+
+        from utils.contact_cache import contact_cache
+
+        return {
+            "success": True,
+            "data": contact_cache.get_stats()
+        }
+
+    # API: 各插件事件处理函数的调用统计 (需要认证)
+    @app.get("/api/system/handlers", response_class=JSONResponse)
+    async def api_system_handlers(request: Request, plugin: Optional[str] = None):
+        # 检查认证状态
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
+
+        from utils.handler_metrics import handler_metrics
+
+        return {
+            "success": True,
+            "data": handler_metrics.snapshot(plugin)
+        }
+
+    # Prometheus 指标 (需要认证，支持登录会话或 HTTP Basic 认证，方便 Prometheus 抓取)
+    @app.get("/metrics")
+    async def prometheus_metrics(request: Request):
+        username = await check_auth(request)
+        if not username:
+            credentials = await HTTPBasic(auto_error=False)(request)
+            if credentials is None:
+                return Response(status_code=401, headers={"WWW-Authenticate": "Basic"})
+            verify_credentials(credentials)
+
+        from utils.handler_metrics import handler_metrics
+
+        return Response(content=handler_metrics.to_prometheus(),
+                        media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    # API: 消息同步状态及消息接收延迟 (需要认证)
+    @app.get("/api/system/sync", response_class=JSONResponse)
+    async def api_system_sync(request: Request):
+        # 检查认证状态
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
+
+        sync_scheduler = getattr(bot_instance, "sync_scheduler", None) if bot_instance else None
+        if sync_scheduler is None:
+            return {"success": False, "error": "消息同步尚未开始"}
+
+        return {
+            "success": True,
+            "data": sync_scheduler.get_stats()
+        }
+
     # API: 机器人状态 (需要认证)
     @app.get("/api/bot/status", response_class=JSONResponse)
     async def api_bot_status(request: Request):
@@ -2865,6 +2898,19 @@ except:
     # 启动周期性任务
     @app.on_event("startup")
     async def start_periodic_tasks():
+        # 启动系统指标采样
+        system_metrics.start()
+        # 订阅bot状态变化，通过 /ws 推送给已打开的页面
+        loop = asyncio.get_running_loop()
+
+        def push_bot_status(status_data):
+            message = json.dumps({
+                "type": "status_update",
+                "data": {**status_data, "bot_status": status_data.get("status")}
+            }, ensure_ascii=False, default=str)
+            asyncio.run_coroutine_threadsafe(broadcast_message(message), loop)
+
+        bot_status_registry.subscribe(push_bot_status)
         # 启动同步待处理插件任务
         asyncio.create_task(sync_pending_plugins())
         # 启动缓存插件市场数据任务
@@ -2925,21 +2971,13 @@ except:
                 # 发现了二维码URL，更新状态
                 logger.info(f"从日志中获取到二维码URL: {qrcode_data['qrcode_url']}")
 
-                # 同时更新状态文件，确保下次能直接从状态文件获取
-                status_path = Path(__file__).parent / "bot_status.json"
+                # 同时更新bot状态，确保下次能直接获取
                 if status_data:
                     status_data.update(qrcode_data)
+                    bot_status_registry.update(None, None, qrcode_data)
                 else:
-                    status_data = {
-                        "status": "waiting_login",
-                        "details": "等待微信扫码登录",
-                        "timestamp": time.time(),
-                        **qrcode_data
-                    }
-
-                with open(status_path, "w", encoding="utf-8") as f:
-                    json.dump(status_data, f)
-                    logger.info("已更新二维码URL到状态文件")
+                    status_data = bot_status_registry.update("waiting_login", "等待微信扫码登录", qrcode_data)
+                logger.info("已更新二维码URL到bot状态")
 
                 return {
                     "success": True,
@@ -3051,6 +3089,68 @@ except:
         except WebSocketDisconnect:
             await disconnect_websocket(websocket)
 
+    # 实时日志流 (需要认证)
+    @app.websocket("/ws/logs")
+    async def websocket_logs(websocket: WebSocket, level: str = None, keyword: str = None,
+                             since: int = None, backlog: int = 500):
+        """推送实时日志
+
+        查询参数:
+            level: 只推送该级别及以上的日志
+            keyword: 只推送包含该文本的日志
+            since: 断线重连时传入最后收到的 seq，补发缓冲区中错过的日志
+            backlog: 未指定 since 时，连接后先推送最近多少条日志
+
+        客户端消息:
+            {"action": "filter", "level": ..., "keyword": ...} 修改过滤条件（只影响之后的日志）
+            {"action": "ping"} 心跳
+
+        服务端消息:
+            {"type": "subscribed", "last_seq": ..., "gap": 是否有日志已不在缓冲区中}
+            {"type": "logs", "data": [...], "dropped": 客户端太慢被丢弃的条数}
+        """
+        username = await check_auth(websocket)
+        if not username:
+            await websocket.close(code=1008)
+            return
+
+        await websocket.accept()
+        subscription = log_stream.subscribe(level, keyword, since, backlog)
+        subscriber = subscription["subscriber"]
+
+        async def send_logs():
+            while True:
+                batch = await subscriber.get_batch()
+                await websocket.send_json({"type": "logs", "data": batch["entries"], "dropped": batch["dropped"]})
+
+        async def receive_commands():
+            while True:
+                data = await websocket.receive_json()
+                action = data.get("action")
+                if action == "filter":
+                    subscriber.set_filter(data.get("level"), data.get("keyword"))
+                elif action == "ping":
+                    await websocket.send_json({"type": "pong", "last_seq": log_stream.last_seq})
+
+        tasks = []
+        try:
+            await websocket.send_json({
+                "type": "subscribed",
+                "last_seq": subscription["last_seq"],
+                "gap": subscription["gap"],
+            })
+            tasks = [asyncio.create_task(send_logs()), asyncio.create_task(receive_commands())]
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() and not isinstance(task.exception(), WebSocketDisconnect):
+                    logger.debug(f"日志流连接异常结束: {task.exception()}")
+        except WebSocketDisconnect:
+            pass
+        finally:
+            log_stream.unsubscribe(subscriber)
+            for task in tasks:
+                task.cancel()
+
     @app.route('/qrcode')
     async def page_qrcode(request):
         """二维码页面，不需要认证"""
@@ -4447,10 +4547,41 @@ except:
             logger.error(f"访问文件管理页面失败: {str(e)}")
             raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
 
+    def find_system_log_files() -> List[str]:
+        """查找日志文件，按修改时间从新到旧排序"""
+        return find_log_files([
+            "logs/latest.log",
+            "logs/xybot.log",
+            "logs/XYBot_*.log",
+            "_data/logs/XYBot_*.log",
+            "../logs/XYBot_*.log",
+            "./logs/XYBot_*.log",
+            # 相对于当前目录的位置
+            os.path.join(current_dir, "../logs/latest.log"),
+            os.path.join(current_dir, "../logs/xybot.log"),
+            os.path.join(current_dir, "../logs/XYBot_*.log"),
+            os.path.join(current_dir, "./logs/latest.log"),
+        ])
+
+    def select_log_file(found_logs: List[str], file: Optional[str]) -> Optional[str]:
+        """按文件名选择日志文件，未指定时选择最新的"""
+        if not file:
+            return found_logs[0]
+        for log_file in found_logs:
+            if os.path.basename(log_file) == file:
+                return log_file
+        return None
+
     # API: 系统日志下载 (需要认证)
     @app.get("/api/system/logs/download", response_class=FileResponse)
-    async def api_system_logs_download(request: Request, t: str = None):
-        """下载系统日志文件"""
+    async def api_system_logs_download(request: Request, t: str = None, file: str = None,
+                                       start_time: str = None, end_time: str = None):
+        """下载系统日志文件
+
+        参数:
+            file: 日志文件名，默认最新的日志文件
+            start_time/end_time: 只下载该时间范围内的日志，格式 YYYY-MM-DD HH:MM:SS
+        """
         logger.info(f"接收到日志下载请求: {request.url}")
 
         # 检查认证状态
@@ -4464,33 +4595,7 @@ except:
             return JSONResponse(status_code=401, content={"success": False, "error": "认证失败"})
 
         try:
-            # 可能的日志文件位置
-            log_paths = [
-                "logs/latest.log",
-                "logs/xybot.log",
-                "logs/XYBot_*.log",
-                "_data/logs/XYBot_*.log",
-                "../logs/XYBot_*.log",
-                "./logs/XYBot_*.log",
-                # 相对于当前目录的位置
-                os.path.join(current_dir, "../logs/latest.log"),
-                os.path.join(current_dir, "../logs/xybot.log"),
-                os.path.join(current_dir, "../logs/XYBot_*.log"),
-                os.path.join(current_dir, "./logs/latest.log"),
-            ]
-
-            # 查找存在的日志文件
-            found_logs = []
-            for path_pattern in log_paths:
-                try:
-                    for log_file in glob.glob(path_pattern):
-                        if os.path.exists(log_file) and os.path.isfile(log_file):
-                            found_logs.append(log_file)
-                except Exception as glob_err:
-                    logger.error(f"查找日志文件失败 {path_pattern}: {str(glob_err)}")
-
-            # 记录找到的日志文件
-            logger.info(f"找到的日志文件: {found_logs}")
+            found_logs = await asyncio.to_thread(find_system_log_files)
 
             # 如果没找到日志文件
             if not found_logs:
@@ -4503,8 +4608,9 @@ except:
                     }
                 )
 
-            # 选择最新的日志文件
-            latest_log = max(found_logs, key=os.path.getmtime)
+            latest_log = select_log_file(found_logs, file)
+            if latest_log is None:
+                return JSONResponse(status_code=404, content={"success": False, "error": f"日志文件不存在: {file}"})
             logger.info(f"准备下载日志文件: {latest_log}")
 
             # 检查文件是否可读
@@ -4518,14 +4624,31 @@ except:
                     }
                 )
 
-            # 检查文件大小
-            file_size = os.path.getsize(latest_log)
-            logger.info(f"日志文件大小: {file_size} 字节")
-
-            # 返回文件响应
             filename = os.path.basename(latest_log)
-            logger.info(f"开始下载日志文件: {filename}")
 
+            if start_time or end_time:
+                try:
+                    start_ts = parse_log_time(start_time) if start_time else None
+                    end_ts = parse_log_time(end_time) if end_time else None
+                except ValueError:
+                    return JSONResponse(status_code=400, content={"success": False, "error": "时间格式应为 YYYY-MM-DD HH:MM:SS"})
+
+                # 按时间范围流式返回，不把整个文件读入内存
+                async def stream_range():
+                    chunks = log_reader.iter_range_bytes(latest_log, start_ts, end_ts)
+                    while True:
+                        chunk = await asyncio.to_thread(next, chunks, None)
+                        if chunk is None:
+                            break
+                        yield chunk
+
+                return StreamingResponse(
+                    stream_range(),
+                    media_type="text/plain",
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+                )
+
+            logger.info(f"开始下载日志文件: {filename}，大小: {os.path.getsize(latest_log)} 字节")
             return FileResponse(
                 path=latest_log,
                 filename=filename,
@@ -4545,12 +4668,18 @@ except:
 
     # API: 系统日志 (需要认证)
     @app.get("/api/system/logs", response_class=JSONResponse)
-    async def api_system_logs(request: Request, log_level: str = None, limit: int = 0):
+    async def api_system_logs(request: Request, log_level: str = None, limit: int = 0, cursor: int = None,
+                              start_time: str = None, end_time: str = None, file: str = None,
+                              min_level: str = None):
         """获取系统日志
 
         参数:
-            log_level: 日志级别过滤
-            limit: 返回的日志行数，0表示返回所有行
+            log_level: 只返回该级别的日志
+            min_level: 只返回该级别及以上的日志，与 /ws/logs 的 level 含义相同
+            limit: 返回的日志条数（按级别过滤后），0表示返回允许的最大条数
+            cursor: 上一次返回的 next_cursor，用于继续翻页
+            start_time/end_time: 时间范围，格式 YYYY-MM-DD HH:MM:SS；不指定时从文件末尾向前读取
+            file: 日志文件名，默认最新的日志文件
         """
         # 检查认证状态
         username = await check_auth(request)
@@ -4558,27 +4687,7 @@ except:
             return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
 
         try:
-            # 可能的日志文件位置
-            log_paths = [
-                "logs/latest.log",
-                "logs/xybot.log",
-                "logs/XYBot_*.log",
-                "_data/logs/XYBot_*.log",
-                "../logs/XYBot_*.log",
-                "./logs/XYBot_*.log",
-                # 相对于当前目录的位置
-                os.path.join(current_dir, "../logs/latest.log"),
-                os.path.join(current_dir, "../logs/xybot.log"),
-                os.path.join(current_dir, "../logs/XYBot_*.log"),
-                os.path.join(current_dir, "./logs/latest.log"),
-            ]
-
-            # 查找存在的日志文件
-            found_logs = []
-            for path_pattern in log_paths:
-                for log_file in glob.glob(path_pattern):
-                    if os.path.exists(log_file) and os.path.isfile(log_file):
-                        found_logs.append(log_file)
+            found_logs = await asyncio.to_thread(find_system_log_files)
 
             # 如果没找到日志文件
             if not found_logs:
@@ -4590,60 +4699,32 @@ except:
                     "message": "未找到任何日志文件"
                 }
 
-            # 选择最新的日志文件
-            latest_log = max(found_logs, key=os.path.getmtime)
-            logger.info(f"读取日志文件: {latest_log}")
+            latest_log = select_log_file(found_logs, file)
+            if latest_log is None:
+                return JSONResponse(status_code=404, content={"success": False, "error": f"日志文件不存在: {file}"})
+            logger.debug(f"读取日志文件: {latest_log}")
 
-            # 读取日志文件并按行返回
-            log_entries = []
             log_files = [os.path.basename(log) for log in found_logs]
+            level = log_level if log_level and log_level.lower() != "all" else None
 
-            with open(latest_log, "r", encoding="utf-8", errors="ignore") as f:
-                lines = f.readlines()
-                # 如果指定了limit并且大于0，则只获取最后的limit行
-                # 否则获取所有行
-                if limit > 0:
-                    lines = lines[-limit:]
-
-                logger.info(f"读取日志行数: {len(lines)}")
-
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-
-                    # 解析日志行
-                    log_entry = {"raw": line}
-
-                    # 尝试解析日志级别
-                    level_match = re.search(r'\|\s*(DEBUG|INFO|WARNING|ERROR|CRITICAL)\s*\|', line)
-                    if level_match:
-                        log_entry["level"] = level_match.group(1).lower()
-                    else:
-                        log_entry["level"] = "info"  # 默认级别
-
-                    # 如果指定了级别过滤，且不匹配，则跳过
-                    if log_level and log_entry["level"] != log_level.lower():
-                        continue
-
-                    # 尝试解析时间戳
-                    time_match = re.search(r'(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})', line)
-                    if time_match:
-                        log_entry["timestamp"] = time_match.group(1)
-
-                    # 尝试解析消息内容
-                    content_match = re.search(r'\|\s*(DEBUG|INFO|WARNING|ERROR|CRITICAL)\s*\|\s*(.*)', line)
-                    if content_match:
-                        log_entry["message"] = content_match.group(2).strip()
-                    else:
-                        log_entry["message"] = line
-
-                    log_entries.append(log_entry)
+            if start_time or end_time:
+                try:
+                    start_ts = parse_log_time(start_time) if start_time else None
+                    end_ts = parse_log_time(end_time) if end_time else None
+                except ValueError:
+                    return JSONResponse(status_code=400, content={"success": False, "error": "时间格式应为 YYYY-MM-DD HH:MM:SS"})
+                # 用稀疏索引定位开始时间，按时间顺序向后读取
+                result = await asyncio.to_thread(
+                    log_reader.read_range, latest_log, start_ts, end_ts, limit, level, cursor, min_level)
+            else:
+                # 从文件末尾按块向前读取，不读取整个文件
+                result = await asyncio.to_thread(log_reader.tail, latest_log, limit, level, cursor, min_level)
 
             # 添加日志文件路径，用于下载
             return {
                 "success": True,
-                "logs": log_entries,
+                "logs": result["entries"],
+                "next_cursor": result["next_cursor"],
                 "log_files": log_files,
                 "current_log": os.path.basename(latest_log),
                 "log_path": latest_log  # 添加日志文件路径
@@ -4659,11 +4740,13 @@ except:
 
     # API: 更新数据库中所有联系人信息
     @app.get("/api/contacts/update_all", response_class=JSONResponse)
-    async def api_update_all_contacts(request: Request):
+    async def api_update_all_contacts(request: Request, background: bool = False, resume: bool = True):
         """更新数据库中所有联系人信息
 
         Args:
             request: 请求对象
+            background: 是否在后台刷新并立即返回，进度通过 /api/contacts/update_all/progress 查询
+            resume: 上次刷新中断时是否从中断处继续
         """
         # 检查用户是否已登录
         username = await check_auth(request)
@@ -4692,209 +4775,47 @@ except:
                     "error": "微信API不支持获取联系人详情"
                 })
 
-            # 保存原始wxid
-            original_wxid = None
-            if hasattr(bot_instance.bot, 'wxid'):
-                original_wxid = bot_instance.bot.wxid
+            refresher = getattr(bot_instance, "contact_refresher", None)
+            if refresher is None:
+                return JSONResponse(content={
+                    "success": False,
+                    "error": "联系人刷新未初始化"
+                })
 
             # 设置wxid
-            bot_instance.bot.wxid = bot_instance.wxid
+            if getattr(bot_instance, "wxid", None):
+                bot_instance.bot.wxid = bot_instance.wxid
 
-            # 从数据库中获取所有联系人
-            from database.contacts_db import get_all_contacts
-            all_contacts = get_all_contacts()
+            task = refresher.start(resume=resume)
+            if background:
+                return JSONResponse(content={
+                    "success": True,
+                    "message": "已开始在后台更新联系人信息",
+                    "progress": refresher.get_progress()
+                })
 
-            if not all_contacts:
-                logger.warning("数据库中没有联系人信息")
+            progress = await asyncio.shield(task)
+            if progress.get("state") != "finished":
                 return JSONResponse(content={
                     "success": False,
-                    "error": "数据库中没有联系人信息"
+                    "error": f"更新所有联系人信息失败: {progress.get('error', progress.get('state'))}",
+                    "progress": progress
                 })
 
-            logger.info(f"从数据库中获取到 {len(all_contacts)} 个联系人")
-
-            # 创建异步任务列表
-            import asyncio
-            update_tasks = []
-            updated_count = 0
-            failed_count = 0
-
-            # 每批处理的联系人数量
-            batch_size = 20
-
-            # 分批处理联系人
-            for i in range(0, len(all_contacts), batch_size):
-                batch = all_contacts[i:i+batch_size]
-
-                # 处理当前批次
-                for contact in batch:
-                    wxid = contact.get('wxid')
-                    if not wxid:
-                        continue
-
-                    try:
-                        # 调用API获取联系人详情
-                        if asyncio.get_event_loop().is_running():
-                            detail = await bot_instance.bot.get_contract_detail(wxid)
-                        else:
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-                            try:
-                                detail = loop.run_until_complete(bot_instance.bot.get_contract_detail(wxid))
-                            finally:
-                                loop.close()
-
-                        # 处理返回数据
-                        if not detail:
-                            logger.warning(f"获取联系人 {wxid} 详情失败，返回空数据")
-                            failed_count += 1
-                            continue
-
-                        # 处理返回结果
-                        contact_info = None
-                        if isinstance(detail, list) and len(detail) > 0:
-                            detail_item = detail[0]
-
-                            # 处理昵称
-                            nickname = ""
-                            if 'NickName' in detail_item:
-                                if isinstance(detail_item['NickName'], dict) and 'string' in detail_item['NickName']:
-                                    nickname = detail_item['NickName']['string']
-                                else:
-                                    nickname = str(detail_item['NickName'])
-                            elif 'nickname' in detail_item:
-                                nickname = detail_item.get('nickname')
-
-                            # 处理头像
-                            avatar = ""
-                            if 'BigHeadImgUrl' in detail_item and detail_item['BigHeadImgUrl']:
-                                avatar = detail_item['BigHeadImgUrl']
-                                logger.debug(f"使用BigHeadImgUrl作为头像: {avatar}")
-                            elif 'SmallHeadImgUrl' in detail_item and detail_item['SmallHeadImgUrl']:
-                                avatar = detail_item['SmallHeadImgUrl']
-                                logger.debug(f"使用SmallHeadImgUrl作为头像: {avatar}")
-                            elif 'avatar' in detail_item:
-                                avatar = detail_item.get('avatar')
-
-                            # 处理备注
-                            remark = ""
-                            if 'Remark' in detail_item:
-                                if isinstance(detail_item['Remark'], dict) and 'string' in detail_item['Remark']:
-                                    remark = detail_item['Remark']['string']
-                                elif isinstance(detail_item['Remark'], str):
-                                    remark = detail_item['Remark']
-                            elif 'remark' in detail_item:
-                                remark = detail_item.get('remark')
-
-                            # 处理微信号
-                            alias = ""
-                            if 'Alias' in detail_item:
-                                alias = detail_item.get('Alias')
-                            elif 'alias' in detail_item:
-                                alias = detail_item.get('alias')
-
-                            # 确定联系人类型
-                            contact_type = "friend"
-                            if wxid.endswith("@chatroom"):
-                                contact_type = "group"
-                            elif wxid.startswith("gh_"):
-                                contact_type = "official"
-
-                            # 创建联系人信息对象
-                            contact_info = {
-                                'wxid': wxid,
-                                'nickname': nickname or wxid,
-                                'avatar': avatar or '',
-                                'remark': remark or '',
-                                'alias': alias or '',
-                                'type': contact_type
-                            }
-                        elif isinstance(detail, dict):
-                            # 如果是字典，直接使用
-                            detail_item = detail
-
-                            # 处理昵称
-                            nickname = ""
-                            if 'NickName' in detail_item:
-                                if isinstance(detail_item['NickName'], dict) and 'string' in detail_item['NickName']:
-                                    nickname = detail_item['NickName']['string']
-                                else:
-                                    nickname = str(detail_item['NickName'])
-                            elif 'nickname' in detail_item:
-                                nickname = detail_item.get('nickname')
-
-                            # 处理头像
-                            avatar = ""
-                            if 'BigHeadImgUrl' in detail_item and detail_item['BigHeadImgUrl']:
-                                avatar = detail_item['BigHeadImgUrl']
-                                logger.debug(f"使用BigHeadImgUrl作为头像: {avatar}")
-                            elif 'SmallHeadImgUrl' in detail_item and detail_item['SmallHeadImgUrl']:
-                                avatar = detail_item['SmallHeadImgUrl']
-                                logger.debug(f"使用SmallHeadImgUrl作为头像: {avatar}")
-                            elif 'avatar' in detail_item:
-                                avatar = detail_item.get('avatar')
-
-                            # 处理备注
-                            remark = ""
-                            if 'Remark' in detail_item:
-                                if isinstance(detail_item['Remark'], dict) and 'string' in detail_item['Remark']:
-                                    remark = detail_item['Remark']['string']
-                                elif isinstance(detail_item['Remark'], str):
-                                    remark = detail_item['Remark']
-                            elif 'remark' in detail_item:
-                                remark = detail_item.get('remark')
-
-                            # 处理微信号
-                            alias = ""
-                            if 'Alias' in detail_item:
-                                alias = detail_item.get('Alias')
-                            elif 'alias' in detail_item:
-                                alias = detail_item.get('alias')
-
-                            # 确定联系人类型
-                            contact_type = "friend"
-                            if wxid.endswith("@chatroom"):
-                                contact_type = "group"
-                            elif wxid.startswith("gh_"):
-                                contact_type = "official"
-
-                            # 创建联系人信息对象
-                            contact_info = {
-                                'wxid': wxid,
-                                'nickname': nickname or wxid,
-                                'avatar': avatar or '',
-                                'remark': remark or '',
-                                'alias': alias or '',
-                                'type': contact_type
-                            }
-
-                        # 将联系人信息保存到数据库
-                        if contact_info:
-                            from database.contacts_db import update_contact_in_db
-                            update_contact_in_db(contact_info)
-                            updated_count += 1
-                            logger.info(f"已将联系人 {wxid} 信息更新到数据库")
-                        else:
-                            failed_count += 1
-                            logger.warning(f"无法解析联系人 {wxid} 的详情")
-                    except Exception as e:
-                        failed_count += 1
-                        logger.error(f"更新联系人 {wxid} 信息失败: {str(e)}")
-
-                # 每批处理完成后等待一小段时间，避免请求过于频繁
-                await asyncio.sleep(1)
-
-            # 恢复原始wxid
-            if original_wxid is not None:
-                bot_instance.bot.wxid = original_wxid
+            if not progress["total"]:
+                return JSONResponse(content={
+                    "success": False,
+                    "error": "数据库中没有联系人信息"
+                })
 
             # 返回结果
             return JSONResponse(content={
                 "success": True,
-                "message": f"成功更新 {updated_count} 个联系人信息，失败 {failed_count} 个",
-                "updated_count": updated_count,
-                "failed_count": failed_count,
-                "total_count": len(all_contacts)
+                "message": f"成功更新 {progress['updated']} 个联系人信息，失败 {progress['failed']} 个",
+                "updated_count": progress["updated"],
+                "failed_count": progress["failed"],
+                "total_count": progress["total"],
+                "progress": progress
             })
 
         except Exception as e:
@@ -4906,6 +4827,26 @@ except:
                 "error": f"更新所有联系人信息失败: {str(e)}"
             })
 
+    # API: 更新所有联系人信息的进度
+    @app.get("/api/contacts/update_all/progress", response_class=JSONResponse)
+    async def api_update_all_contacts_progress(request: Request):
+        # 检查用户是否已登录
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(content={
+                "success": False,
+                "error": "未授权访问"
+            })
+
+        refresher = getattr(bot_instance, "contact_refresher", None) if bot_instance else None
+        if refresher is None:
+            return {"success": False, "error": "联系人刷新未初始化"}
+
+        return {
+            "success": True,
+            "data": refresher.get_progress()
+        }
+
     # API: 刷新单个联系人信息
     @app.get("/api/contacts/{wxid}/refresh", response_class=JSONResponse)
     async def api_refresh_contact(wxid: str, request: Request):
@@ -6592,14 +6533,43 @@ except:
                 content={"success": False, "error": "未登录，请先登录"}
             )
 
-        # 返回功能已禁用的消息
-        return JSONResponse(
-            content={
-                "success": False,
-                "error": "聊天记录和消息同步功能已被禁用",
-                "message": "该功能已被管理员移除，不再提供聊天历史记录检索服务"
-            }
-        )
+        msg_db = getattr(bot_instance, "msg_db", None) if bot_instance else None
+        if msg_db is None or getattr(msg_db, "archive", None) is None:
+            return JSONResponse(
+                content={
+                    "success": False,
+                    "error": "聊天记录功能未启用",
+                    "message": "请在 main_config.toml 中开启 [MessageArchive]"
+                }
+            )
+
+        try:
+            data = await request.json()
+        except Exception:
+            data = {}
+
+        try:
+            start_time = data.get("start_time")
+            end_time = data.get("end_time")
+            result = await msg_db.search_messages(
+                from_wxid=data.get("wxid") or None,
+                keyword=data.get("keyword") or None,
+                sender_wxid=data.get("sender_wxid") or None,
+                start_time=datetime.fromtimestamp(float(start_time)) if start_time else None,
+                end_time=datetime.fromtimestamp(float(end_time)) if end_time else None,
+                cursor=data.get("cursor") or None,
+                limit=int(data.get("limit", 50)),
+            )
+        except (ValueError, TypeError) as e:
+            return JSONResponse(status_code=400, content={"success": False, "error": f"参数错误: {str(e)}"})
+        except Exception as e:
+            logger.error(f"获取聊天记录失败: {str(e)}")
+            return JSONResponse(status_code=500, content={"success": False, "error": f"获取聊天记录失败: {str(e)}"})
+
+        return {
+            "success": True,
+            "data": result
+        }
 
 # 账号管理页面路由 - 直接在模块顶层定义，确保路由被正确注册
 @app.get("/accounts", response_class=HTMLResponse)
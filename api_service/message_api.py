@@ -4,6 +4,8 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict, Any, Union
 from loguru import logger
 
+from WechatAPI.send_scheduler import use_send_lane, LANE_BULK
+
 # 创建路由器
 router = APIRouter(prefix="", tags=["消息"])
 
@@ -135,68 +137,70 @@ async def batch_send_message(request: Request, messages: List[MessageRequest]):
             return JSONResponse(status_code=500, content={"success": False, "error": "机器人未初始化"})
 
         results = []
-        for message in messages:
-            try:
-                # 根据消息类型发送不同类型的消息
-                if message.message_type == "text":
-                    # 发送文本消息
-                    result = await bot.bot.send_text_message(message.to_wxid, message.content, message.at_users)
-                    results.append({
-                        "to_wxid": message.to_wxid,
-                        "success": True,
-                        "data": {
-                            "client_msg_id": result[0],
-                            "create_time": result[1],
-                            "new_msg_id": result[2]
-                        }
-                    })
-                elif message.message_type == "image":
-                    # 发送图片消息
-                    if not message.extra_data or "image_path" not in message.extra_data:
+        # 批量发送使用最低优先级，不影响机器人正常回复消息
+        with use_send_lane(LANE_BULK):
+            for message in messages:
+                try:
+                    # 根据消息类型发送不同类型的消息
+                    if message.message_type == "text":
+                        # 发送文本消息
+                        result = await bot.bot.send_text_message(message.to_wxid, message.content, message.at_users)
                         results.append({
                             "to_wxid": message.to_wxid,
-                            "success": False,
-                            "error": "发送图片需要提供image_path"
+                            "success": True,
+                            "data": {
+                                "client_msg_id": result[0],
+                                "create_time": result[1],
+                                "new_msg_id": result[2]
+                            }
                         })
-                        continue
+                    elif message.message_type == "image":
+                        # 发送图片消息
+                        if not message.extra_data or "image_path" not in message.extra_data:
+                            results.append({
+                                "to_wxid": message.to_wxid,
+                                "success": False,
+                                "error": "发送图片需要提供image_path"
+                            })
+                            continue
                     
-                    image_path = message.extra_data["image_path"]
-                    result = await bot.bot.send_image(message.to_wxid, image_path)
-                    results.append({
-                        "to_wxid": message.to_wxid,
-                        "success": True,
-                        "data": result
-                    })
-                elif message.message_type == "file":
-                    # 发送文件消息
-                    if not message.extra_data or "file_path" not in message.extra_data:
+                        image_path = message.extra_data["image_path"]
+                        result = await bot.bot.send_image(message.to_wxid, image_path)
                         results.append({
                             "to_wxid": message.to_wxid,
-                            "success": False,
-                            "error": "发送文件需要提供file_path"
+                            "success": True,
+                            "data": result
                         })
-                        continue
+                    elif message.message_type == "file":
+                        # 发送文件消息
+                        if not message.extra_data or "file_path" not in message.extra_data:
+                            results.append({
+                                "to_wxid": message.to_wxid,
+                                "success": False,
+                                "error": "发送文件需要提供file_path"
+                            })
+                            continue
                     
-                    file_path = message.extra_data["file_path"]
-                    result = await bot.bot.send_file(message.to_wxid, file_path)
-                    results.append({
-                        "to_wxid": message.to_wxid,
-                        "success": True,
-                        "data": result
-                    })
-                else:
+                        file_path = message.extra_data["file_path"]
+                        result = await bot.bot.send_file(message.to_wxid, file_path)
+                        results.append({
+                            "to_wxid": message.to_wxid,
+                            "success": True,
+                            "data": result
+                        })
+                    else:
+                        results.append({
+                            "to_wxid": message.to_wxid,
+                            "success": False,
+                            "error": f"不支持的消息类型: {message.message_type}"
+                        })
+                except Exception as e:
                     results.append({
                         "to_wxid": message.to_wxid,
                         "success": False,
-                        "error": f"不支持的消息类型: {message.message_type}"
+                        "error": str(e)
                     })
-            except Exception as e:
-                results.append({
-                    "to_wxid": message.to_wxid,
-                    "success": False,
-                    "error": str(e)
-                })
-        
+
         return JSONResponse(
             content={
                 "success": True,
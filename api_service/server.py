@@ -35,6 +35,7 @@ logger.add(
 
 # 导入路由
 from message_api import register_message_routes
+from utils.bot_status import bot_status_registry
 
 # 全局变量
 app = FastAPI(title="API服务")
@@ -180,8 +181,14 @@ def init_app():
     # 添加健康检查端点
     @app.get("/health")
     async def health_check():
-        """健康检查端点"""
-        return {"status": "ok", "service": "API服务"}
+        """健康检查端点，附带机器人当前状态"""
+        bot_status = bot_status_registry.get()
+        return {
+            "status": "ok",
+            "service": "API服务",
+            "bot_status": bot_status.get("status", "unknown"),
+            "bot_status_time": bot_status.get("timestamp"),
+        }
     
     # 添加首页路由
     @app.get("/", response_class=HTMLResponse)
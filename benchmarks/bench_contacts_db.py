@@ -0,0 +1,82 @@
+"""
+联系人数据库每秒更新次数：每次调用新建连接 与 共享连接 + upsert 对比
+
+在临时目录中创建独立的 database/contacts.db，不影响机器人数据。
+
+用法: python benchmarks/bench_contacts_db.py [更新次数]
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def legacy_update_contact(db_path: str, contact: dict):
+    """旧实现：每次更新都新建连接、执行建表语句、先查询再更新或插入"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    ddl = sqlite3.connect(db_path)
+    ddl.execute('''
+    CREATE TABLE IF NOT EXISTS contacts (
+        wxid TEXT PRIMARY KEY, nickname TEXT, remark TEXT, avatar TEXT, alias TEXT,
+        type TEXT, region TEXT, last_updated INTEGER, extra_data TEXT
+    )
+    ''')
+    ddl.commit()
+    ddl.close()
+
+    row = (contact["nickname"], "", "", "", "friend", "", int(time.time()), json.dumps({}), contact["wxid"])
+    cursor.execute("SELECT wxid FROM contacts WHERE wxid = ?", (contact["wxid"],))
+    if cursor.fetchone():
+        cursor.execute('''
+        UPDATE contacts SET nickname = ?, remark = ?, avatar = ?, alias = ?, type = ?, region = ?,
+            last_updated = ?, extra_data = ?
+        WHERE wxid = ?
+        ''', row)
+    else:
+        cursor.execute('''
+        INSERT INTO contacts (nickname, remark, avatar, alias, type, region, last_updated, extra_data, wxid)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', row)
+    conn.commit()
+    conn.close()
+
+
+def bench(update, count: int) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        # 一半是新联系人，一半是更新已有联系人
+        update({"wxid": f"wxid_{i % (count // 2 or 1)}", "nickname": f"联系人{i}"})
+    return count / (time.perf_counter() - start)
+
+
+def main(count: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        # 联系人数据库使用相对于当前目录的 database/contacts.db
+        os.chdir(tmp)
+        try:
+            from database import contacts_db
+            from loguru import logger
+
+            logger.remove()
+
+            legacy_path = os.path.join("database", "legacy.db")
+            before = bench(lambda contact: legacy_update_contact(legacy_path, contact), count)
+            after = bench(contacts_db.update_contact_in_db, count)
+            contacts_db._manager.close_all()
+        finally:
+            os.chdir(ROOT)
+
+    print(f"updates={count}")
+    print(f"  每次新建连接  : {before:8.1f} updates/s")
+    print(f"  共享连接+upsert: {after:8.1f} updates/s  ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
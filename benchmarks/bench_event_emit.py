@@ -0,0 +1,145 @@
+"""
+EventManager.emit 每个事件的内存分配与耗时对比
+
+对比旧的"每个处理函数 deepcopy 一次消息"和 CowMessage 写时复制视图。
+运行前先检查处理函数用 dict(message)、{**message} 复制后修改嵌套字段不会影响原消息和其他处理函数。
+
+用法: python benchmarks/bench_event_emit.py [处理函数数量...]
+"""
+import asyncio
+import base64
+import copy
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.event_manager import EventManager  # noqa: E402
+
+
+def make_image_message() -> dict:
+    """构造一条处理后的图片消息，Content 为约 2MB 图片的 base64"""
+    return {
+        "MsgId": 1234567890,
+        "FromWxid": "12345678@chatroom",
+        "ToWxid": "wxid_bot",
+        "SenderWxid": "wxid_sender",
+        "MsgType": 3,
+        "Content": base64.b64encode(os.urandom(2 * 1024 * 1024)).decode(),
+        "Status": 3,
+        "ImgStatus": 2,
+        "ImgBuf": {"iLen": 0},
+        "CreateTime": int(time.time()),
+        "MsgSource": "<msgsource><silence>1</silence><membercount>120</membercount>"
+                     "<signature>V1_abcdefg|v1_abcdefg</signature></msgsource>" * 4,
+        "PushContent": "",
+        "NewMsgId": 987654321987654321,
+        "MsgSeq": 1,
+        "IsGroup": True,
+        "Ats": [],
+        "Quote": {"MsgType": 1, "Content": "引用内容", "FromWxid": "wxid_other", "appattach": {"totallen": 0}},
+    }
+
+
+class _Plugin:
+    def __init__(self):
+        self.kept = []
+
+    async def handle(self, bot, message):
+        # 典型插件只读取少量顶层字段，这里保留消息引用以便统计每个事件分配的内存
+        _ = message["Content"][:16], message.get("FromWxid"), message.get("IsGroup")
+        self.kept.append(message)
+        return True
+
+
+async def _emit_deepcopy(handlers, api_client, message):
+    """旧实现：每个处理函数深拷贝一次消息"""
+    for handler in handlers:
+        await handler(api_client, copy.deepcopy(message))
+
+
+async def _measure(emit, plugins, rounds: int):
+    # 单个事件分配的内存
+    tracemalloc.start()
+    await emit()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    for plugin in plugins:
+        plugin.kept.clear()
+
+    # 平均耗时
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await emit()
+        for plugin in plugins:
+            plugin.kept.clear()
+    return (time.perf_counter() - start) / rounds, allocated
+
+
+async def bench(handler_count: int, rounds: int = 200):
+    message = make_image_message()
+    plugins = [_Plugin() for _ in range(handler_count)]
+    handlers = [p.handle for p in plugins]
+
+    EventManager._handlers["bench_event"] = [(p.handle, p, 50) for p in plugins]
+    try:
+        before = await _measure(lambda: _emit_deepcopy(handlers, None, message), plugins, rounds)
+        after = await _measure(lambda: EventManager.emit("bench_event", None, message), plugins, rounds)
+    finally:
+        EventManager._handlers.pop("bench_event", None)
+
+    print(f"handlers={handler_count:3d}  "
+          f"deepcopy: {before[0] * 1e6:8.1f} us/event, {before[1] / 1024:8.1f} KiB/event  |  "
+          f"CowMessage: {after[0] * 1e6:8.1f} us/event, {after[1] / 1024:8.1f} KiB/event")
+
+
+class _CopyingPlugin:
+    """通过 dict(message) / {**message} 复制消息后修改嵌套字段"""
+
+    async def handle(self, bot, message):
+        copied = {**message}
+        copied["Quote"]["Content"] = "被修改的引用"
+        copied["Ats"].append("wxid_injected")
+        copied = dict(message)
+        copied["ImgBuf"]["iLen"] = -1
+        return True
+
+
+class _ReadingPlugin:
+    def __init__(self):
+        self.seen = None
+
+    async def handle(self, bot, message):
+        self.seen = (message["Quote"]["Content"], list(message["Ats"]), message["ImgBuf"]["iLen"])
+        return True
+
+
+async def check_copy_isolation():
+    """回归检查：复制视图后修改嵌套字段不能影响原消息和后面的处理函数"""
+    message = make_image_message()
+    expected = (message["Quote"]["Content"], list(message["Ats"]), message["ImgBuf"]["iLen"])
+    copier, reader = _CopyingPlugin(), _ReadingPlugin()
+
+    EventManager._handlers["bench_copy"] = [(copier.handle, copier, 60), (reader.handle, reader, 50)]
+    try:
+        await EventManager.emit("bench_copy", None, message)
+    finally:
+        EventManager._handlers.pop("bench_copy", None)
+
+    original = (message["Quote"]["Content"], list(message["Ats"]), message["ImgBuf"]["iLen"])
+    assert original == expected, f"原消息被修改: {original}"
+    assert reader.seen == expected, f"其他处理函数看到了修改: {reader.seen}"
+    print("copy isolation: dict(view) / {**view} ok")
+
+
+async def main(counts):
+    await check_copy_isolation()
+    for count in counts:
+        await bench(count)
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [1, 5, 20, 40]
+    asyncio.run(main(counts))
@@ -0,0 +1,88 @@
+"""
+每次请求新建 ClientSession 与共用连接池的请求速率对比
+
+在本机启动一个模拟协议服务的 aiohttp 服务器，分别用两种方式请求 /VXAPI/Msg/Sync。
+
+用法: python benchmarks/bench_http_pool.py [请求数] [并发数]
+"""
+import asyncio
+import os
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from WechatAPI.http_pool import HttpSessionPool  # noqa: E402
+
+
+async def _sync_handler(request: web.Request) -> web.Response:
+    await request.json()
+    return web.json_response({"Success": True, "Data": {"AddMsgs": []}})
+
+
+async def start_stub_server() -> tuple:
+    app = web.Application()
+    app.router.add_post("/VXAPI/Msg/Sync", _sync_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, port
+
+
+async def request_new_session(url: str):
+    """旧实现：每次调用新建会话"""
+    async with aiohttp.ClientSession() as session:
+        response = await session.post(url, json={"Wxid": "wxid_bench", "Scene": 0, "Synckey": ""})
+        return await response.json()
+
+
+def make_pooled_request(pool: HttpSessionPool):
+    async def request_pooled(url: str):
+        async with pool.session() as session:
+            response = await session.post(url, json={"Wxid": "wxid_bench", "Scene": 0, "Synckey": ""})
+            return await response.json()
+    return request_pooled
+
+
+async def run(request, url: str, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await request(url)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def main(total: int, concurrency: int):
+    runner, port = await start_stub_server()
+    url = f"http://127.0.0.1:{port}/VXAPI/Msg/Sync"
+    pool = HttpSessionPool()
+    try:
+        # 预热
+        await run(request_new_session, url, 20, concurrency)
+        await run(make_pooled_request(pool), url, 20, concurrency)
+
+        before = await run(request_new_session, url, total, concurrency)
+        after = await run(make_pooled_request(pool), url, total, concurrency)
+    finally:
+        await pool.close()
+        await runner.cleanup()
+
+    print(f"requests={total} concurrency={concurrency}")
+    print(f"  新建会话: {before:8.1f} req/s")
+    print(f"  连接池  : {after:8.1f} req/s  ({after / before:.1f}x)")
+    print(f"  连接池统计: {pool.get_stats()}")
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    asyncio.run(main(total, concurrency))
@@ -0,0 +1,110 @@
+"""
+聊天记录关键词查询和过期清理耗时：单表 LIKE + DELETE 与 按天分区 + FTS5 + 删除分区文件 对比
+
+在临时目录中创建独立的数据库文件，不影响机器人数据。
+
+用法: python benchmarks/bench_message_archive.py [消息数] [天数]
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORDS = ["今天", "天气", "不错", "晚上", "一起", "吃饭", "开会", "项目", "进度", "周报", "机器人", "签到", "积分", "抽奖"]
+KEYWORD = "项目进度"
+CHAT = "12345678@chatroom"
+
+
+def make_rows(count: int, days: int) -> list:
+    random.seed(0)
+    now = time.time()
+    rows = []
+    for i in range(count):
+        rows.append({
+            "msg_id": i,
+            "sender_wxid": f"wxid_{i % 200}",
+            "from_wxid": CHAT if i % 10 == 0 else f"{i % 500}@chatroom",
+            "msg_type": 1,
+            "content": "".join(random.choices(WORDS, k=8)),
+            # 从 days 天前均匀分布到现在
+            "timestamp": now - days * 86400 + i * days * 86400 / count,
+            "is_group": 1,
+        })
+    return rows
+
+
+def bench_legacy(path: str, rows: list, cutoff: float) -> tuple:
+    """旧实现：所有消息在一张表中，按单列建索引"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+    CREATE TABLE messages (id INTEGER PRIMARY KEY, msg_id INTEGER, sender_wxid TEXT, from_wxid TEXT,
+        msg_type INTEGER, content TEXT, timestamp REAL, is_group INTEGER)
+    ''')
+    for column in ("msg_id", "sender_wxid", "from_wxid", "timestamp"):
+        conn.execute(f"CREATE INDEX idx_{column} ON messages ({column})")
+    with conn:
+        conn.executemany('''
+        INSERT INTO messages (msg_id, sender_wxid, from_wxid, msg_type, content, timestamp, is_group)
+        VALUES (:msg_id, :sender_wxid, :from_wxid, :msg_type, :content, :timestamp, :is_group)
+        ''', rows)
+
+    start = time.perf_counter()
+    found = conn.execute(
+        "SELECT * FROM messages WHERE from_wxid = ? AND content LIKE ? ORDER BY timestamp DESC LIMIT 50",
+        (CHAT, f"%{KEYWORD}%")).fetchall()
+    query = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with conn:
+        conn.execute("DELETE FROM messages WHERE timestamp < ?", (cutoff,))
+    cleanup = time.perf_counter() - start
+    conn.close()
+    return query, cleanup, len(found)
+
+
+async def bench_archive(directory: str, rows: list, days: int) -> tuple:
+    from database.message_archive import MessageArchive
+
+    archive = MessageArchive(directory=directory, partition="day", retention_days=days - 1)
+    for i in range(0, len(rows), 5000):
+        await archive.append(rows[i:i + 5000])
+
+    start = time.perf_counter()
+    result = await archive.query(from_wxid=CHAT, keyword=KEYWORD, limit=50)
+    query = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await archive.apply_retention()
+    cleanup = time.perf_counter() - start
+    await archive.close()
+    return query, cleanup, len(result["messages"])
+
+
+async def main(count: int, days: int):
+    rows = make_rows(count, days)
+    cutoff = time.time() - (days - 1) * 86400
+    with tempfile.TemporaryDirectory() as tmp:
+        # 导入 database 包会在当前目录创建联系人数据库
+        os.chdir(tmp)
+        try:
+            legacy = bench_legacy(os.path.join(tmp, "legacy.db"), rows, cutoff)
+            archive = await bench_archive(os.path.join(tmp, "archive"), rows, days)
+        finally:
+            os.chdir(ROOT)
+
+    print(f"messages={count} days={days}")
+    print(f"  关键词查询  单表LIKE: {legacy[0] * 1000:8.2f} ms ({legacy[2]}条)")
+    print(f"              FTS5分区: {archive[0] * 1000:8.2f} ms ({archive[2]}条)  ({legacy[0] / archive[0]:.1f}x)")
+    print(f"  过期清理    DELETE  : {legacy[1] * 1000:8.2f} ms")
+    print(f"              删除分区: {archive[1] * 1000:8.2f} ms  ({legacy[1] / archive[1]:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 7))
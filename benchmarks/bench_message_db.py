@@ -0,0 +1,79 @@
+"""
+MessageDB.save_message 每秒写入消息数：逐条提交 与 write-behind 批量写入 对比
+
+在临时目录中创建独立的 message.db，不影响机器人数据。
+运行前先检查 write-behind 缓冲区中的消息在 stop() 时全部写入，不会丢失。
+
+用法: python benchmarks/bench_message_db.py [消息数]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+async def bench(db, count: int, write_behind: bool) -> float:
+    db.write_behind = write_behind
+    start = time.perf_counter()
+    for i in range(count):
+        await db.save_message(msg_id=i, sender_wxid="wxid_sender", from_wxid="12345678@chatroom",
+                              msg_type=1, content=f"测试消息 {i}", is_group=True)
+    # 计入把缓冲区写完的时间
+    await db.flush()
+    return count / (time.perf_counter() - start)
+
+
+async def check_drain_on_stop(db, count: int):
+    """回归检查：保存 count 条消息后立即 stop()，数据库中应正好有 count 条"""
+    from sqlalchemy import func, select
+    from database.messsagDB import Message
+
+    db.write_behind = True
+    for i in range(count):
+        await db.save_message(msg_id=i, sender_wxid="wxid_sender", from_wxid="12345678@chatroom",
+                              msg_type=1, content=f"测试消息 {i}", is_group=True)
+        if i % 100 == 0:
+            # 让后台写入任务在 stop() 时正处于写入中
+            await asyncio.sleep(0)
+    await db.stop()
+
+    async with db.engine.connect() as conn:
+        rows = (await conn.execute(select(func.count()).select_from(Message))).scalar_one()
+    assert rows == count, f"stop() 后只写入了 {rows}/{count} 条消息，统计: {db.get_stats()}"
+    async with db.engine.begin() as conn:
+        await conn.execute(Message.__table__.delete())
+    print(f"drain on stop: {rows}/{count} ok")
+
+
+async def main(count: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        # MessageDB 从当前目录的 main_config.toml 读取数据库地址
+        os.chdir(tmp)
+        with open("main_config.toml", "w", encoding="utf-8") as f:
+            f.write('[XYBot]\nmsgDB-url = "sqlite+aiosqlite:///message.db"\n')
+
+        from database.messsagDB import MessageDB
+
+        db = MessageDB()
+        await db.initialize()
+        try:
+            await check_drain_on_stop(db, count)
+            before = await bench(db, count, write_behind=False)
+            after = await bench(db, count, write_behind=True)
+            stats = db.get_stats()
+        finally:
+            await db.close()
+            os.chdir(ROOT)
+
+    print(f"messages={count}")
+    print(f"  逐条提交    : {before:8.1f} msg/s")
+    print(f"  write-behind: {after:8.1f} msg/s  ({after / before:.1f}x)")
+    print(f"  写入统计: {stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -0,0 +1,77 @@
+"""
+XYBotDB 查询时的事件循环卡顿：同步接口 与 异步接口 对比
+
+一个计时任务每 1ms 醒来一次，记录实际醒来时间与预期的最大偏差（事件循环卡顿），
+同时并发执行大量积分查询。在临时目录中创建独立的 xybot.db，不影响机器人数据。
+
+用法: python benchmarks/bench_xybotdb_loop_stall.py [查询数] [并发数]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+async def ticker(stop: asyncio.Event, interval: float = 0.001) -> float:
+    """返回计时期间事件循环的最大卡顿（秒）"""
+    max_lag = 0.0
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, time.perf_counter() - expected)
+    return max_lag
+
+
+async def bench(query, total: int, concurrency: int) -> tuple:
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(stop))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await query(f"wxid_{i % 100}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return total / elapsed, await tick_task
+
+
+async def main(total: int, concurrency: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        # XYBotDB 从当前目录的 main_config.toml 读取数据库地址
+        os.chdir(tmp)
+        with open("main_config.toml", "w", encoding="utf-8") as f:
+            f.write('[XYBot]\nXYBotDB-url = "sqlite:///xybot.db"\n')
+
+        from database.XYBotDB import XYBotDB
+
+        db = XYBotDB()
+        try:
+            for i in range(100):
+                db.set_points(f"wxid_{i}", i)
+
+            async def sync_query(wxid: str):
+                # 旧用法：在异步处理函数里直接调用同步接口
+                return db.get_points(wxid)
+
+            before = await bench(sync_query, total, concurrency)
+            after = await bench(db.aget_points, total, concurrency)
+        finally:
+            db.engine.dispose()
+            os.chdir(ROOT)
+
+    print(f"queries={total} concurrency={concurrency}")
+    print(f"  同步接口: {before[0]:8.1f} q/s  最大卡顿 {before[1] * 1000:7.2f} ms")
+    print(f"  异步接口: {after[0]:8.1f} q/s  最大卡顿 {after[1] * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    asyncio.run(main(total, concurrency))
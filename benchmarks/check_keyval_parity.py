@@ -0,0 +1,86 @@
+"""
+KeyvalDB 的 SQLite 与 Redis 后端行为一致性检查
+
+用同一组 set/expire/ttl/keys 操作分别驱动 SQLiteKeyvalBackend（临时目录中的独立数据库）
+和使用 fakeredis 的 RedisKeyvalBackend，逐步比较两边的返回值。需要安装 fakeredis。
+
+用法: python benchmarks/check_keyval_parity.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+async def run_steps(backend) -> list:
+    """返回每一步的 (操作, 结果)"""
+    results = []
+
+    async def step(name, coro):
+        results.append((name, await coro))
+
+    await step("set a", backend.set("a", "1"))
+    await step("ttl a", backend.ttl("a"))
+    await step("set b ex=100", backend.set("b", "2", ex=100))
+    await step("ttl b", backend.ttl("b"))
+    await step("expire b 50s", backend.expire("b", timedelta(seconds=50)))
+    await step("ttl b", backend.ttl("b"))
+    await step("set d ex=0", backend.set("d", "4", ex=0))
+    await step("ttl d", backend.ttl("d"))
+
+    await step("ttl missing", backend.ttl("missing"))
+    await step("expire missing", backend.expire("missing", 10))
+
+    # 过期时间为0时键立即过期
+    await step("expire a 0", backend.expire("a", 0))
+    await step("get a", backend.get("a"))
+    await step("ttl a", backend.ttl("a"))
+
+    # 已过期的键不能被 expire 恢复
+    await step("set c ex=1", backend.set("c", "3", ex=1))
+    await asyncio.sleep(1.2)
+    await step("get c", backend.get("c"))
+    await step("ttl c", backend.ttl("c"))
+    await step("expire c 10", backend.expire("c", 10))
+    await step("get c", backend.get("c"))
+    await step("exists c", backend.exists("c"))
+
+    results.append(("keys *", sorted(await backend.keys("*"))))
+    return results
+
+
+async def main() -> int:
+    try:
+        from fakeredis import aioredis as fake_aioredis
+    except ImportError:
+        print("未安装 fakeredis，请执行 pip install fakeredis")
+        return 1
+
+    from database.keyvalDB import RedisKeyvalBackend, SQLiteKeyvalBackend
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite = SQLiteKeyvalBackend(f"sqlite+aiosqlite:///{os.path.join(tmp, 'keyval.db')}")
+        redis = RedisKeyvalBackend(fake_aioredis.FakeRedis(decode_responses=True))
+        await sqlite.initialize()
+        await redis.initialize()
+        try:
+            sqlite_results, redis_results = await asyncio.gather(run_steps(sqlite), run_steps(redis))
+        finally:
+            await sqlite.close()
+            await redis.close()
+
+    mismatches = 0
+    for (name, sqlite_value), (_, redis_value) in zip(sqlite_results, redis_results):
+        same = sqlite_value == redis_value
+        mismatches += not same
+        print(f"{'ok ' if same else 'DIFF'} {name:16s} sqlite={sqlite_value!r:12} redis={redis_value!r}")
+    print("parity ok" if not mismatches else f"{mismatches} 处不一致")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
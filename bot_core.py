@@ -10,11 +10,20 @@ from pathlib import Path
 from loguru import logger
 
 import WechatAPI
+from WechatAPI.http_pool import HttpSessionPool
+from WechatAPI.send_scheduler import SendScheduler
 from database.XYBotDB import XYBotDB
 from database.keyvalDB import KeyvalDB
 from database.messsagDB import MessageDB
+from utils.contact_cache import contact_cache
+from utils.system_metrics import system_metrics
+from utils.log_stream import log_stream
+from utils.bot_status import bot_status_registry
 from utils.decorators import scheduler
+from utils.event_manager import EventManager
+from utils.message_dispatcher import MessageDispatcher, conversation_key
 from utils.plugin_manager import plugin_manager
+from utils.sync_scheduler import SyncScheduler
 from utils.xybot import XYBot
 from utils.notification_service import init_notification_service, get_notification_service
 
@@ -47,52 +56,14 @@ try:
             logger.warning("api_service.server.set_bot_instance未导入，调用被忽略")
             return None
 
-    # 直接定义状态更新函数，不依赖导入
+    # 状态保存在进程内的状态注册表中，管理后台和自动重启监控直接读取
     def update_bot_status(status, details=None, extra_data=None):
         """更新bot状态，供管理后台读取"""
         try:
-            # 使用统一的路径写入状态文件 - 修复路径问题
-            status_file = Path(admin_path) / "admin" / "bot_status.json"
-            root_status_file = Path(admin_path) / "bot_status.json"
-
-            # 读取当前状态
-            current_status = {}
-            if status_file.exists():
-                with open(status_file, "r", encoding="utf-8") as f:
-                    current_status = json.load(f)
-
-            # 更新状态
-            current_status["status"] = status
-            current_status["timestamp"] = time.time()
-            if details:
-                current_status["details"] = details
-
-            # 添加额外数据
-            if extra_data and isinstance(extra_data, dict):
-                for key, value in extra_data.items():
-                    current_status[key] = value
-
-            # 确保目录存在
-            status_file.parent.mkdir(parents=True, exist_ok=True)
-
-            # 写入status_file
-            with open(status_file, "w", encoding="utf-8") as f:
-                json.dump(current_status, f)
-
-            # 写入root_status_file
-            with open(root_status_file, "w", encoding="utf-8") as f:
-                json.dump(current_status, f)
-
-            logger.debug(f"成功更新bot状态: {status}, 路径: {status_file} 和 {root_status_file}")
-
-            # 输出更多调试信息
-            if "nickname" in current_status:
-                logger.debug(f"状态文件包含昵称: {current_status['nickname']}")
-            if "wxid" in current_status:
-                logger.debug(f"状态文件包含微信ID: {current_status['wxid']}")
-            if "alias" in current_status:
-                logger.debug(f"状态文件包含微信号: {current_status['alias']}")
-
+            if not isinstance(extra_data, dict):
+                extra_data = None
+            bot_status_registry.update(status, details, extra_data)
+            logger.debug(f"成功更新bot状态: {status}")
         except Exception as e:
             logger.error(f"更新bot状态失败: {e}")
 
@@ -222,6 +193,10 @@ async def bot_core():
 
     # 设置客户端属性
     bot.ignore_protect = config.get("XYBot", {}).get("ignore-protection", False)
+    # 发送队列限速和连接池设置
+    bot.send_scheduler = SendScheduler.from_config(config)
+    bot.send_scheduler.bind(asyncio.get_running_loop())
+    bot.http_pool = HttpSessionPool.from_config(config)
 
     # 等待WechatAPI服务启动
     # time_out = 30  # 增加超时时间
@@ -398,24 +373,6 @@ async def bot_core():
                         "timestamp": time.time()
                     })
 
-                    # 检查状态文件是否正确更新
-                    try:
-                        status_file = script_dir / "admin" / "bot_status.json"
-                        if status_file.exists():
-                            with open(status_file, "r", encoding="utf-8") as f:
-                                current_status = json.load(f)
-                                if current_status.get("qrcode_url") != url:
-                                    logger.warning("状态文件中的二维码URL与实际不符，尝试重新更新状态")
-                                    # 再次更新状态
-                                    update_bot_status("waiting_login", "等待微信扫码登录", {
-                                        "qrcode_url": url,
-                                        "uuid": uuid,
-                                        "expires_in": 240,
-                                        "timestamp": time.time()
-                                    })
-                    except Exception as e:
-                        logger.error(f"检查状态文件失败: {e}")
-
                 # 显示倒计时
                 logger.info("等待登录中，过期倒计时：240")
 
@@ -558,10 +515,35 @@ async def bot_core():
     scheduler.start()
     logger.success("定时任务已启动")
 
+    # 事件分发设置（并行处理函数超时等）
+    EventManager.configure(config)
+
+    # 联系人缓存设置
+    contact_cache.configure(config)
+
+    # 系统指标采样（管理后台的系统状态接口读取采样结果）
+    system_metrics.configure(config)
+
+    # 管理后台实时日志流的缓冲区大小
+    log_stream.configure(config)
+
     # 加载插件目录下的所有插件
     loaded_plugins = await plugin_manager.load_plugins_from_directory(bot, load_disabled_plugin=False)
     logger.success(f"已加载插件: {loaded_plugins}")
 
+    # 消息同步间隔调度：有消息立即再拉，空闲或失败时指数退避
+    sync_scheduler = SyncScheduler.from_config(config)
+    xybot.sync_scheduler = sync_scheduler
+
+    # 启动消息分发队列，限制同时处理的消息数，同一会话的消息按顺序处理
+    dispatcher = MessageDispatcher.from_config(
+        config, xybot.process_message,
+        key_func=lambda message: conversation_key(message, bot.wxid),
+        on_dispatch=sync_scheduler.record_ingest
+    )
+    dispatcher.start()
+    xybot.dispatcher = dispatcher
+
     # ========== 开始接受消息 ========== #
 
     # 先接受堆积消息
@@ -587,7 +569,8 @@ async def bot_core():
     # 启动自动重启监控器
     try:
         from utils.auto_restart import start_auto_restart_monitor
-        start_auto_restart_monitor()
+        # 监控器直接读取同步健康状态（连续失败次数、最后同步成功时间等）
+        start_auto_restart_monitor(sync_scheduler)
         logger.success("自动重启监控器已启动")
     except Exception as e:
         logger.error(f"启动自动重启监控器失败: {e}")
@@ -598,75 +581,74 @@ async def bot_core():
     message_failure_count = 0
     max_failure_count = 3  # 连续失败超过这个数量则认为离线
     is_offline = False
+    offline_notified = False  # 是否已经发送过离线通知，重新连上后重置
 
-    while True:
-        # 不需要记录当前时间
+    try:
+        while True:
+            # 不需要记录当前时间
 
-        try:
-            ok,data = await bot.sync_message()
+            try:
+                ok,data = await bot.sync_message()
+
+                # 如果成功获取消息，重置失败计数
+                if ok:
+                    # 如果之前处于离线状态，现在恢复了，发送重连通知
+                    if (is_offline or offline_notified) and message_failure_count > 0:
+                        is_offline = False
+                        offline_notified = False
+                        message_failure_count = 0
+
+                        # 发送重连通知
+                        notification_service = get_notification_service()
+                        if notification_service and notification_service.enabled and notification_service.triggers.get("reconnect", False):
+                            if notification_service.token:
+                                logger.info(f"发送微信重连通知，微信ID: {bot.wxid}")
+                                asyncio.create_task(notification_service.send_reconnect_notification(bot.wxid))
+                            else:
+                                logger.warning("PushPlus Token未设置，无法发送重连通知")
+
+                    # 正常情况下重置计数器
+                    if message_failure_count > 0:
+                        message_failure_count = 0
 
-            # 如果成功获取消息，重置失败计数
-            if ok:
-                # 如果之前处于离线状态，现在恢复了，发送重连通知
-                if is_offline and message_failure_count > 0:
-                    is_offline = False
-                    message_failure_count = 0
+            except Exception as e:
+                logger.warning("获取新消息失败 {}", e)
+                # 增加失败计数
+                message_failure_count += 1
 
-                    # 发送重连通知
-                    notification_service = get_notification_service()
-                    if notification_service and notification_service.enabled and notification_service.triggers.get("reconnect", False):
-                        if notification_service.token:
-                            logger.info(f"发送微信重连通知，微信ID: {bot.wxid}")
-                            asyncio.create_task(notification_service.send_reconnect_notification(bot.wxid))
-                        else:
-                            logger.warning("PushPlus Token未设置，无法发送重连通知")
+                # 如果连续失败超过阈值，标记为离线状态
+                if message_failure_count >= max_failure_count and not is_offline:
+                    is_offline = True
+                    logger.warning(f"连续 {message_failure_count} 次获取消息失败，微信可能已离线")
 
-                # 正常情况下重置计数器
-                if message_failure_count > 0:
-                    message_failure_count = 0
+                # 等待一段时间后重试，连续失败时逐步拉长等待时间
+                retry_delay = sync_scheduler.on_failure(e)
+                logger.info("{:.1f}秒后继续尝试获取消息", retry_delay)
+                await asyncio.sleep(retry_delay)
+                continue
 
-        except Exception as e:
-            logger.warning("获取新消息失败 {}", e)
-            # 增加失败计数
-            message_failure_count += 1
-
-            # 如果连续失败超过阈值，标记为离线状态
-            if message_failure_count >= max_failure_count and not is_offline:
-                is_offline = True
-                logger.warning(f"连续 {message_failure_count} 次获取消息失败，微信可能已离线")
-
-            # 等待一段时间后重试
-            await asyncio.sleep(5)
-            logger.info("5秒后继续尝试获取消息")
-            continue
-
-            # 以下代码已注释，不再自动重新登录
-            # update_bot_status("waiting_login", "等待微信登录")
-            # 清除所有定时任务
-            # scheduler.remove_all_jobs()
-            # logger.success("所有定时任务已清除")
-            # await bot_core()
-            # break
-
-        # 如果成功获取消息但没有数据，处理消息数据
-
-        # 检查data是否为字典类型
-        if isinstance(data, dict):
-            messages = data.get("AddMsgs")
-            if messages:
-                for message in messages:
-                    asyncio.create_task(xybot.process_message(message))
-        elif data:  # 如果data不是字典但有值，记录日志
-            logger.warning(f"Unexpected data type: {type(data)}, value: {data}")
-
-            # 检测特定的错误消息
-            if isinstance(data, str) and "用户可能退出" in data:
-                # 如果检测到用户退出消息，增加失败计数
+                # 以下代码已注释，不再自动重新登录
+                # update_bot_status("waiting_login", "等待微信登录")
+                # 清除所有定时任务
+                # scheduler.remove_all_jobs()
+                # logger.success("所有定时任务已清除")
+                # await bot_core()
+                # break
+
+            messages = None
+            if not ok:
+                # 协议返回失败（包括没有错误信息的情况），计入连续失败
+                logger.warning("获取新消息失败 {}", data)
                 message_failure_count += 1
 
                 # 如果连续失败超过阈值，标记为离线状态
                 if message_failure_count >= max_failure_count and not is_offline:
                     is_offline = True
+                    logger.warning(f"连续 {message_failure_count} 次获取消息失败，微信可能已离线")
+
+                # 检测到用户退出消息时发送离线通知并更新状态，与连续失败次数无关，每次离线只通知一次
+                if isinstance(data, str) and "用户可能退出" in data and not offline_notified:
+                    offline_notified = True
                     logger.warning(f"检测到用户退出消息，微信可能已离线")
 
                     # 发送离线通知
@@ -680,8 +662,28 @@ async def bot_core():
 
                     # 更新状态为离线
                     update_bot_status("offline", "微信已离线")
-        # 使用异步睡眠替代忙等待循环
-        await asyncio.sleep(0.5)
+            elif isinstance(data, dict):
+                # 检查data是否为字典类型
+                messages = data.get("AddMsgs")
+                if messages:
+                    for message in messages:
+                        # 队列满时这里会等待（背压），或按配置丢弃消息
+                        await dispatcher.submit(message)
+            elif data:  # 如果data不是字典但有值，记录日志
+                logger.warning(f"Unexpected data type: {type(data)}, value: {data}")
+
+            # 有新消息时立即继续同步，空闲或失败时按退避间隔等待
+            if not ok:
+                delay = sync_scheduler.on_failure(data or "同步消息失败")
+            else:
+                delay = sync_scheduler.on_messages(len(messages) if messages else 0)
+            if delay > 0:
+                await asyncio.sleep(delay)
+    finally:
+        # 退出时停止消息分发，写入缓冲中的消息记录并关闭连接池
+        await dispatcher.stop(drain=False)
+        await message_db.stop()
+        await bot.close()
 
     # 返回机器人实例（此处不会执行到，因为上面的无限循环）
     return xybot
\ No newline at end of file
@@ -1,15 +1,18 @@
+import asyncio
 import datetime
+import functools
 import tomllib
 from concurrent.futures import ThreadPoolExecutor
 from typing import Union
 
 from loguru import logger
-from sqlalchemy import Column, String, Integer, DateTime, create_engine, JSON, Boolean
+from sqlalchemy import Column, String, Integer, DateTime, create_engine, JSON, Boolean, event
 from sqlalchemy import update
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from database.cache import ReadThroughCache
 from utils.singleton import Singleton
 
 Base = declarative_base()
@@ -20,7 +23,7 @@ class User(Base):
 
     wxid = Column(String(20), primary_key=True, nullable=False, unique=True, index=True, autoincrement=False,
                   comment='wxid')
-    points = Column(Integer, nullable=False, default=0, comment='points')
+    points = Column(Integer, nullable=False, default=0, index=True, comment='points')
     signin_stat = Column(DateTime, nullable=False, default=datetime.datetime.fromtimestamp(0), comment='signin_stat')
     signin_streak = Column(Integer, nullable=False, default=0, comment='signin_streak')
     whitelist = Column(Boolean, nullable=False, default=False, comment='whitelist')
@@ -37,23 +40,51 @@ class Chatroom(Base):
 
 
 class XYBotDB(metaclass=Singleton):
+    # 批量查询时每条 IN (...) 语句最多包含的 wxid 数，低于 SQLite 的变量数量上限
+    IN_CHUNK_SIZE = 500
+
     def __init__(self):
         with open("main_config.toml", "rb") as f:
             main_config = tomllib.load(f)
 
         self.database_url = main_config["XYBot"]["XYBotDB-url"]
-        self.engine = create_engine(self.database_url)
+        db_config = main_config.get("XYBotDB", {})
+        pool_size = max(1, int(db_config.get("pool-size", 4)))
+        busy_timeout = int(db_config.get("busy-timeout", 5000))
+        # 积分、白名单、LLM 会话ID 的读缓存，写操作提交后失效
+        self.cache = ReadThroughCache(max_size=db_config.get("cache-size", 10000),
+                                      ttl=db_config.get("cache-ttl", 300))
+
+        if self.database_url.startswith("sqlite"):
+            # 连接会在线程池的不同线程间复用
+            self.engine = create_engine(self.database_url, pool_size=pool_size, max_overflow=pool_size,
+                                        connect_args={"check_same_thread": False})
+
+            @event.listens_for(self.engine, "connect")
+            def _set_sqlite_pragma(dbapi_connection, connection_record):
+                # WAL 模式下读操作不会被写操作阻塞
+                cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+                cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+                cursor.close()
+        else:
+            self.engine = create_engine(self.database_url, pool_size=pool_size, max_overflow=pool_size)
         self.DBSession = sessionmaker(bind=self.engine)
 
         # 创建表
         Base.metadata.create_all(self.engine)
+        # create_all 不会给已存在的表补建索引（如 points 索引），这里单独检查
+        for index in User.__table__.indexes:
+            index.create(self.engine, checkfirst=True)
         logger.success("数据库初始化成功")
 
-        # 创建线程池执行器
+        # 写操作在单线程中顺序执行，保证积分等读改写操作不会互相覆盖；读操作使用多个线程并发执行
         self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database")
+        self.read_executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="database-read")
 
     def _execute_in_queue(self, method, *args, **kwargs):
-        """在队列中执行数据库操作"""
+        """在写队列中执行数据库操作（同步接口，会阻塞调用方直到完成）"""
         future = self.executor.submit(method, *args, **kwargs)
         try:
             return future.result(timeout=20)  # 20秒超时
@@ -61,6 +92,21 @@ class XYBotDB(metaclass=Singleton):
             logger.error(f"数据库操作失败: {method.__name__} - {str(e)}")
             raise
 
+    async def _write(self, method, *args):
+        """在写队列中执行数据库操作，不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(self.executor, functools.partial(method, *args)), timeout=20)
+        except Exception as e:
+            logger.error(f"数据库操作失败: {method.__name__} - {str(e)}")
+            raise
+
+    async def _read(self, method, *args):
+        """在读线程池中执行数据库查询，不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.read_executor, functools.partial(method, *args))
+
     # USER
 
     def add_points(self, wxid: str, num: int) -> bool:
@@ -90,6 +136,7 @@ class XYBotDB(metaclass=Singleton):
             return False
         finally:
             session.close()
+            self.cache.invalidate(("points", wxid))
 
     def set_points(self, wxid: str, num: int) -> bool:
         """Thread-safe point setting"""
@@ -116,13 +163,17 @@ class XYBotDB(metaclass=Singleton):
             return False
         finally:
             session.close()
+            self.cache.invalidate(("points", wxid))
 
     def get_points(self, wxid: str) -> int:
         """Get user points"""
-        return self._execute_in_queue(self._get_points, wxid)
+        return self._get_points(wxid)
 
     def _get_points(self, wxid: str) -> int:
         """Get user points"""
+        return self.cache.get_or_load(("points", wxid), lambda: self._load_points(wxid))
+
+    def _load_points(self, wxid: str) -> int:
         session = self.DBSession()
         try:
             user = session.query(User).filter_by(wxid=wxid).first()
@@ -132,7 +183,7 @@ class XYBotDB(metaclass=Singleton):
 
     def get_signin_stat(self, wxid: str) -> datetime.datetime:
         """获取用户签到状态"""
-        return self._execute_in_queue(self._get_signin_stat, wxid)
+        return self._get_signin_stat(wxid)
 
     def _get_signin_stat(self, wxid: str) -> datetime.datetime:
         session = self.DBSession()
@@ -188,6 +239,42 @@ class XYBotDB(metaclass=Singleton):
         finally:
             session.close()
 
+    def get_points_many(self, wxids: list) -> dict:
+        """批量获取用户积分，返回 {wxid: 积分}，没有记录的用户为0"""
+        wxids = list(dict.fromkeys(wxids))
+        result = dict.fromkeys(wxids, 0)
+        session = self.DBSession()
+        try:
+            for i in range(0, len(wxids), self.IN_CHUNK_SIZE):
+                chunk = wxids[i:i + self.IN_CHUNK_SIZE]
+                rows = session.query(User.wxid, User.points).filter(User.wxid.in_(chunk)).all()
+                result.update(rows)
+            return result
+        finally:
+            session.close()
+
+    def get_leaderboard_within(self, wxids: list, limit: int) -> list:
+        """获取指定用户（如某个群的成员）中积分最高的用户，积分为0的用户不参与排名
+
+        Returns:
+            [(wxid, 积分), ...]，按积分从高到低排序
+        """
+        wxids = list(dict.fromkeys(wxids))
+        data = []
+        session = self.DBSession()
+        try:
+            # 每段各取前 limit 名，合并后再取前 limit 名
+            for i in range(0, len(wxids), self.IN_CHUNK_SIZE):
+                chunk = wxids[i:i + self.IN_CHUNK_SIZE]
+                data.extend(session.query(User.wxid, User.points)
+                            .filter(User.wxid.in_(chunk), User.points != 0)
+                            .order_by(User.points.desc())
+                            .limit(limit).all())
+        finally:
+            session.close()
+        data.sort(key=lambda x: x[1], reverse=True)
+        return [(wxid, points) for wxid, points in data[:limit]]
+
     def get_leaderboard(self, count: int) -> list:
         """Get points leaderboard"""
         session = self.DBSession()
@@ -215,9 +302,13 @@ class XYBotDB(metaclass=Singleton):
             return False
         finally:
             session.close()
+            self.cache.invalidate(("whitelist", wxid))
 
     def get_whitelist(self, wxid: str) -> bool:
         """Get user's whitelist status"""
+        return self.cache.get_or_load(("whitelist", wxid), lambda: self._load_whitelist(wxid))
+
+    def _load_whitelist(self, wxid: str) -> bool:
         session = self.DBSession()
         try:
             user = session.query(User).filter_by(wxid=wxid).first()
@@ -271,6 +362,7 @@ class XYBotDB(metaclass=Singleton):
             return False
         finally:
             session.close()
+            self.cache.invalidate(("points", trader_wxid), ("points", target_wxid))
 
     def get_user_list(self) -> list:
         """Get list of all users"""
@@ -283,22 +375,23 @@ class XYBotDB(metaclass=Singleton):
 
     def get_llm_thread_id(self, wxid: str, namespace: str = None) -> Union[dict, str]:
         """Get LLM thread id for user or chatroom"""
+        thread_ids = self.cache.get_or_load(("llm", wxid), lambda: self._load_llm_thread_ids(wxid))
+        if namespace:
+            return thread_ids.get(namespace, "")
+        # 返回副本，避免调用方修改缓存中的字典
+        return dict(thread_ids)
+
+    def _load_llm_thread_ids(self, wxid: str) -> dict:
         session = self.DBSession()
         try:
             # Check if it's a chatroom ID
             if wxid.endswith("@chatroom"):
                 chatroom = session.query(Chatroom).filter_by(chatroom_id=wxid).first()
-                if namespace:
-                    return chatroom.llm_thread_id.get(namespace, "") if chatroom else ""
-                else:
-                    return chatroom.llm_thread_id if chatroom else {}
+                return dict(chatroom.llm_thread_id or {}) if chatroom else {}
             else:
                 # Regular user
                 user = session.query(User).filter_by(wxid=wxid).first()
-                if namespace:
-                    return user.llm_thread_id.get(namespace, "") if user else ""
-                else:
-                    return user.llm_thread_id if user else {}
+                return dict(user.llm_thread_id or {}) if user else {}
         finally:
             session.close()
 
@@ -340,6 +433,7 @@ class XYBotDB(metaclass=Singleton):
             return False
         finally:
             session.close()
+            self.cache.invalidate(("llm", wxid))
 
     def delete_all_llm_thread_id(self):
         """Clear llm thread id for everyone"""
@@ -355,10 +449,11 @@ class XYBotDB(metaclass=Singleton):
             return False
         finally:
             session.close()
+            self.cache.invalidate_where(lambda key: key[0] == "llm")
 
     def get_signin_streak(self, wxid: str) -> int:
         """Thread-safe get user's signin streak"""
-        return self._execute_in_queue(self._get_signin_streak, wxid)
+        return self._get_signin_streak(wxid)
 
     def _get_signin_streak(self, wxid: str) -> int:
         session = self.DBSession()
@@ -432,9 +527,83 @@ class XYBotDB(metaclass=Singleton):
         finally:
             session.close()
 
+    # 异步接口，插件的异步处理函数中应优先使用，避免查询数据库时阻塞事件循环
+
+    async def aadd_points(self, wxid: str, num: int) -> bool:
+        return await self._write(self._add_points, wxid, num)
+
+    async def aset_points(self, wxid: str, num: int) -> bool:
+        return await self._write(self._set_points, wxid, num)
+
+    async def aget_points(self, wxid: str) -> int:
+        return await self._read(self._get_points, wxid)
+
+    async def aget_signin_stat(self, wxid: str) -> datetime.datetime:
+        return await self._read(self._get_signin_stat, wxid)
+
+    async def aset_signin_stat(self, wxid: str, signin_time: datetime.datetime) -> bool:
+        return await self._write(self._set_signin_stat, wxid, signin_time)
+
+    async def areset_all_signin_stat(self) -> bool:
+        return await self._write(self.reset_all_signin_stat)
+
+    async def aget_leaderboard(self, count: int) -> list:
+        return await self._read(self.get_leaderboard, count)
+
+    async def aget_points_many(self, wxids: list) -> dict:
+        return await self._read(self.get_points_many, wxids)
+
+    async def aget_leaderboard_within(self, wxids: list, limit: int) -> list:
+        return await self._read(self.get_leaderboard_within, wxids, limit)
+
+    async def aset_whitelist(self, wxid: str, stat: bool) -> bool:
+        return await self._write(self.set_whitelist, wxid, stat)
+
+    async def aget_whitelist(self, wxid: str) -> bool:
+        return await self._read(self.get_whitelist, wxid)
+
+    async def aget_whitelist_list(self) -> list:
+        return await self._read(self.get_whitelist_list)
+
+    async def asafe_trade_points(self, trader_wxid: str, target_wxid: str, num: int) -> bool:
+        return await self._write(self._safe_trade_points, trader_wxid, target_wxid, num)
+
+    async def aget_user_list(self) -> list:
+        return await self._read(self.get_user_list)
+
+    async def aget_llm_thread_id(self, wxid: str, namespace: str = None) -> Union[dict, str]:
+        return await self._read(self.get_llm_thread_id, wxid, namespace)
+
+    async def asave_llm_thread_id(self, wxid: str, data: str, namespace: str) -> bool:
+        return await self._write(self.save_llm_thread_id, wxid, data, namespace)
+
+    async def adelete_all_llm_thread_id(self) -> bool:
+        return await self._write(self.delete_all_llm_thread_id)
+
+    async def aget_signin_streak(self, wxid: str) -> int:
+        return await self._read(self._get_signin_streak, wxid)
+
+    async def aset_signin_streak(self, wxid: str, streak: int) -> bool:
+        return await self._write(self._set_signin_streak, wxid, streak)
+
+    async def aget_chatroom_list(self) -> list:
+        return await self._read(self.get_chatroom_list)
+
+    async def aget_chatroom_members(self, chatroom_id: str) -> set:
+        return await self._read(self.get_chatroom_members, chatroom_id)
+
+    async def aset_chatroom_members(self, chatroom_id: str, members: set) -> bool:
+        return await self._write(self.set_chatroom_members, chatroom_id, members)
+
+    def get_cache_stats(self) -> dict:
+        """获取读缓存的命中统计"""
+        return self.cache.get_stats()
+
     def __del__(self):
         """确保关闭时清理资源"""
         if hasattr(self, 'executor'):
             self.executor.shutdown(wait=True)
+        if hasattr(self, 'read_executor'):
+            self.read_executor.shutdown(wait=True)
         if hasattr(self, 'engine'):
             self.engine.dispose()
@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+_MISSING = object()
+
+
+class ReadThroughCache:
+    """线程安全的 LRU + TTL 读穿缓存
+
+    - 未命中时调用 loader 从数据库读取并缓存，条目超过 ttl 秒或超出容量（最久未使用）时淘汰
+    - 写操作提交后调用 invalidate 使缓存失效
+    - 读取数据库期间如果发生了失效（其他线程写入），读到的可能是旧值，不写入缓存，
+      避免旧值覆盖写入后的结果
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0):
+        """
+        Args:
+            max_size: 最大条目数，0 表示不缓存
+            ttl: 条目有效期（秒），0 表示不过期
+        """
+        self.max_size = max(0, int(max_size))
+        self.ttl = max(0.0, float(ttl))
+
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # 每次失效都会增加，用来判断读取期间是否发生过写入
+        self._epoch = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """获取缓存值，未命中时调用 loader 读取并缓存"""
+        if not self.enabled:
+            return loader()
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires = entry
+                if not expires or expires > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            epoch = self._epoch
+
+        value = loader()
+
+        with self._lock:
+            if self._epoch == epoch:
+                self._data[key] = (value, now + self.ttl if self.ttl else 0)
+                self._data.move_to_end(key)
+                while len(self._data) > self.max_size:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def invalidate(self, *keys: Hashable):
+        """使指定的键失效"""
+        with self._lock:
+            self._epoch += 1
+            self.invalidations += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]):
+        """使满足条件的键失效，用于批量更新（如清空所有 LLM 会话）"""
+        with self._lock:
+            self._epoch += 1
+            self.invalidations += 1
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._data.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -1,10 +1,11 @@
 import os
 import json
 import time
-import sqlite3
 from datetime import datetime
 from loguru import logger
 
+from database.sqlite_pool import get_connection_manager
+
 # 数据库文件路径
 DB_PATH = os.path.join("database", "contacts.db")
 
@@ -12,14 +13,45 @@ def ensure_db_dir():
     """确保数据库目录存在"""
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
-def create_contacts_table():
-    """创建联系人表"""
-    ensure_db_dir()
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # 创建联系人表
-    cursor.execute('''
+# 所有函数共用的连接管理器（与群成员数据库共用同一个文件）
+_manager = get_connection_manager(DB_PATH)
+
+# 基本字段之外的字段保存在 extra_data 中
+BASE_FIELDS = ("wxid", "nickname", "remark", "avatar", "alias", "type", "region")
+
+SELECT_COLUMNS = "wxid, nickname, remark, avatar, alias, type, region, last_updated, extra_data"
+
+UPSERT_CONTACT_SQL = '''
+INSERT INTO contacts
+(wxid, nickname, remark, avatar, alias, type, region, last_updated, extra_data)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(wxid) DO UPDATE SET
+    nickname = excluded.nickname,
+    remark = excluded.remark,
+    avatar = excluded.avatar,
+    alias = excluded.alias,
+    type = excluded.type,
+    region = excluded.region,
+    last_updated = excluded.last_updated,
+    extra_data = excluded.extra_data
+'''
+
+# 联系人写入或删除后的回调，参数为受影响的wxid列表（如进程内的联系人缓存）
+_write_listeners = []
+
+def add_write_listener(callback):
+    """注册联系人写入回调"""
+    _write_listeners.append(callback)
+
+def _notify_write(wxids):
+    for callback in _write_listeners:
+        try:
+            callback(wxids)
+        except Exception as e:
+            logger.warning(f"联系人写入回调失败: {str(e)}")
+
+def _create_contacts_schema(conn):
+    conn.execute('''
     CREATE TABLE IF NOT EXISTS contacts (
         wxid TEXT PRIMARY KEY,
         nickname TEXT,
@@ -33,9 +65,62 @@ def create_contacts_table():
     )
     ''')
 
-    conn.commit()
-    conn.close()
-    logger.info("联系人数据表创建完成")
+def create_contacts_table():
+    """创建联系人表，只在第一次调用时执行建表语句"""
+    if _manager.ensure_schema("contacts", _create_contacts_schema):
+        logger.info("联系人数据表创建完成")
+
+def _contact_to_row(contact, current_time):
+    """把联系人字典转换为 contacts 表的一行"""
+    wxid = contact.get("wxid", "")
+
+    # 确定联系人类型
+    contact_type = contact.get("type", "")
+    if not contact_type:
+        if wxid.endswith("@chatroom"):
+            contact_type = "group"
+        elif wxid.startswith("gh_"):
+            contact_type = "official"
+        else:
+            contact_type = "friend"
+
+    # 将其他字段存储为JSON
+    extra_data = {key: value for key, value in contact.items() if key not in BASE_FIELDS}
+
+    return (
+        wxid,
+        contact.get("nickname", ""),
+        contact.get("remark", ""),
+        contact.get("avatar", ""),
+        contact.get("alias", ""),
+        contact_type,
+        contact.get("region", ""),
+        current_time,
+        json.dumps(extra_data, ensure_ascii=False)
+    )
+
+def _row_to_contact(row):
+    """把 contacts 表的一行转换为联系人字典"""
+    contact = {
+        "wxid": row[0],
+        "nickname": row[1],
+        "remark": row[2],
+        "avatar": row[3],
+        "alias": row[4],
+        "type": row[5],
+        "region": row[6],
+        "last_updated": row[7]
+    }
+
+    # 解析额外数据
+    if row[8]:
+        try:
+            extra_data = json.loads(row[8])
+            contact.update(extra_data)
+        except:
+            pass
+
+    return contact
 
 def get_contacts_from_db(offset=None, limit=None):
     """从数据库获取联系人，支持分页
@@ -47,18 +132,11 @@ def get_contacts_from_db(offset=None, limit=None):
     Returns:
         联系人列表
     """
-    ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
         # 构建查询语句，支持分页
-        query = "SELECT * FROM contacts"
+        query = f"SELECT {SELECT_COLUMNS} FROM contacts ORDER BY nickname COLLATE NOCASE"
         params = []
 
-        # 添加排序
-        query += " ORDER BY nickname COLLATE NOCASE"
-
         # 添加分页参数
         if limit is not None:
             query += " LIMIT ?"
@@ -68,34 +146,8 @@ def get_contacts_from_db(offset=None, limit=None):
                 query += " OFFSET ?"
                 params.append(offset)
 
-        # 执行查询
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-
-        contacts = []
-        for row in rows:
-            contact = {
-                "wxid": row[0],
-                "nickname": row[1],
-                "remark": row[2],
-                "avatar": row[3],
-                "alias": row[4],
-                "type": row[5],
-                "region": row[6],
-                "last_updated": row[7]
-            }
-
-            # 解析额外数据
-            if row[8]:
-                try:
-                    extra_data = json.loads(row[8])
-                    contact.update(extra_data)
-                except:
-                    pass
-
-            contacts.append(contact)
-
-        conn.close()
+        rows = _manager.connection().execute(query, params).fetchall()
+        contacts = [_row_to_contact(row) for row in rows]
 
         # 记录日志，区分是否分页
         if offset is not None or limit is not None:
@@ -110,64 +162,15 @@ def get_contacts_from_db(offset=None, limit=None):
 
 def save_contacts_to_db(contacts):
     """保存联系人列表到数据库"""
-    ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        current_time = int(time.time())
+        rows = [_contact_to_row(contact, current_time) for contact in contacts]
 
-        # 创建表（如果不存在）
-        create_contacts_table()
+        # 在一个事务中批量插入或更新
+        with _manager.transaction() as conn:
+            conn.executemany(UPSERT_CONTACT_SQL, rows)
+        _notify_write([row[0] for row in rows])
 
-        # 准备批量插入
-        current_time = int(time.time())
-        for contact in contacts:
-            # 提取基本字段
-            wxid = contact.get("wxid", "")
-            nickname = contact.get("nickname", "")
-            remark = contact.get("remark", "")
-            avatar = contact.get("avatar", "")
-            alias = contact.get("alias", "")
-
-            # 确定联系人类型
-            contact_type = contact.get("type", "")
-            if not contact_type:
-                if wxid.endswith("@chatroom"):
-                    contact_type = "group"
-                elif wxid.startswith("gh_"):
-                    contact_type = "official"
-                else:
-                    contact_type = "friend"
-
-            # 其他字段
-            region = contact.get("region", "")
-
-            # 将其他字段存储为JSON
-            extra_data = {}
-            for key, value in contact.items():
-                if key not in ["wxid", "nickname", "remark", "avatar", "alias", "type", "region"]:
-                    extra_data[key] = value
-
-            extra_data_json = json.dumps(extra_data, ensure_ascii=False)
-
-            # 插入或更新联系人
-            cursor.execute('''
-            INSERT OR REPLACE INTO contacts
-            (wxid, nickname, remark, avatar, alias, type, region, last_updated, extra_data)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                wxid,
-                nickname,
-                remark,
-                avatar,
-                alias,
-                contact_type,
-                region,
-                current_time,
-                extra_data_json
-            ))
-
-        conn.commit()
-        conn.close()
         logger.success(f"成功保存 {len(contacts)} 个联系人到数据库")
         return True
     except Exception as e:
@@ -176,97 +179,17 @@ def save_contacts_to_db(contacts):
 
 def update_contact_in_db(contact):
     """更新单个联系人信息"""
-    ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # 创建表（如果不存在）
-        create_contacts_table()
-
-        # 提取基本字段
         wxid = contact.get("wxid", "")
         if not wxid:
             logger.error("更新联系人失败: 缺少wxid")
             return False
 
-        nickname = contact.get("nickname", "")
-        remark = contact.get("remark", "")
-        avatar = contact.get("avatar", "")
-        alias = contact.get("alias", "")
-
-        # 确定联系人类型
-        contact_type = contact.get("type", "")
-        if not contact_type:
-            if wxid.endswith("@chatroom"):
-                contact_type = "group"
-            elif wxid.startswith("gh_"):
-                contact_type = "official"
-            else:
-                contact_type = "friend"
-
-        # 其他字段
-        region = contact.get("region", "")
-        current_time = int(time.time())
+        with _manager.transaction() as conn:
+            conn.execute(UPSERT_CONTACT_SQL, _contact_to_row(contact, int(time.time())))
+        _notify_write([wxid])
 
-        # 将其他字段存储为JSON
-        extra_data = {}
-        for key, value in contact.items():
-            if key not in ["wxid", "nickname", "remark", "avatar", "alias", "type", "region"]:
-                extra_data[key] = value
-
-        extra_data_json = json.dumps(extra_data, ensure_ascii=False)
-
-        # 检查联系人是否存在
-        cursor.execute("SELECT wxid FROM contacts WHERE wxid = ?", (wxid,))
-        exists = cursor.fetchone()
-
-        if exists:
-            # 更新现有联系人
-            cursor.execute('''
-            UPDATE contacts SET
-                nickname = ?,
-                remark = ?,
-                avatar = ?,
-                alias = ?,
-                type = ?,
-                region = ?,
-                last_updated = ?,
-                extra_data = ?
-            WHERE wxid = ?
-            ''', (
-                nickname,
-                remark,
-                avatar,
-                alias,
-                contact_type,
-                region,
-                current_time,
-                extra_data_json,
-                wxid
-            ))
-            logger.debug(f"更新联系人: {wxid}")
-        else:
-            # 插入新联系人
-            cursor.execute('''
-            INSERT INTO contacts
-            (wxid, nickname, remark, avatar, alias, type, region, last_updated, extra_data)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                wxid,
-                nickname,
-                remark,
-                avatar,
-                alias,
-                contact_type,
-                region,
-                current_time,
-                extra_data_json
-            ))
-            logger.debug(f"新增联系人: {wxid}")
-
-        conn.commit()
-        conn.close()
+        logger.debug(f"更新联系人: {wxid}")
         return True
     except Exception as e:
         logger.error(f"更新联系人 {contact.get('wxid', 'unknown')} 失败: {str(e)}")
@@ -274,57 +197,21 @@ def update_contact_in_db(contact):
 
 def get_contact_from_db(wxid):
     """从数据库获取单个联系人信息"""
-    ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # 查询联系人
-        cursor.execute("SELECT * FROM contacts WHERE wxid = ?", (wxid,))
-        row = cursor.fetchone()
-
-        if row:
-            # 解析联系人数据
-            contact = {
-                "wxid": row[0],
-                "nickname": row[1],
-                "remark": row[2],
-                "avatar": row[3],
-                "alias": row[4],
-                "type": row[5],
-                "region": row[6],
-                "last_updated": row[7]
-            }
-
-            # 解析额外数据
-            if row[8]:
-                try:
-                    extra_data = json.loads(row[8])
-                    contact.update(extra_data)
-                except:
-                    pass
-
-            conn.close()
-            return contact
-        else:
-            conn.close()
-            return None
+        row = _manager.connection().execute(
+            f"SELECT {SELECT_COLUMNS} FROM contacts WHERE wxid = ?", (wxid,)).fetchone()
+        return _row_to_contact(row) if row else None
     except Exception as e:
         logger.error(f"从数据库获取联系人 {wxid} 失败: {str(e)}")
         return None
 
 def delete_contact_from_db(wxid):
     """从数据库删除联系人"""
-    ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # 删除联系人
-        cursor.execute("DELETE FROM contacts WHERE wxid = ?", (wxid,))
+        with _manager.transaction() as conn:
+            conn.execute("DELETE FROM contacts WHERE wxid = ?", (wxid,))
+        _notify_write([wxid])
 
-        conn.commit()
-        conn.close()
         logger.info(f"从数据库删除联系人: {wxid}")
         return True
     except Exception as e:
@@ -333,16 +220,8 @@ def delete_contact_from_db(wxid):
 
 def get_contacts_count():
     """获取数据库中联系人数量"""
-    ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT COUNT(*) FROM contacts")
-        count = cursor.fetchone()[0]
-
-        conn.close()
-        return count
+        return _manager.connection().execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
     except Exception as e:
         logger.error(f"获取联系人数量失败: {str(e)}")
         return 0
@@ -1,10 +1,11 @@
 import os
 import json
 import time
-import sqlite3
 from datetime import datetime
 from loguru import logger
 
+from database.sqlite_pool import get_connection_manager
+
 # 数据库文件路径
 DB_PATH = os.path.join("database", "contacts.db")
 
@@ -12,14 +13,31 @@ def ensure_db_dir():
     """确保数据库目录存在"""
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
-def create_group_members_table():
-    """创建群成员表"""
-    ensure_db_dir()
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # 创建群成员表
-    cursor.execute('''
+# 所有函数共用的连接管理器（与联系人数据库共用同一个文件）
+_manager = get_connection_manager(DB_PATH)
+
+# 这些字段保存在单独的列中，其他字段保存在 extra_data 中
+BASE_FIELDS = ("wxid", "Wxid", "UserName", "NickName", "nickname", "DisplayName", "display_name",
+               "BigHeadImgUrl", "SmallHeadImgUrl", "avatar", "HeadImgUrl", "InviterUserName")
+
+SELECT_COLUMNS = "member_wxid, nickname, display_name, avatar, inviter_wxid, join_time, last_updated, extra_data"
+
+# 已存在的成员只更新资料，保留 id 和 join_time
+UPSERT_MEMBER_SQL = '''
+INSERT INTO group_members
+(group_wxid, member_wxid, nickname, display_name, avatar, inviter_wxid, last_updated, extra_data)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(group_wxid, member_wxid) DO UPDATE SET
+    nickname = excluded.nickname,
+    display_name = excluded.display_name,
+    avatar = excluded.avatar,
+    inviter_wxid = excluded.inviter_wxid,
+    last_updated = excluded.last_updated,
+    extra_data = excluded.extra_data
+'''
+
+def _create_group_members_schema(conn):
+    conn.execute('''
     CREATE TABLE IF NOT EXISTS group_members (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         group_wxid TEXT NOT NULL,
@@ -36,12 +54,68 @@ def create_group_members_table():
     ''')
 
     # 创建索引以加快查询速度
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_group_wxid ON group_members (group_wxid)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_member_wxid ON group_members (member_wxid)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_group_wxid ON group_members (group_wxid)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_member_wxid ON group_members (member_wxid)')
+
+def create_group_members_table():
+    """创建群成员表，只在第一次调用时执行建表语句"""
+    if _manager.ensure_schema("group_members", _create_group_members_schema):
+        logger.info("群成员数据表创建完成")
+
+def _member_wxid(member):
+    return member.get("wxid") or member.get("Wxid") or member.get("UserName") or ""
+
+def _member_to_row(group_wxid, member, current_time):
+    """把群成员字典转换为 group_members 表的一行"""
+    # 处理昵称字段
+    nickname = member.get("NickName") or member.get("nickname") or None
+
+    # 处理显示名字段
+    display_name = member.get("DisplayName") or member.get("display_name") or None
+
+    # 处理头像字段
+    avatar = (member.get("BigHeadImgUrl") or member.get("SmallHeadImgUrl")
+              or member.get("avatar") or member.get("HeadImgUrl") or None)
+
+    # 处理邀请人字段
+    inviter_wxid = member.get("InviterUserName") or ""
+
+    # 将其他字段存储为JSON
+    extra_data = {key: value for key, value in member.items() if key not in BASE_FIELDS}
+
+    return (
+        group_wxid,
+        _member_wxid(member),
+        nickname,
+        display_name,
+        avatar,
+        inviter_wxid,
+        current_time,
+        json.dumps(extra_data, ensure_ascii=False)
+    )
 
-    conn.commit()
-    conn.close()
-    logger.info("群成员数据表创建完成")
+def _row_to_member(row):
+    """把 group_members 表的一行转换为群成员字典"""
+    member = {
+        "wxid": row[0],
+        "nickname": row[1] or "",
+        "display_name": row[2] or "",
+        "avatar": row[3] or "",
+        "inviter_wxid": row[4] or "",
+        "join_time": row[5] or 0,
+        "last_updated": row[6] or 0
+    }
+
+    # 解析额外数据
+    if row[7]:
+        try:
+            extra_data = json.loads(row[7])
+            for key, value in extra_data.items():
+                member[key] = value
+        except:
+            pass
+
+    return member
 
 def save_group_members_to_db(group_wxid, members):
     """保存群成员列表到数据库
@@ -53,78 +127,19 @@ def save_group_members_to_db(group_wxid, members):
     Returns:
         bool: 是否成功保存
     """
-    ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # 创建表（如果不存在）
-        create_group_members_table()
-
-        # 准备批量插入
         current_time = int(time.time())
+        rows = []
         for member in members:
-            # 提取基本字段
-            member_wxid = member.get("wxid") or member.get("Wxid") or member.get("UserName") or ""
-            if not member_wxid:
+            if not _member_wxid(member):
                 logger.warning(f"跳过没有wxid的群成员: {member}")
                 continue
+            rows.append(_member_to_row(group_wxid, member, current_time))
+
+        # 在一个事务中批量插入或更新
+        with _manager.transaction() as conn:
+            conn.executemany(UPSERT_MEMBER_SQL, rows)
 
-            # 处理昵称字段
-            nickname = None
-            if member.get("NickName"):
-                nickname = member.get("NickName")
-            elif member.get("nickname"):
-                nickname = member.get("nickname")
-
-            # 处理显示名字段
-            display_name = None
-            if member.get("DisplayName"):
-                display_name = member.get("DisplayName")
-            elif member.get("display_name"):
-                display_name = member.get("display_name")
-
-            # 处理头像字段
-            avatar = None
-            if member.get("BigHeadImgUrl"):
-                avatar = member.get("BigHeadImgUrl")
-            elif member.get("SmallHeadImgUrl"):
-                avatar = member.get("SmallHeadImgUrl")
-            elif member.get("avatar"):
-                avatar = member.get("avatar")
-            elif member.get("HeadImgUrl"):
-                avatar = member.get("HeadImgUrl")
-
-            # 处理邀请人字段
-            inviter_wxid = member.get("InviterUserName") or ""
-
-            # 将其他字段存储为JSON
-            extra_data = {}
-            for key, value in member.items():
-                if key not in ["wxid", "Wxid", "UserName", "NickName", "nickname", "DisplayName", "display_name", 
-                              "BigHeadImgUrl", "SmallHeadImgUrl", "avatar", "HeadImgUrl", "InviterUserName"]:
-                    extra_data[key] = value
-
-            extra_data_json = json.dumps(extra_data, ensure_ascii=False)
-
-            # 插入或更新群成员
-            cursor.execute('''
-            INSERT OR REPLACE INTO group_members
-            (group_wxid, member_wxid, nickname, display_name, avatar, inviter_wxid, last_updated, extra_data)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                group_wxid,
-                member_wxid,
-                nickname,
-                display_name,
-                avatar,
-                inviter_wxid,
-                current_time,
-                extra_data_json
-            ))
-
-        conn.commit()
-        conn.close()
         logger.success(f"成功保存群 {group_wxid} 的 {len(members)} 个成员到数据库")
         return True
     except Exception as e:
@@ -140,45 +155,15 @@ def get_group_members_from_db(group_wxid):
     Returns:
         list: 群成员列表
     """
-    ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # 查询群成员
-        cursor.execute('''
-        SELECT member_wxid, nickname, display_name, avatar, inviter_wxid, join_time, last_updated, extra_data
+        rows = _manager.connection().execute(f'''
+        SELECT {SELECT_COLUMNS}
         FROM group_members
         WHERE group_wxid = ?
         ORDER BY nickname COLLATE NOCASE
-        ''', (group_wxid,))
-        
-        rows = cursor.fetchall()
-        members = []
-        
-        for row in rows:
-            member = {
-                "wxid": row[0],
-                "nickname": row[1] or "",
-                "display_name": row[2] or "",
-                "avatar": row[3] or "",
-                "inviter_wxid": row[4] or "",
-                "join_time": row[5] or 0,
-                "last_updated": row[6] or 0
-            }
-            
-            # 解析额外数据
-            if row[7]:
-                try:
-                    extra_data = json.loads(row[7])
-                    for key, value in extra_data.items():
-                        member[key] = value
-                except:
-                    pass
-            
-            members.append(member)
-        
-        conn.close()
+        ''', (group_wxid,)).fetchall()
+
+        members = [_row_to_member(row) for row in rows]
         logger.info(f"从数据库加载了群 {group_wxid} 的 {len(members)} 个成员")
         return members
     except Exception as e:
@@ -195,44 +180,14 @@ def get_group_member_from_db(group_wxid, member_wxid):
     Returns:
         dict: 成员信息，如果不存在则返回None
     """
-    ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # 查询群成员
-        cursor.execute('''
-        SELECT member_wxid, nickname, display_name, avatar, inviter_wxid, join_time, last_updated, extra_data
+        row = _manager.connection().execute(f'''
+        SELECT {SELECT_COLUMNS}
         FROM group_members
         WHERE group_wxid = ? AND member_wxid = ?
-        ''', (group_wxid, member_wxid))
-        
-        row = cursor.fetchone()
-        if not row:
-            conn.close()
-            return None
-        
-        member = {
-            "wxid": row[0],
-            "nickname": row[1] or "",
-            "display_name": row[2] or "",
-            "avatar": row[3] or "",
-            "inviter_wxid": row[4] or "",
-            "join_time": row[5] or 0,
-            "last_updated": row[6] or 0
-        }
-        
-        # 解析额外数据
-        if row[7]:
-            try:
-                extra_data = json.loads(row[7])
-                for key, value in extra_data.items():
-                    member[key] = value
-            except:
-                pass
-        
-        conn.close()
-        return member
+        ''', (group_wxid, member_wxid)).fetchone()
+
+        return _row_to_member(row) if row else None
     except Exception as e:
         logger.error(f"从数据库获取群 {group_wxid} 的成员 {member_wxid} 失败: {str(e)}")
         return None
@@ -247,76 +202,15 @@ def update_group_member_in_db(group_wxid, member):
     Returns:
         bool: 是否成功更新
     """
-    ensure_db_dir()
+    member_wxid = _member_wxid(member)
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # 创建表（如果不存在）
-        create_group_members_table()
-
-        # 提取基本字段
-        member_wxid = member.get("wxid") or member.get("Wxid") or member.get("UserName") or ""
         if not member_wxid:
             logger.error("更新群成员失败: 缺少wxid")
             return False
 
-        # 处理昵称字段
-        nickname = None
-        if member.get("NickName"):
-            nickname = member.get("NickName")
-        elif member.get("nickname"):
-            nickname = member.get("nickname")
-
-        # 处理显示名字段
-        display_name = None
-        if member.get("DisplayName"):
-            display_name = member.get("DisplayName")
-        elif member.get("display_name"):
-            display_name = member.get("display_name")
-
-        # 处理头像字段
-        avatar = None
-        if member.get("BigHeadImgUrl"):
-            avatar = member.get("BigHeadImgUrl")
-        elif member.get("SmallHeadImgUrl"):
-            avatar = member.get("SmallHeadImgUrl")
-        elif member.get("avatar"):
-            avatar = member.get("avatar")
-        elif member.get("HeadImgUrl"):
-            avatar = member.get("HeadImgUrl")
-
-        # 处理邀请人字段
-        inviter_wxid = member.get("InviterUserName") or ""
-
-        # 将其他字段存储为JSON
-        extra_data = {}
-        for key, value in member.items():
-            if key not in ["wxid", "Wxid", "UserName", "NickName", "nickname", "DisplayName", "display_name", 
-                          "BigHeadImgUrl", "SmallHeadImgUrl", "avatar", "HeadImgUrl", "InviterUserName"]:
-                extra_data[key] = value
-
-        extra_data_json = json.dumps(extra_data, ensure_ascii=False)
-        current_time = int(time.time())
+        with _manager.transaction() as conn:
+            conn.execute(UPSERT_MEMBER_SQL, _member_to_row(group_wxid, member, int(time.time())))
 
-        # 插入或更新群成员
-        cursor.execute('''
-        INSERT OR REPLACE INTO group_members
-        (group_wxid, member_wxid, nickname, display_name, avatar, inviter_wxid, last_updated, extra_data)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            group_wxid,
-            member_wxid,
-            nickname,
-            display_name,
-            avatar,
-            inviter_wxid,
-            current_time,
-            extra_data_json
-        ))
-
-        conn.commit()
-        conn.close()
         logger.info(f"成功更新群 {group_wxid} 的成员 {member_wxid}")
         return True
     except Exception as e:
@@ -333,19 +227,13 @@ def delete_group_member_from_db(group_wxid, member_wxid):
     Returns:
         bool: 是否成功删除
     """
-    ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # 删除群成员
-        cursor.execute('''
-        DELETE FROM group_members
-        WHERE group_wxid = ? AND member_wxid = ?
-        ''', (group_wxid, member_wxid))
+        with _manager.transaction() as conn:
+            conn.execute('''
+            DELETE FROM group_members
+            WHERE group_wxid = ? AND member_wxid = ?
+            ''', (group_wxid, member_wxid))
 
-        conn.commit()
-        conn.close()
         logger.info(f"从数据库删除群 {group_wxid} 的成员 {member_wxid}")
         return True
     except Exception as e:
@@ -361,16 +249,10 @@ def delete_all_group_members(group_wxid):
     Returns:
         bool: 是否成功删除
     """
-    ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        with _manager.transaction() as conn:
+            conn.execute('DELETE FROM group_members WHERE group_wxid = ?', (group_wxid,))
 
-        # 删除群所有成员
-        cursor.execute('DELETE FROM group_members WHERE group_wxid = ?', (group_wxid,))
-
-        conn.commit()
-        conn.close()
         logger.info(f"从数据库删除群 {group_wxid} 的所有成员")
         return True
     except Exception as e:
@@ -386,23 +268,13 @@ def get_member_groups(member_wxid):
     Returns:
         list: 群wxid列表
     """
-    ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # 查询成员所在的群
-        cursor.execute('''
+        rows = _manager.connection().execute('''
         SELECT DISTINCT group_wxid
         FROM group_members
         WHERE member_wxid = ?
-        ''', (member_wxid,))
-        
-        rows = cursor.fetchall()
-        groups = [row[0] for row in rows]
-        
-        conn.close()
-        return groups
+        ''', (member_wxid,)).fetchall()
+        return [row[0] for row in rows]
     except Exception as e:
         logger.error(f"获取成员 {member_wxid} 所在的群失败: {str(e)}")
         return []
@@ -2,17 +2,25 @@ import asyncio
 import logging
 import tomllib
 from datetime import datetime, timedelta
-from typing import Optional, Union, List
+from typing import Optional, Union, List, Dict, Iterable
 
 from pydantic import validate_arguments
-from sqlalchemy import Column, String, Text, DateTime, delete, select
+from sqlalchemy import Column, String, Text, DateTime, delete, select, or_
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_scoped_session
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from utils.singleton import Singleton
 
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
 DeclarativeBase = declarative_base()
 
+# 每次 IN 查询的最大键数，避免超过 SQLite 的参数数量限制
+IN_CHUNK_SIZE = 500
+
 
 class KeyValue(DeclarativeBase):
     __tablename__ = 'key_value_store'
@@ -22,62 +30,52 @@ class KeyValue(DeclarativeBase):
     expire_time = Column(DateTime, index=True, comment='过期时间')
 
 
-class KeyvalDB(metaclass=Singleton):
-    _instance = None
+def _expire_at(ex: Optional[Union[int, timedelta]]) -> Optional[datetime]:
+    """把 set 的秒数或timedelta转换为过期时间点，ex 为空或0时不过期"""
+    if not ex:
+        return None
+    return datetime.now() + (ex if isinstance(ex, timedelta) else timedelta(seconds=ex))
 
-    def __new__(cls):
-        with open("main_config.toml", "rb") as f:
-            main_config = tomllib.load(f)
-        db_url = main_config["XYBot"]["keyvalDB-url"]
 
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance.engine = create_async_engine(
-                db_url,
-                echo=False,
-                future=True
-            )
-            cls._async_session_factory = async_scoped_session(
-                sessionmaker(
-                    cls._instance.engine,
-                    class_=AsyncSession,
-                    expire_on_commit=False
-                ),
-                scopefunc=asyncio.current_task
-            )
-        return cls._instance
+def _not_expired(now: datetime):
+    return or_(KeyValue.expire_time.is_(None), KeyValue.expire_time >= now)
+
+
+class SQLiteKeyvalBackend:
+    """基于 SQLAlchemy 异步引擎的键值存储，默认使用 SQLite
+
+    读操作只过滤掉已过期的键，不在读路径上删除和提交，过期数据由后台任务统一清理。
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_url: str):
+        self.engine = create_async_engine(
+            db_url,
+            echo=False,
+            future=True
+        )
+        self._async_session_factory = async_scoped_session(
+            sessionmaker(
+                self.engine,
+                class_=AsyncSession,
+                expire_on_commit=False
+            ),
+            scopefunc=asyncio.current_task
+        )
+        self._cleanup_task = None
 
     async def initialize(self):
-        """异步初始化数据库"""
         async with self.engine.begin() as conn:
             await conn.run_sync(DeclarativeBase.metadata.create_all)
         # 启动后台清理任务
-        asyncio.create_task(self._cleanup_expired())
+        if self._cleanup_task is None:
+            self._cleanup_task = asyncio.create_task(self._cleanup_expired())
 
-    @validate_arguments
-    async def set(
-            self,
-            key: str,
-            value: Union[str, dict, list],
-            ex: Optional[Union[int, timedelta]] = None
-    ) -> bool:
-        """设置键值对，支持过期时间（秒或timedelta）"""
+    async def set(self, key: str, value: str, ex: Optional[Union[int, timedelta]] = None) -> bool:
         async with self._async_session_factory() as session:
             try:
-                expire_time = None
-                if ex:
-                    # 统一处理时间类型转换
-                    if isinstance(ex, int):
-                        expire_time = datetime.now() + timedelta(seconds=ex)
-                    else:
-                        expire_time = datetime.now() + ex
-
-                kv = KeyValue(
-                    key=key,
-                    value=str(value),
-                    expire_time=expire_time
-                )
-                await session.merge(kv)
+                await session.merge(KeyValue(key=key, value=value, expire_time=_expire_at(ex)))
                 await session.commit()
                 return True
             except Exception as e:
@@ -85,82 +83,306 @@ class KeyvalDB(metaclass=Singleton):
                 await session.rollback()
                 return False
 
-    async def get(self, key: str) -> Optional[str]:
-        """获取键值，自动处理过期数据"""
+    async def mset(self, mapping: Dict[str, str], ex: Optional[Union[int, timedelta]] = None) -> bool:
+        expire_time = _expire_at(ex)
         async with self._async_session_factory() as session:
-            result = await session.get(KeyValue, key)
-            if not result:
-                return None
-
-            if result.expire_time and result.expire_time < datetime.now():
-                await session.delete(result)
+            try:
+                for key, value in mapping.items():
+                    await session.merge(KeyValue(key=key, value=value, expire_time=expire_time))
                 await session.commit()
-                return None
+                return True
+            except Exception as e:
+                logging.error(f"批量设置键值失败: {str(e)}")
+                await session.rollback()
+                return False
 
-            return result.value
+    async def get(self, key: str) -> Optional[str]:
+        async with self._async_session_factory() as session:
+            result = await session.execute(
+                select(KeyValue.value).where(KeyValue.key == key, _not_expired(datetime.now())))
+            return result.scalar_one_or_none()
 
-    async def delete(self, key: str) -> bool:
-        """删除键值"""
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        values = {}
+        now = datetime.now()
         async with self._async_session_factory() as session:
-            result = await session.execute(delete(KeyValue).where(KeyValue.key == key))
+            for i in range(0, len(keys), IN_CHUNK_SIZE):
+                chunk = keys[i:i + IN_CHUNK_SIZE]
+                result = await session.execute(
+                    select(KeyValue.key, KeyValue.value).where(KeyValue.key.in_(chunk), _not_expired(now)))
+                values.update(result.all())
+        return [values.get(key) for key in keys]
+
+    async def delete(self, *keys: str) -> int:
+        deleted = 0
+        async with self._async_session_factory() as session:
+            for i in range(0, len(keys), IN_CHUNK_SIZE):
+                result = await session.execute(delete(KeyValue).where(KeyValue.key.in_(keys[i:i + IN_CHUNK_SIZE])))
+                deleted += result.rowcount
             await session.commit()
-            return result.rowcount > 0
+        return deleted
 
     async def exists(self, key: str) -> bool:
-        """检查键是否存在"""
-        async with self._async_session_factory() as session:
-            result = await session.get(KeyValue, key)
-            if result and result.expire_time and result.expire_time < datetime.now():
-                await session.delete(result)
-                await session.commit()
-                return False
-            return result is not None
+        return await self.get(key) is not None
 
     async def ttl(self, key: str) -> int:
-        """获取剩余生存时间（秒）"""
         async with self._async_session_factory() as session:
             result = await session.get(KeyValue, key)
             if not result or not result.expire_time:
                 return -1
 
             remaining = (result.expire_time - datetime.now()).total_seconds()
-            # 明确返回类型处理
-            return int(remaining) if remaining > 0 else -2
+            # 已过期的键视为不存在；与 Redis 一样按四舍五入返回秒数
+            return int(remaining + 0.5) if remaining > 0 else -1
 
     async def expire(self, key: str, ex: Union[int, timedelta]) -> bool:
-        """设置过期时间"""
+        seconds = ex.total_seconds() if isinstance(ex, timedelta) else ex
+        now = datetime.now()
         async with self._async_session_factory() as session:
-            result = await session.get(KeyValue, key)
-            if not result:
+            result = await session.execute(select(KeyValue).where(KeyValue.key == key, _not_expired(now)))
+            row = result.scalar_one_or_none()
+            if row is None:
+                # 与 Redis 一致，已过期的键视为不存在，顺便删除还没清理的记录
+                await session.execute(delete(KeyValue).where(KeyValue.key == key))
+                await session.commit()
                 return False
-
-            expire_time = datetime.now() + (ex if isinstance(ex, timedelta) else timedelta(seconds=ex))
-            result.expire_time = expire_time
+            if seconds <= 0:
+                # 与 Redis 一致，过期时间不大于0时键立即过期
+                await session.delete(row)
+            else:
+                row.expire_time = now + timedelta(seconds=seconds)
             await session.commit()
             return True
 
     async def keys(self, pattern: str = "*") -> List[str]:
-        """查找匹配模式的键"""
         async with self._async_session_factory() as session:
-            # 显式指定查询列类型
-            query = select(KeyValue.key).where(KeyValue.key.like(pattern.replace("*", "%")))
+            # GLOB 与 Redis 的匹配规则一致（* ? [...]），区分大小写
+            query = select(KeyValue.key).where(KeyValue.key.op("GLOB")(pattern), _not_expired(datetime.now()))
             result = await session.execute(query)
-            return [str(row[0]) for row in result.all()]  # 确保返回字符串类型
+            return [str(row[0]) for row in result.all()]
 
     async def _cleanup_expired(self, interval: int = 3600):
         """后台定时清理过期数据"""
         while True:
-            async with self._async_session_factory() as session:
-                await session.execute(
-                    delete(KeyValue).where(KeyValue.expire_time < datetime.now())
-                )
-                await session.commit()
+            try:
+                async with self._async_session_factory() as session:
+                    await session.execute(
+                        delete(KeyValue).where(KeyValue.expire_time < datetime.now())
+                    )
+                    await session.commit()
+            except Exception as e:
+                logging.error(f"清理过期键值失败: {str(e)}")
             await asyncio.sleep(interval)
 
     async def close(self):
-        """关闭数据库连接"""
+        if self._cleanup_task is not None:
+            self._cleanup_task.cancel()
+            await asyncio.gather(self._cleanup_task, return_exceptions=True)
+            self._cleanup_task = None
         await self.engine.dispose()
 
+
+class RedisKeyvalBackend:
+    """基于 Redis 的键值存储
+
+    过期时间使用 Redis 原生 TTL，keys 使用 SCAN 遍历，批量操作使用 MGET 和 pipeline。
+    所有键加上 key_prefix 前缀，与协议服务使用的数据区分开。
+
+    client 可以是任何兼容 redis.asyncio.Redis 接口的对象（如 fakeredis.aioredis.FakeRedis），
+    需要以 decode_responses=True 创建。
+    """
+
+    name = "redis"
+
+    def __init__(self, client, key_prefix: str = "xybot:kv:", scan_count: int = 500):
+        self.client = client
+        self.key_prefix = key_prefix
+        self.scan_count = scan_count
+
+    @classmethod
+    def from_config(cls, config: dict) -> "RedisKeyvalBackend":
+        """根据 [KeyvalDB] 配置创建，未填写连接信息时使用 [WechatAPIServer] 的 Redis 设置"""
+        if aioredis is None:
+            raise RuntimeError("未安装 redis，请执行 pip install redis")
+        keyval_config = config.get("KeyvalDB", {})
+        server_config = config.get("WechatAPIServer", {})
+
+        redis_url = keyval_config.get("redis-url", "")
+        if redis_url:
+            client = aioredis.from_url(redis_url, decode_responses=True)
+        else:
+            client = aioredis.Redis(
+                host=server_config.get("redis-host", "127.0.0.1"),
+                port=server_config.get("redis-port", 6379),
+                password=server_config.get("redis-password") or None,
+                db=keyval_config.get("redis-db", server_config.get("redis-db", 0)),
+                decode_responses=True,
+            )
+        return cls(client, key_prefix=keyval_config.get("key-prefix", "xybot:kv:"))
+
+    def _key(self, key: str) -> str:
+        return self.key_prefix + key
+
+    async def initialize(self):
+        # 连接失败时抛出异常，由 KeyvalDB 回退到 SQLite
+        await self.client.ping()
+
+    async def set(self, key: str, value: str, ex: Optional[Union[int, timedelta]] = None) -> bool:
+        try:
+            return bool(await self.client.set(self._key(key), value, ex=ex or None))
+        except Exception as e:
+            logging.error(f"设置键值失败: {str(e)}")
+            return False
+
+    async def mset(self, mapping: Dict[str, str], ex: Optional[Union[int, timedelta]] = None) -> bool:
+        try:
+            if not ex:
+                await self.client.mset({self._key(key): value for key, value in mapping.items()})
+                return True
+            # MSET 不支持过期时间，用 pipeline 一次往返发送多条 SET
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, value in mapping.items():
+                    pipe.set(self._key(key), value, ex=ex)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logging.error(f"批量设置键值失败: {str(e)}")
+            return False
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.client.get(self._key(key))
+
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        return await self.client.mget([self._key(key) for key in keys])
+
+    async def delete(self, *keys: str) -> int:
+        if not keys:
+            return 0
+        return await self.client.delete(*(self._key(key) for key in keys))
+
+    async def exists(self, key: str) -> bool:
+        return bool(await self.client.exists(self._key(key)))
+
+    async def ttl(self, key: str) -> int:
+        remaining = await self.client.ttl(self._key(key))
+        # Redis 对不存在的键返回 -2，与 SQLite 实现保持一致返回 -1
+        return -1 if remaining == -2 else remaining
+
+    async def expire(self, key: str, ex: Union[int, timedelta]) -> bool:
+        return bool(await self.client.expire(self._key(key), ex))
+
+    async def keys(self, pattern: str = "*") -> List[str]:
+        prefix_length = len(self.key_prefix)
+        return [key[prefix_length:] async for key in
+                self.client.scan_iter(match=self._key(pattern), count=self.scan_count)]
+
+    async def close(self):
+        close = getattr(self.client, "aclose", None) or self.client.close
+        await close()
+
+
+class KeyvalDB(metaclass=Singleton):
+    """键值存储，根据 main_config.toml 的 [KeyvalDB] backend 使用 SQLite 或 Redis
+
+    Redis 不可用（未安装或连接失败）时自动回退到 keyvalDB-url 指定的 SQLite 数据库。
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        with open("main_config.toml", "rb") as f:
+            main_config = tomllib.load(f)
+        db_url = main_config["XYBot"]["keyvalDB-url"]
+
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.main_config = main_config
+            cls._instance.fallback = SQLiteKeyvalBackend(db_url)
+            cls._instance.backend = cls._instance.fallback
+        return cls._instance
+
+    @property
+    def engine(self):
+        return self.fallback.engine
+
+    def use_backend(self, backend):
+        """替换存储后端，如传入使用 fakeredis 客户端的 RedisKeyvalBackend"""
+        self.backend = backend
+
+    async def initialize(self):
+        """异步初始化数据库"""
+        keyval_config = self.main_config.get("KeyvalDB", {})
+        if keyval_config.get("backend", "sqlite") == "redis" and self.backend is self.fallback:
+            try:
+                backend = RedisKeyvalBackend.from_config(self.main_config)
+                await backend.initialize()
+                self.backend = backend
+                logging.info("键值存储使用 Redis")
+                return
+            except Exception as e:
+                logging.warning(f"连接 Redis 失败，键值存储回退到 SQLite: {str(e)}")
+        await self.backend.initialize()
+
+    @validate_arguments
+    async def set(
+            self,
+            key: str,
+            value: Union[str, dict, list],
+            ex: Optional[Union[int, timedelta]] = None
+    ) -> bool:
+        """设置键值对，支持过期时间（秒或timedelta）"""
+        return await self.backend.set(key, str(value), ex)
+
+    async def mset(self, mapping: Dict[str, Union[str, dict, list]],
+                   ex: Optional[Union[int, timedelta]] = None) -> bool:
+        """批量设置键值对，所有键使用相同的过期时间"""
+        if not mapping:
+            return True
+        return await self.backend.mset({key: str(value) for key, value in mapping.items()}, ex)
+
+    async def get(self, key: str) -> Optional[str]:
+        """获取键值，过期的键返回 None"""
+        return await self.backend.get(key)
+
+    async def mget(self, keys: Iterable[str]) -> List[Optional[str]]:
+        """批量获取键值，按 keys 的顺序返回，不存在或过期的键为 None"""
+        return await self.backend.mget(list(keys))
+
+    async def delete(self, key: str) -> bool:
+        """删除键值"""
+        return await self.backend.delete(key) > 0
+
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        """批量删除键值，返回删除的数量"""
+        return await self.backend.delete(*keys)
+
+    async def exists(self, key: str) -> bool:
+        """检查键是否存在"""
+        return await self.backend.exists(key)
+
+    async def ttl(self, key: str) -> int:
+        """获取剩余生存时间（秒），键不存在或没有过期时间时返回 -1"""
+        return await self.backend.ttl(key)
+
+    async def expire(self, key: str, ex: Union[int, timedelta]) -> bool:
+        """设置过期时间，ex 不大于0时键立即过期；键不存在或已过期时返回 False"""
+        return await self.backend.expire(key, ex)
+
+    async def keys(self, pattern: str = "*") -> List[str]:
+        """查找匹配模式的键，支持 * ? [...] 通配符"""
+        return await self.backend.keys(pattern)
+
+    def get_backend_name(self) -> str:
+        return self.backend.name
+
+    async def close(self):
+        """关闭数据库连接"""
+        if self.backend is not self.fallback:
+            await self.backend.close()
+        await self.fallback.close()
+
     async def __aenter__(self):
         return self
 
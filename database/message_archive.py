@@ -0,0 +1,410 @@
+import asyncio
+import base64
+import json
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+PARTITION_SCHEMES = ("day", "week")
+
+_PARTITION_FILE = re.compile(r"^messages_(\d{8}|\d{4}W\d{2})\.db$")
+
+SELECT_COLUMNS = "id, msg_id, sender_wxid, from_wxid, msg_type, content, timestamp, is_group"
+
+INSERT_SQL = '''
+INSERT INTO messages (msg_id, sender_wxid, from_wxid, msg_type, content, timestamp, is_group)
+VALUES (:msg_id, :sender_wxid, :from_wxid, :msg_type, :content, :timestamp, :is_group)
+'''
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY,
+        msg_id INTEGER,
+        sender_wxid TEXT,
+        from_wxid TEXT,
+        msg_type INTEGER,
+        content TEXT,
+        timestamp REAL NOT NULL,
+        is_group INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    # 按会话、按发送人翻页查询，rowid 隐含在索引末尾，(timestamp, id) 排序可以直接走索引
+    'CREATE INDEX IF NOT EXISTS idx_messages_from_ts ON messages (from_wxid, timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_messages_sender_ts ON messages (sender_wxid, timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages (timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_messages_msg_id ON messages (msg_id)',
+]
+
+# trigram 分词支持中文的任意子串搜索（至少3个字符），外部内容表不重复保存消息内容
+FTS_SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content, content='messages', content_rowid='id', tokenize='trigram'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    ''',
+]
+
+# trigram 分词最短可搜索的关键词长度，更短的关键词退回 LIKE
+FTS_MIN_KEYWORD = 3
+
+
+def encode_cursor(timestamp: float, row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([timestamp, row_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return float(timestamp), int(row_id)
+
+
+class MessageArchive:
+    """按时间分区的消息归档
+
+    - 每天（或每周）一个独立的 SQLite 文件，过期数据直接删除整个文件，不需要大范围 DELETE 和 VACUUM
+    - 每个分区有 (from_wxid, timestamp)、(sender_wxid, timestamp) 复合索引和 content 的 FTS5 全文索引
+    - 查询按 (timestamp, id) 倒序，通过游标翻页，从新到旧依次扫描分区，不需要 OFFSET
+    - 写入在单独的线程中顺序执行，查询在读线程池中执行，都不阻塞事件循环
+    """
+
+    def __init__(self,
+                 directory: str = os.path.join("database", "message_archive"),
+                 partition: str = "day",
+                 retention_days: float = 3,
+                 fts: bool = True,
+                 read_workers: int = 2):
+        """
+        Args:
+            directory: 分区文件所在目录
+            partition: 分区粒度，day 或 week
+            retention_days: 保留天数，0 表示永久保留
+            fts: 是否建立全文索引
+            read_workers: 查询线程数
+        """
+        if partition not in PARTITION_SCHEMES:
+            logger.warning("未知的消息归档分区粒度 {}，使用 day", partition)
+            partition = "day"
+        self.directory = directory
+        self.partition = partition
+        self.retention_days = float(retention_days)
+        self.fts = fts
+
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="message-archive")
+        self._read_executor = ThreadPoolExecutor(max_workers=max(1, int(read_workers)),
+                                                 thread_name_prefix="message-archive-read")
+        # 写线程中打开的分区连接
+        self._write_conns: Dict[str, sqlite3.Connection] = {}
+
+        self.appended = 0
+        self.dropped_partitions = 0
+
+    @classmethod
+    def from_config(cls, config: dict) -> Optional["MessageArchive"]:
+        """根据 main_config.toml 的 [MessageArchive] 配置创建，未启用时返回 None"""
+        archive_config = config.get("MessageArchive", {})
+        if not archive_config.get("enable", False):
+            return None
+        return cls(
+            directory=archive_config.get("directory", os.path.join("database", "message_archive")),
+            partition=archive_config.get("partition", "day"),
+            retention_days=archive_config.get("retention-days", 3),
+            fts=archive_config.get("fts", True),
+            read_workers=archive_config.get("read-workers", 2),
+        )
+
+    # 分区
+
+    def partition_key(self, timestamp: float) -> str:
+        day = date.fromtimestamp(timestamp)
+        if self.partition == "week":
+            year, week, _ = day.isocalendar()
+            return f"{year}W{week:02d}"
+        return day.strftime("%Y%m%d")
+
+    @staticmethod
+    def partition_range(key: str) -> Tuple[float, float]:
+        """分区覆盖的时间范围 [开始, 结束)"""
+        if "W" in key:
+            year, week = key.split("W")
+            start = date.fromisocalendar(int(year), int(week), 1)
+            end = start + timedelta(days=7)
+        else:
+            start = datetime.strptime(key, "%Y%m%d").date()
+            end = start + timedelta(days=1)
+        return (datetime.combine(start, datetime.min.time()).timestamp(),
+                datetime.combine(end, datetime.min.time()).timestamp())
+
+    def _partition_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"messages_{key}.db")
+
+    def list_partitions(self) -> List[str]:
+        """按时间从旧到新列出所有分区"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        keys = [match.group(1) for match in map(_PARTITION_FILE.match, names) if match]
+        return sorted(keys, key=lambda key: self.partition_range(key)[0])
+
+    # 写入（只在写线程中执行）
+
+    def _open(self, path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _write_conn(self, key: str) -> sqlite3.Connection:
+        conn = self._write_conns.get(key)
+        if conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            conn = self._open(self._partition_path(key))
+            with conn:
+                for statement in SCHEMA:
+                    conn.execute(statement)
+                if self.fts:
+                    for statement in FTS_SCHEMA:
+                        conn.execute(statement)
+            self._write_conns[key] = conn
+        return conn
+
+    def _append(self, rows: List[dict]) -> int:
+        partitions: Dict[str, List[dict]] = {}
+        for row in rows:
+            timestamp = row.get("timestamp")
+            if isinstance(timestamp, datetime):
+                timestamp = timestamp.timestamp()
+            timestamp = float(timestamp or time.time())
+            partitions.setdefault(self.partition_key(timestamp), []).append({
+                "msg_id": row.get("msg_id"),
+                "sender_wxid": row.get("sender_wxid", ""),
+                "from_wxid": row.get("from_wxid", ""),
+                "msg_type": row.get("msg_type", 0),
+                "content": row.get("content", ""),
+                "timestamp": timestamp,
+                "is_group": 1 if row.get("is_group") else 0,
+            })
+
+        for key, partition_rows in partitions.items():
+            conn = self._write_conn(key)
+            with conn:
+                conn.executemany(INSERT_SQL, partition_rows)
+        self.appended += len(rows)
+        return len(rows)
+
+    async def append(self, rows: List[dict]) -> int:
+        """写入一批消息，每个分区一个事务
+
+        Args:
+            rows: 消息字典列表，字段与 MessageDB 的 Message 相同，timestamp 可以是 datetime 或时间戳
+        """
+        if not rows:
+            return 0
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._write_executor, self._append, rows)
+
+    # 过期清理
+
+    def _drop_expired(self, now: float) -> List[str]:
+        if self.retention_days <= 0:
+            return []
+        cutoff = now - self.retention_days * 86400
+        dropped = []
+        for key in self.list_partitions():
+            if self.partition_range(key)[1] > cutoff:
+                break
+            conn = self._write_conns.pop(key, None)
+            if conn is not None:
+                conn.close()
+            path = self._partition_path(key)
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(path + suffix)
+                except FileNotFoundError:
+                    pass
+            dropped.append(key)
+        self.dropped_partitions += len(dropped)
+        return dropped
+
+    async def apply_retention(self) -> List[str]:
+        """删除超过保留天数的分区，返回被删除的分区"""
+        loop = asyncio.get_running_loop()
+        dropped = await loop.run_in_executor(self._write_executor, self._drop_expired, time.time())
+        if dropped:
+            logger.info("删除过期的消息归档分区: {}", dropped)
+        return dropped
+
+    async def retention_loop(self, interval: float = 3600):
+        """定期删除过期分区"""
+        while True:
+            try:
+                await self.apply_retention()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("清理消息归档失败: {}", e)
+            await asyncio.sleep(interval)
+
+    # 查询
+
+    def _query(self, from_wxid: Optional[str], sender_wxid: Optional[str], keyword: Optional[str],
+               msg_type: Optional[int], is_group: Optional[bool], start_time: Optional[float],
+               end_time: Optional[float], cursor: Optional[str], limit: int) -> Dict[str, Any]:
+        cursor_pos = decode_cursor(cursor) if cursor else None
+        upper = end_time
+        if cursor_pos and (upper is None or cursor_pos[0] < upper):
+            upper = cursor_pos[0]
+
+        messages = []
+        for key in reversed(self.list_partitions()):
+            if len(messages) >= limit:
+                break
+            partition_start, partition_end = self.partition_range(key)
+            if upper is not None and partition_start > upper:
+                continue
+            if start_time is not None and partition_end <= start_time:
+                break
+
+            path = self._partition_path(key)
+            if not os.path.exists(path):
+                continue
+
+            where, params = [], []
+            if from_wxid:
+                where.append("from_wxid = ?")
+                params.append(from_wxid)
+            if sender_wxid:
+                where.append("sender_wxid = ?")
+                params.append(sender_wxid)
+            if msg_type is not None:
+                where.append("msg_type = ?")
+                params.append(msg_type)
+            if is_group is not None:
+                where.append("is_group = ?")
+                params.append(1 if is_group else 0)
+            if start_time is not None:
+                where.append("timestamp >= ?")
+                params.append(start_time)
+            if end_time is not None:
+                where.append("timestamp <= ?")
+                params.append(end_time)
+            if cursor_pos:
+                where.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+                params.extend([cursor_pos[0], cursor_pos[0], cursor_pos[1]])
+            if keyword:
+                if self.fts and len(keyword) >= FTS_MIN_KEYWORD:
+                    where.append("id IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)")
+                    params.append('"' + keyword.replace('"', '""') + '"')
+                else:
+                    where.append("content LIKE ? ESCAPE '\\'")
+                    params.append("%" + re.sub(r"([%_\\])", r"\\\1", keyword) + "%")
+
+            sql = f"SELECT {SELECT_COLUMNS} FROM messages"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+            params.append(limit - len(messages))
+
+            conn = sqlite3.connect(path, timeout=10)
+            try:
+                rows = conn.execute(sql, params).fetchall()
+            except sqlite3.OperationalError as e:
+                # 分区还没有建表（写线程刚创建文件）
+                logger.debug("查询消息归档分区 {} 失败: {}", key, e)
+                rows = []
+            finally:
+                conn.close()
+
+            for row in rows:
+                messages.append({
+                    "id": row[0],
+                    "msg_id": row[1],
+                    "sender_wxid": row[2],
+                    "from_wxid": row[3],
+                    "msg_type": row[4],
+                    "content": row[5],
+                    "timestamp": row[6],
+                    "is_group": bool(row[7]),
+                })
+
+        next_cursor = None
+        if len(messages) >= limit:
+            last = messages[-1]
+            next_cursor = encode_cursor(last["timestamp"], last["id"])
+        return {"messages": messages, "next_cursor": next_cursor}
+
+    async def query(self,
+                    from_wxid: Optional[str] = None,
+                    sender_wxid: Optional[str] = None,
+                    keyword: Optional[str] = None,
+                    msg_type: Optional[int] = None,
+                    is_group: Optional[bool] = None,
+                    start_time: Optional[float] = None,
+                    end_time: Optional[float] = None,
+                    cursor: Optional[str] = None,
+                    limit: int = 50) -> Dict[str, Any]:
+        """按时间倒序查询消息
+
+        Args:
+            from_wxid: 会话（私聊对象或群聊）wxid
+            sender_wxid: 发送人wxid
+            keyword: 内容关键词
+            msg_type: 消息类型
+            is_group: 是否群消息
+            start_time: 开始时间（时间戳，包含）
+            end_time: 结束时间（时间戳，包含）
+            cursor: 上一页返回的 next_cursor
+            limit: 每页条数
+
+        Returns:
+            {"messages": [...], "next_cursor": 下一页游标，没有更多时为 None}
+        """
+        limit = max(1, min(int(limit), 500))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._read_executor, self._query, from_wxid, sender_wxid, keyword, msg_type, is_group,
+            start_time, end_time, cursor, limit)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取归档统计"""
+        partitions = self.list_partitions()
+        size = 0
+        for key in partitions:
+            for suffix in ("", "-wal"):
+                try:
+                    size += os.path.getsize(self._partition_path(key) + suffix)
+                except OSError:
+                    pass
+        return {
+            "directory": self.directory,
+            "partition": self.partition,
+            "retention_days": self.retention_days,
+            "fts": self.fts,
+            "partitions": len(partitions),
+            "oldest_partition": partitions[0] if partitions else None,
+            "newest_partition": partitions[-1] if partitions else None,
+            "size_bytes": size,
+            "appended": self.appended,
+            "dropped_partitions": self.dropped_partitions,
+        }
+
+    def _close(self):
+        conns, self._write_conns = self._write_conns, {}
+        for conn in conns.values():
+            conn.close()
+
+    async def close(self):
+        """关闭写入连接，机器人退出时调用"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._write_executor, self._close)
@@ -1,20 +1,25 @@
 import asyncio
 import logging
 import tomllib
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 
 from pydantic import validate_arguments
-from sqlalchemy import Column, String, Integer, DateTime, Text, Boolean, delete
+from sqlalchemy import Column, String, Integer, DateTime, Text, Boolean, delete, insert
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_scoped_session
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from database.message_archive import MessageArchive
 from utils.singleton import Singleton
 
 # 使用新的声明式基类
 DeclarativeBase = declarative_base()
 
+# 写入缓冲区满时的处理策略
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_new")
+
 
 class Message(DeclarativeBase):
     __tablename__ = 'messages'
@@ -36,6 +41,7 @@ class MessageDB(metaclass=Singleton):
         with open("main_config.toml", "rb") as f:
             main_config = tomllib.load(f)
         db_url = main_config["XYBot"]["msgDB-url"]
+        log_config = main_config.get("MessageLog", {})
 
         if cls._instance is None:
             cls._instance = super().__new__(cls)
@@ -44,6 +50,29 @@ class MessageDB(metaclass=Singleton):
                 echo=False,
                 future=True
             )
+
+            # 消息先写入内存缓冲区，由后台任务按批次写入数据库
+            instance = cls._instance
+            instance.write_behind = log_config.get("write-behind", True)
+            instance.batch_size = max(1, int(log_config.get("batch-size", 200)))
+            instance.flush_interval = float(log_config.get("flush-interval", 1.0))
+            instance.max_pending = max(instance.batch_size, int(log_config.get("max-pending", 10000)))
+            instance.overflow_policy = log_config.get("overflow-policy", "drop_oldest")
+            if instance.overflow_policy not in OVERFLOW_POLICIES:
+                logging.warning(f"未知的消息缓冲区溢出策略 {instance.overflow_policy}，使用 drop_oldest")
+                instance.overflow_policy = "drop_oldest"
+            instance.max_retries = int(log_config.get("max-retries", 3))
+            instance._pending = deque()
+            instance._flush_event = None
+            instance._flusher = None
+            instance._stopping = False
+            instance._failures = 0
+            instance.saved = 0
+            instance.dropped = 0
+            instance.batches = 0
+            # 开启 [MessageArchive] 后消息写入按时间分区的归档，不再写入 msgDB-url
+            instance.archive = MessageArchive.from_config(main_config)
+            instance._retention_task = None
             cls._async_session_factory = async_scoped_session(
                 sessionmaker(
                     cls._instance.engine,
@@ -58,6 +87,8 @@ class MessageDB(metaclass=Singleton):
         """异步初始化数据库"""
         async with self.engine.begin() as conn:
             await conn.run_sync(DeclarativeBase.metadata.create_all)
+        if self.archive is not None and self._retention_task is None:
+            self._retention_task = asyncio.create_task(self.archive.retention_loop())
 
     @validate_arguments(config=dict(arbitrary_types_allowed=True))
     async def save_message(self,
@@ -67,26 +98,196 @@ class MessageDB(metaclass=Singleton):
                            msg_type: int = 0,
                            content: str = "",
                            is_group: bool = False) -> bool:
-        """异步保存消息到数据库"""
+        """保存消息到数据库
+
+        开启 write-behind 时只放入内存缓冲区，由后台任务批量写入，不在回复消息的路径上等待磁盘。
+
+        Returns:
+            bool: 消息被接收返回 True，缓冲区已满被丢弃或写入失败返回 False
+        """
+        row = dict(
+            msg_id=msg_id,
+            sender_wxid=sender_wxid,
+            from_wxid=from_wxid,
+            msg_type=msg_type,
+            content=content,
+            is_group=is_group,
+            timestamp=datetime.now()
+        )
+        if self.write_behind:
+            return await self._enqueue(row)
+        return await self._save_now(row)
+
+    async def _save_now(self, row: dict) -> bool:
+        """直接写入一条消息"""
+        if self.archive is not None:
+            try:
+                await self.archive.append([row])
+                self.saved += 1
+                return True
+            except Exception as e:
+                logging.error(f"保存消息失败: {str(e)}")
+                return False
+
         async with self._async_session_factory() as session:
             try:
-                message = Message(
-                    msg_id=msg_id,
-                    sender_wxid=sender_wxid,
-                    from_wxid=from_wxid,
-                    msg_type=msg_type,
-                    content=content,
-                    is_group=is_group,
-                    timestamp=datetime.now()
-                )
-                session.add(message)
+                session.add(Message(**row))
                 await session.commit()
+                self.saved += 1
                 return True
             except Exception as e:
                 logging.error(f"保存消息失败: {str(e)}")
                 await session.rollback()
                 return False
 
+    async def _enqueue(self, row: dict) -> bool:
+        """放入写入缓冲区，缓冲区满时按 overflow-policy 处理"""
+        self._ensure_flusher()
+
+        if len(self._pending) >= self.max_pending:
+            if self.overflow_policy == "block":
+                # 不丢消息，等待后台写入腾出空间
+                self._flush_event.set()
+                while len(self._pending) >= self.max_pending:
+                    try:
+                        await self.flush()
+                    except Exception as e:
+                        # 超过重试次数的批次会被丢弃，之后总能腾出空间
+                        logging.error(f"批量保存消息失败: {str(e)}")
+                        await asyncio.sleep(self.flush_interval)
+            elif self.overflow_policy == "drop_oldest":
+                self._pending.popleft()
+                self.dropped += 1
+            else:
+                self.dropped += 1
+                return False
+
+        self._pending.append(row)
+        if len(self._pending) >= self.batch_size:
+            self._flush_event.set()
+        return True
+
+    def _ensure_flusher(self):
+        """启动后台写入任务"""
+        if not self._stopping and (self._flusher is None or self._flusher.done()):
+            self._flush_event = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        # stop() 设置 _stopping 后，写完当前缓冲区再退出，不在写入中途被取消
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"批量写入消息失败: {str(e)}")
+
+    async def flush(self) -> int:
+        """把缓冲区中的消息写入数据库
+
+        Returns:
+            int: 写入的消息数
+        """
+        written = 0
+        while self._pending:
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            try:
+                await self._write_batch(batch)
+            except asyncio.CancelledError:
+                # 被取消时放回缓冲区，之后的 flush 还能写入
+                self._pending.extendleft(reversed(batch))
+                raise
+            except Exception as e:
+                self._failures += 1
+                if self._failures > self.max_retries:
+                    # 超过重试次数后丢弃这一批，避免数据库故障时内存无限增长
+                    logging.error(f"批量保存消息失败，丢弃 {len(batch)} 条消息: {str(e)}")
+                    self.dropped += len(batch)
+                    self._failures = 0
+                    continue
+                # 放回缓冲区头部，下次重试
+                self._pending.extendleft(reversed(batch))
+                raise
+            self._failures = 0
+            self.saved += len(batch)
+            self.batches += 1
+            written += len(batch)
+        return written
+
+    async def _flush_for_query(self):
+        """查询前写入缓冲区中的消息，保证能查到刚收到的消息
+
+        缓冲区只在机器人所在的事件循环中读写；从其他线程的事件循环（如管理后台）查询时，
+        把写入交给机器人的事件循环执行并等待完成，不在当前线程直接操作缓冲区。
+        """
+        if not self._pending:
+            return
+        try:
+            owner = self._flusher.get_loop() if self._flusher is not None else None
+            if owner is None or owner is asyncio.get_running_loop():
+                await self.flush()
+            elif owner.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.flush(), owner))
+        except Exception as e:
+            logging.error(f"写入缓冲消息失败: {str(e)}")
+
+    async def _write_batch(self, batch: List[dict]):
+        """在一个事务中写入一批消息"""
+        if self.archive is not None:
+            await self.archive.append(batch)
+            return
+        async with self._async_session_factory() as session:
+            try:
+                await session.execute(insert(Message), batch)
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+    async def stop(self):
+        """停止后台写入任务并写入剩余的消息，退出前调用"""
+        if self._flusher is not None:
+            self._stopping = True
+            self._flush_event.set()
+            try:
+                await asyncio.gather(self._flusher, return_exceptions=True)
+            finally:
+                self._flusher = None
+                self._stopping = False
+        for _ in range(self.max_retries + 1):
+            try:
+                await self.flush()
+                break
+            except Exception as e:
+                logging.error(f"退出前写入消息失败: {str(e)}")
+        if self._retention_task is not None:
+            self._retention_task.cancel()
+            await asyncio.gather(self._retention_task, return_exceptions=True)
+            self._retention_task = None
+        if self.archive is not None:
+            await self.archive.close()
+
+    def get_stats(self) -> dict:
+        """获取消息写入统计"""
+        return {
+            "write_behind": self.write_behind,
+            "pending": len(self._pending),
+            "max_pending": self.max_pending,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "overflow_policy": self.overflow_policy,
+            "saved": self.saved,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "archive": self.archive.get_stats() if self.archive is not None else None,
+        }
+
     async def get_messages(self,
                            start_time: Optional[datetime] = None,
                            end_time: Optional[datetime] = None,
@@ -96,6 +297,24 @@ class MessageDB(metaclass=Singleton):
                            is_group: Optional[bool] = None,
                            limit: int = 100) -> List[Message]:
         """异步查询消息记录"""
+        await self._flush_for_query()
+
+        if self.archive is not None:
+            try:
+                result = await self.archive.query(
+                    from_wxid=from_wxid,
+                    sender_wxid=sender_wxid,
+                    msg_type=msg_type,
+                    is_group=is_group,
+                    start_time=start_time.timestamp() if start_time else None,
+                    end_time=end_time.timestamp() if end_time else None,
+                    limit=limit)
+            except Exception as e:
+                logging.error(f"查询消息失败: {str(e)}")
+                return []
+            return [Message(**dict(row, timestamp=datetime.fromtimestamp(row["timestamp"])))
+                    for row in result["messages"]]
+
         async with self._async_session_factory() as session:
             try:
                 query = select(Message).order_by(Message.timestamp.desc()).limit(limit)
@@ -119,12 +338,44 @@ class MessageDB(metaclass=Singleton):
                 logging.error(f"查询消息失败: {str(e)}")
                 return []
 
+    async def search_messages(self,
+                              from_wxid: Optional[str] = None,
+                              keyword: Optional[str] = None,
+                              sender_wxid: Optional[str] = None,
+                              msg_type: Optional[int] = None,
+                              start_time: Optional[datetime] = None,
+                              end_time: Optional[datetime] = None,
+                              cursor: Optional[str] = None,
+                              limit: int = 50) -> Dict[str, Any]:
+        """按关键词和会话翻页查询消息，需要开启 [MessageArchive]
+
+        Returns:
+            {"messages": [...], "next_cursor": 下一页游标，没有更多时为 None}
+        """
+        if self.archive is None:
+            raise RuntimeError("消息归档未启用，请在 main_config.toml 中开启 [MessageArchive]")
+        await self._flush_for_query()
+        return await self.archive.query(
+            from_wxid=from_wxid,
+            sender_wxid=sender_wxid,
+            keyword=keyword,
+            msg_type=msg_type,
+            start_time=start_time.timestamp() if start_time else None,
+            end_time=end_time.timestamp() if end_time else None,
+            cursor=cursor,
+            limit=limit)
+
     async def close(self):
-        """关闭数据库连接"""
+        """写入剩余消息并关闭数据库连接"""
+        await self.stop()
         await self.engine.dispose()
 
     async def cleanup_messages(self):
         """每三天清理旧消息"""
+        if self.archive is not None:
+            # 归档按分区整体删除过期数据
+            await self.archive.retention_loop()
+            return
         while True:
             async with self._async_session_factory() as session:
                 try:
@@ -0,0 +1,351 @@
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from loguru import logger
+
+from database.sqlite_pool import get_connection_manager
+
+# 所有用户的提醒保存在同一个数据库中
+DATA_DIR = "reminder_data"
+DB_PATH = os.path.join(DATA_DIR, "reminders.db")
+
+_manager = get_connection_manager(DB_PATH)
+
+# 触发后按 reminder_time 计算下一次提醒时间的类型，其他类型触发后删除
+RECURRING_TYPES = ("daily", "weekly", "monthly", "yearly", "every_hour", "every_day", "every_week")
+
+# 相对时间类型，保存时转换为 one_time
+RELATIVE_TYPES = {"minutes_later": ("分钟后", "minutes"), "hours_later": ("小时后", "hours"), "days_later": ("天后", "days")}
+
+SELECT_COLUMNS = "id, wxid, content, reminder_type, reminder_time, chat_id, is_done, next_fire"
+
+# 提醒新增、修改或删除后的回调（如唤醒提醒调度器），参数为受影响的提醒ID列表
+_write_listeners = []
+
+def add_write_listener(callback):
+    """注册提醒写入回调"""
+    _write_listeners.append(callback)
+
+def remove_write_listener(callback):
+    """移除提醒写入回调"""
+    if callback in _write_listeners:
+        _write_listeners.remove(callback)
+
+def _notify_write(reminder_ids):
+    for callback in _write_listeners:
+        try:
+            callback(reminder_ids)
+        except Exception as e:
+            logger.warning(f"提醒写入回调失败: {str(e)}")
+
+def _create_reminders_schema(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS reminders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        wxid TEXT NOT NULL,
+        content TEXT NOT NULL,
+        reminder_type TEXT NOT NULL,
+        reminder_time TEXT NOT NULL,
+        chat_id TEXT NOT NULL,
+        is_done INTEGER NOT NULL DEFAULT 0,
+        next_fire REAL
+    )
+    ''')
+    # 调度器只需要查询最早的下一次提醒时间和已到期的提醒
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reminders_next_fire ON reminders (next_fire) WHERE is_done = 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reminders_wxid ON reminders (wxid)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reminders_chat_id ON reminders (chat_id)")
+
+def create_reminders_table():
+    """创建提醒表，只在第一次调用时执行建表语句"""
+    if _manager.ensure_schema("reminders", _create_reminders_schema):
+        logger.info("提醒数据表创建完成")
+
+def next_fire_time(reminder_type: str, reminder_time: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """计算提醒在 now 之后的下一次触发时间，one_time 直接返回设定的时间，无法计算时返回 None"""
+    now = now or datetime.now()
+    try:
+        if reminder_type == "one_time":
+            if isinstance(reminder_time, str):
+                try:
+                    return datetime.strptime(reminder_time, '%Y-%m-%d %H:%M:%S')
+                except ValueError:
+                    logger.warning(f"无法解析 one_time 时间格式: {reminder_time}")
+                    return None
+            return None
+
+        elif reminder_type in ("every_day", "daily"):
+            if not reminder_time:
+                return None
+            hour, minute = map(int, reminder_time.split(":"))
+            next_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if next_time <= now:
+                next_time += timedelta(days=1)
+            return next_time
+
+        elif reminder_type == "weekly":
+            weekday, time_str = reminder_time.split()
+            weekday = int(weekday)
+            hour, minute = map(int, time_str.split(":"))
+            days_ahead = weekday - now.weekday()
+            if days_ahead <= 0:
+                days_ahead += 7
+            next_time = now + timedelta(days=days_ahead)
+            return next_time.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+        elif reminder_type == "monthly":
+            day, time_str = reminder_time.split()
+            day = int(day)
+            hour, minute = map(int, time_str.split(":"))
+            next_time = now.replace(day=day, hour=hour, minute=minute, second=0, microsecond=0)
+            if next_time <= now:
+                month = next_time.month + 1
+                year = next_time.year
+                if month > 12:
+                    month = 1
+                    year += 1
+                next_time = next_time.replace(year=year, month=month)
+            return next_time
+
+        elif reminder_type == "yearly":
+            month, day, time_str = reminder_time.split()
+            month, day = int(month), int(day)
+            hour, minute = map(int, time_str.split(":"))
+            next_time = now.replace(month=month, day=day, hour=hour, minute=minute, second=0, microsecond=0)
+            if next_time <= now:
+                next_time = next_time.replace(year=now.year + 1)
+            return next_time
+
+        elif reminder_type == "every_hour":
+            return now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+
+        elif reminder_type == "every_week":
+            hour, minute = map(int, reminder_time.split(":"))
+            next_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if next_time <= now:
+                next_time += timedelta(days=7)
+            return next_time
+
+        else:
+            logger.warning(f"未知的提醒类型: {reminder_type}")
+            return None
+    except ValueError as e:
+        logger.warning(f"时间格式错误: {reminder_time}, 错误信息: {e}")
+        return None
+
+def normalize_reminder(reminder_type: str, reminder_time: str):
+    """把相对时间（XX分钟后 等）转换为 one_time 的绝对时间
+
+    Returns:
+        (reminder_type, reminder_time, next_fire)，next_fire 为时间戳，无法计算时为 None
+    """
+    if reminder_type in RELATIVE_TYPES:
+        suffix, unit = RELATIVE_TYPES[reminder_type]
+        amount = int(str(reminder_time).replace(suffix, ""))
+        absolute_time = datetime.now() + timedelta(**{unit: amount})
+        reminder_type = "one_time"
+        reminder_time = absolute_time.strftime('%Y-%m-%d %H:%M:%S')
+
+    next_time = next_fire_time(reminder_type, reminder_time)
+    return reminder_type, reminder_time, next_time.timestamp() if next_time else None
+
+def _row_to_reminder(row):
+    return {
+        "id": row[0],
+        "wxid": row[1],
+        "content": row[2],
+        "reminder_type": row[3],
+        "reminder_time": row[4],
+        "chat_id": row[5],
+        "is_done": row[6],
+        "next_fire": row[7],
+    }
+
+def add_reminder(wxid, content, reminder_type, reminder_time, chat_id) -> Optional[int]:
+    """新增提醒，返回提醒ID，失败返回 None"""
+    try:
+        create_reminders_table()
+        reminder_type, reminder_time, next_fire = normalize_reminder(reminder_type, reminder_time)
+        with _manager.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO reminders (wxid, content, reminder_type, reminder_time, chat_id, next_fire) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (wxid, content, reminder_type, reminder_time, chat_id, next_fire))
+            new_id = cursor.lastrowid
+        _notify_write([new_id])
+        return new_id
+    except (sqlite3.Error, ValueError) as e:
+        logger.error(f"新增提醒失败: {str(e)}")
+        return None
+
+def update_reminder(reminder_id, wxid, content, reminder_type, reminder_time, chat_id) -> bool:
+    """修改提醒内容和时间，会重新计算下一次提醒时间"""
+    try:
+        create_reminders_table()
+        reminder_type, reminder_time, next_fire = normalize_reminder(reminder_type, reminder_time)
+        with _manager.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE reminders SET content = ?, reminder_type = ?, reminder_time = ?, chat_id = ?, "
+                "is_done = 0, next_fire = ? WHERE id = ? AND wxid = ?",
+                (content, reminder_type, reminder_time, chat_id, next_fire, reminder_id, wxid))
+            updated = cursor.rowcount > 0
+        if updated:
+            _notify_write([reminder_id])
+        return updated
+    except (sqlite3.Error, ValueError) as e:
+        logger.error(f"更新提醒失败: {str(e)}")
+        return False
+
+def reschedule_reminder(reminder_id, next_fire: Optional[float]) -> bool:
+    """更新提醒的下一次触发时间（调度器触发周期提醒后调用）"""
+    try:
+        create_reminders_table()
+        with _manager.transaction() as conn:
+            cursor = conn.execute("UPDATE reminders SET next_fire = ? WHERE id = ?", (next_fire, reminder_id))
+            return cursor.rowcount > 0
+    except sqlite3.Error as e:
+        logger.error(f"更新提醒时间失败: {str(e)}")
+        return False
+
+def delete_reminder(reminder_id, wxid=None) -> bool:
+    """删除提醒，指定 wxid 时只删除该用户的提醒"""
+    try:
+        create_reminders_table()
+        with _manager.transaction() as conn:
+            if wxid is None:
+                cursor = conn.execute("DELETE FROM reminders WHERE id = ?", (reminder_id,))
+            else:
+                cursor = conn.execute("DELETE FROM reminders WHERE id = ? AND wxid = ?", (reminder_id, wxid))
+            deleted = cursor.rowcount > 0
+        if deleted:
+            _notify_write([reminder_id])
+        return deleted
+    except sqlite3.Error as e:
+        logger.error(f"删除提醒失败: {str(e)}")
+        return False
+
+def delete_all_reminders(wxid) -> int:
+    """删除用户的所有提醒，返回删除的数量"""
+    try:
+        create_reminders_table()
+        with _manager.transaction() as conn:
+            ids = [row[0] for row in conn.execute("SELECT id FROM reminders WHERE wxid = ?", (wxid,))]
+            conn.execute("DELETE FROM reminders WHERE wxid = ?", (wxid,))
+        if ids:
+            _notify_write(ids)
+        return len(ids)
+    except sqlite3.Error as e:
+        logger.error(f"删除所有提醒失败: {str(e)}")
+        return 0
+
+def get_reminder(reminder_id, wxid=None, chat_id=None) -> Optional[dict]:
+    """获取一条提醒，可以同时按所有者或聊天ID过滤"""
+    try:
+        create_reminders_table()
+        sql = f"SELECT {SELECT_COLUMNS} FROM reminders WHERE id = ?"
+        params = [reminder_id]
+        if wxid is not None:
+            sql += " AND wxid = ?"
+            params.append(wxid)
+        if chat_id is not None:
+            sql += " AND chat_id = ?"
+            params.append(chat_id)
+        row = _manager.connection().execute(sql, params).fetchone()
+        return _row_to_reminder(row) if row else None
+    except sqlite3.Error as e:
+        logger.error(f"获取提醒失败: {str(e)}")
+        return None
+
+def get_reminders(wxid=None, chat_id=None) -> List[dict]:
+    """获取未完成的提醒，按ID排序
+
+    Args:
+        wxid: 只返回该用户设置的提醒
+        chat_id: 只返回在该聊天中设置的提醒
+    """
+    try:
+        create_reminders_table()
+        sql = f"SELECT {SELECT_COLUMNS} FROM reminders WHERE is_done = 0"
+        params = []
+        if wxid is not None:
+            sql += " AND wxid = ?"
+            params.append(wxid)
+        if chat_id is not None:
+            sql += " AND chat_id = ?"
+            params.append(chat_id)
+        sql += " ORDER BY id"
+        return [_row_to_reminder(row) for row in _manager.connection().execute(sql, params)]
+    except sqlite3.Error as e:
+        logger.error(f"获取提醒列表失败: {str(e)}")
+        return []
+
+def get_next_fire() -> Optional[float]:
+    """最早的下一次提醒时间（时间戳），没有待触发的提醒时返回 None"""
+    create_reminders_table()
+    row = _manager.connection().execute(
+        "SELECT MIN(next_fire) FROM reminders WHERE is_done = 0 AND next_fire IS NOT NULL").fetchone()
+    return row[0] if row else None
+
+def get_due_reminders(now: Optional[float] = None, limit: int = 100) -> List[dict]:
+    """获取已到期的提醒，按触发时间排序"""
+    create_reminders_table()
+    rows = _manager.connection().execute(
+        f"SELECT {SELECT_COLUMNS} FROM reminders WHERE is_done = 0 AND next_fire <= ? "
+        "ORDER BY next_fire LIMIT ?",
+        (now if now is not None else time.time(), limit)).fetchall()
+    return [_row_to_reminder(row) for row in rows]
+
+def migrate_legacy_files(directory: str = DATA_DIR) -> int:
+    """把旧版每个用户一个的 user_<wxid>.db 导入到统一的提醒数据库
+
+    导入后旧文件重命名为 .migrated，提醒ID会重新分配。
+
+    Returns:
+        int: 导入的提醒数
+    """
+    if not os.path.isdir(directory):
+        return 0
+    create_reminders_table()
+    migrated = 0
+    for filename in os.listdir(directory):
+        if not (filename.startswith("user_") and filename.endswith(".db")):
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            legacy = sqlite3.connect(path)
+            try:
+                rows = legacy.execute(
+                    "SELECT wxid, content, reminder_type, reminder_time, chat_id FROM reminders WHERE is_done = 0"
+                ).fetchall()
+            finally:
+                legacy.close()
+        except sqlite3.Error as e:
+            logger.warning(f"读取旧版提醒数据库 {filename} 失败: {str(e)}")
+            continue
+
+        values = []
+        for wxid, content, reminder_type, reminder_time, chat_id in rows:
+            try:
+                reminder_type, reminder_time, next_fire = normalize_reminder(reminder_type, reminder_time)
+            except ValueError:
+                next_fire = None
+            values.append((wxid or filename[5:-3], content, reminder_type, reminder_time, chat_id, next_fire))
+        with _manager.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO reminders (wxid, content, reminder_type, reminder_time, chat_id, next_fire) "
+                "VALUES (?, ?, ?, ?, ?, ?)", values)
+        os.replace(path, path + ".migrated")
+        migrated += len(values)
+
+    if migrated:
+        logger.info(f"已把旧版提醒数据导入统一数据库，共 {migrated} 条")
+        _notify_write([])
+    return migrated
+
+def init_db():
+    """初始化提醒数据库并导入旧版数据"""
+    create_reminders_table()
+    migrate_legacy_files(os.path.dirname(DB_PATH))
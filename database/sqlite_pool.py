@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List
+
+from loguru import logger
+
+
+class SQLiteConnectionManager:
+    """共享的 SQLite 连接管理器
+
+    每个线程复用一个长连接（sqlite3 连接不能跨线程使用），连接开启 WAL 模式，
+    读操作不会被写操作阻塞。sqlite3 会按 SQL 文本缓存每个连接上编译好的语句，
+    所以复用连接并使用固定的 SQL 文本即可复用预编译语句。
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0, cached_statements: int = 256):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._schemas = set()
+
+    def connection(self) -> sqlite3.Connection:
+        """获取当前线程的连接，不存在时创建"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                   cached_statements=self.cached_statements)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """在事务中执行，正常退出时提交，出现异常时回滚
+
+        Example:
+            with manager.transaction() as conn:
+                conn.execute("DELETE FROM contacts WHERE wxid = ?", (wxid,))
+        """
+        conn = self.connection()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def ensure_schema(self, name: str, create: Callable[[sqlite3.Connection], None]) -> bool:
+        """建表，同名的表结构只会创建一次
+
+        Returns:
+            bool: 本次调用是否执行了建表
+        """
+        with self._schema_lock:
+            if name in self._schemas:
+                return False
+            with self.transaction() as conn:
+                create(conn)
+            self._schemas.add(name)
+            return True
+
+    def close_all(self):
+        """关闭所有线程的连接"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        with self._schema_lock:
+            self._schemas.clear()
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.debug("关闭数据库连接失败: {}", e)
+        self._local = threading.local()
+
+
+_managers: Dict[str, SQLiteConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_connection_manager(path: str) -> SQLiteConnectionManager:
+    """获取数据库文件对应的连接管理器，同一个文件的所有模块共用"""
+    key = os.path.abspath(path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = SQLiteConnectionManager(path)
+        return manager
@@ -12,6 +12,8 @@ from loguru import logger
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 
+from utils.log_stream import log_stream
+
 # 修改导入语句，确保导入正确的bot_core模块
 try:
     # 先尝试使用相对导入（当前目录）
@@ -345,5 +347,13 @@ if __name__ == "__main__":
         backtrace=True,
         diagnose=True,
     )
+    # 管理后台的实时日志流（/ws/logs），sink 只做入队，不阻塞写日志
+    logger.add(
+        log_stream.sink,
+        format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}",
+        level="DEBUG",
+        backtrace=True,
+        diagnose=False,
+    )
 
     asyncio.run(main())
\ No newline at end of file
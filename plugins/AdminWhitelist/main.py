@@ -30,7 +30,7 @@ class AdminWhitelist(PluginBase):
 
         self.db = XYBotDB()
 
-    @on_text_message
+    @on_text_message(commands=["添加白名单", "移除白名单", "白名单列表"])
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -967,10 +967,10 @@ class Dify(PluginBase):
             # 对于群聊消息，使用发送者的wxid作为会话ID的key
             if message["IsGroup"]:
                 logger.debug(f"群聊消息，使用发送者wxid '{user_wxid}' 获取会话ID")
-                conversation_id = self.db.get_llm_thread_id(user_wxid, namespace="dify")
+                conversation_id = await self.db.aget_llm_thread_id(user_wxid, namespace="dify")
             else:
                 # 私聊消息，使用原来的FromWxid
-                conversation_id = self.db.get_llm_thread_id(message["FromWxid"], namespace="dify")
+                conversation_id = await self.db.aget_llm_thread_id(message["FromWxid"], namespace="dify")
 
             try:
                 user_username = await bot.get_nickname(user_wxid) or "未知用户"
@@ -1027,11 +1027,11 @@ class Dify(PluginBase):
                             # 根据消息类型选择正确的ID来保存会话ID
                             if message["IsGroup"]:
                                 # 群聊消息，使用发送者的wxid
-                                self.db.save_llm_thread_id(message["SenderWxid"], new_con_id, "dify")
+                                await self.db.asave_llm_thread_id(message["SenderWxid"], new_con_id, "dify")
                                 logger.debug(f"群聊消息，保存会话ID到发送者wxid: {message['SenderWxid']}")
                             else:
                                 # 私聊消息，使用原来的FromWxid
-                                self.db.save_llm_thread_id(message["FromWxid"], new_con_id, "dify")
+                                await self.db.asave_llm_thread_id(message["FromWxid"], new_con_id, "dify")
 
                         # 过滤掉思考标签
                         think_pattern = r'<think>.*?</think>'
@@ -1155,11 +1155,11 @@ class Dify(PluginBase):
                                 # 根据消息类型选择正确的ID来保存会话ID
                                 if message["IsGroup"]:
                                     # 群聊消息，使用发送者的wxid
-                                    self.db.save_llm_thread_id(message["SenderWxid"], new_con_id, "dify")
+                                    await self.db.asave_llm_thread_id(message["SenderWxid"], new_con_id, "dify")
                                     logger.debug(f"群聊消息，保存会话ID到发送者wxid: {message['SenderWxid']}")
                                 else:
                                     # 私聊消息，使用原来的FromWxid
-                                    self.db.save_llm_thread_id(message["FromWxid"], new_con_id, "dify")
+                                    await self.db.asave_llm_thread_id(message["FromWxid"], new_con_id, "dify")
                             ai_resp = ai_resp.rstrip()
 
                             # 最后再次过滤思考标签，确保完全移除
@@ -1171,11 +1171,11 @@ class Dify(PluginBase):
                             # 根据消息类型选择正确的ID来重置会话ID
                             if message["IsGroup"]:
                                 # 群聊消息，使用发送者的wxid
-                                self.db.save_llm_thread_id(message["SenderWxid"], "", "dify")
+                                await self.db.asave_llm_thread_id(message["SenderWxid"], "", "dify")
                                 logger.debug(f"群聊消息，重置会话ID，发送者wxid: {message['SenderWxid']}")
                             else:
                                 # 私聊消息，使用原来的FromWxid
-                                self.db.save_llm_thread_id(message["FromWxid"], "", "dify")
+                                await self.db.asave_llm_thread_id(message["FromWxid"], "", "dify")
                             # 重要：在递归调用时必须传递原始模型，不要重新选择
                             return await self.dify(bot, message, processed_query, files=files, specific_model=model)
                         elif resp.status == 400:
@@ -1458,11 +1458,11 @@ class Dify(PluginBase):
         # 根据消息类型选择正确的ID来获取会话ID
         if message["IsGroup"]:
             # 群聊消息，使用发送者的wxid
-            conversation_id = self.db.get_llm_thread_id(message["SenderWxid"], namespace="dify")
+            conversation_id = await self.db.aget_llm_thread_id(message["SenderWxid"], namespace="dify")
             logger.debug(f"群聊消息，从发送者wxid获取会话ID: {message['SenderWxid']}")
         else:
             # 私聊消息，使用原来的FromWxid
-            conversation_id = self.db.get_llm_thread_id(message["FromWxid"], namespace="dify")
+            conversation_id = await self.db.aget_llm_thread_id(message["FromWxid"], namespace="dify")
 
         # 如果启用了Agent模式且有思考过程，可以在这里处理
         if self.support_agent_mode and conversation_id in self.current_agent_thoughts:
@@ -53,11 +53,12 @@ class ExamplePlugin(PluginBase):
             return
         logger.info("收到了语音消息，最低优先级")
 
-    @on_image_message
+    @on_image_message(parallel=True, lazy_media=True)  # 只记录日志，可以和其他插件并行执行，也不需要框架提前下载图片
     async def handle_image(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
         logger.info("收到了图片消息")
+        # 需要图片内容时再下载: image_bytes = await message.media.bytes()
 
     @on_video_message
     async def handle_video(self, bot: WechatAPIClient, message: dict):
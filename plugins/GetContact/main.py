@@ -33,7 +33,7 @@ class GetContact(PluginBase):
 
         self.admins = main_config["admins"]
 
-    @on_text_message
+    @on_text_message(commands=lambda self: self.command)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
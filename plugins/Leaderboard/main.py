@@ -27,7 +27,7 @@ class Leaderboard(PluginBase):
 
         self.db = XYBotDB()
 
-    @on_text_message
+    @on_text_message(commands=lambda self: self.command)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -40,16 +40,9 @@ class Leaderboard(PluginBase):
 
         if "群" in command[0]:
             chatroom_members = await bot.get_chatroom_member_list(message["FromWxid"])
-            data = []
-            for member in chatroom_members:
-                wxid = member["UserName"]
-                points = self.db.get_points(wxid)
-                if points == 0:
-                    continue
-                data.append((member["NickName"], points))
-
-            data.sort(key=lambda x: x[1], reverse=True)
-            data = data[:self.max_count]
+            nicknames = {member["UserName"]: member["NickName"] for member in chatroom_members}
+            ranking = await self.db.aget_leaderboard_within(list(nicknames), self.max_count)
+            data = [(nicknames[wxid], points) for wxid, points in ranking]
 
             out_message = "-----XXXBot积分群排行榜-----"
             rank_emojis = ["👑", "🥈", "🥉"]
@@ -61,7 +54,7 @@ class Leaderboard(PluginBase):
                 out_message += f"\n{emoji}{'' if emoji else str(rank) + '.'} {nickname}   {points}分  {random_emoji}"
 
         else:
-            data = self.db.get_leaderboard(self.max_count)
+            data = await self.db.aget_leaderboard(self.max_count)
 
             wxids = [i[0] for i in data]
             nicknames = []
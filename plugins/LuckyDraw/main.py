@@ -40,7 +40,7 @@ class LuckyDraw(PluginBase):
 
         self.db = XYBotDB()
 
-    @on_text_message
+    @on_text_message(commands=lambda self: self.command)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -52,7 +52,7 @@ class LuckyDraw(PluginBase):
             return
 
         target_wxid = message["SenderWxid"]
-        target_points = self.db.get_points(target_wxid)
+        target_points = await self.db.aget_points(target_wxid)
 
         if len(command) < 2:
             await bot.send_at_message(message["FromWxid"], self.command_format, [target_wxid])
@@ -79,7 +79,7 @@ class LuckyDraw(PluginBase):
         draw_probability = self.probabilities[draw_name]["probability"]
         cost = self.probabilities[draw_name]["cost"] * draw_count
 
-        self.db.add_points(target_wxid, -cost)
+        await self.db.aadd_points(target_wxid, -cost)
 
         wins = []
 
@@ -120,7 +120,7 @@ class LuckyDraw(PluginBase):
         for win_name, win_points, win_symbol in wins:  # 统计赢取的积分
             total_win_points += win_points
 
-        self.db.add_points(target_wxid, total_win_points)  # 把赢取的积分加入数据库
+        await self.db.aadd_points(target_wxid, total_win_points)  # 把赢取的积分加入数据库
         logger.info(f"用户 {target_wxid} 在 {draw_name} 抽了 {draw_count}次 赢取了{total_win_points}积分")
         output = self.make_message(wins, draw_name, draw_count, total_win_points, cost)
         await bot.send_at_message(message["FromWxid"], output, [target_wxid])
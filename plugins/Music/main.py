@@ -83,7 +83,7 @@ class Music(PluginBase):
             logger.exception(f"解析歌曲信息失败: {e}")
             return None
 
-    @on_text_message
+    @on_text_message(commands=lambda self: [*self.command, self.play_command])
     async def handle_text(self, bot: WechatAPIClient, message: dict) -> bool:  # 添加类型提示
         """处理文本消息，实现点歌和播放功能."""
         if not self.enable:
@@ -38,7 +38,7 @@ class RedPacket(PluginBase):
         self.red_packets = {}
         self.db = XYBotDB()
 
-    @on_text_message
+    @on_text_message(commands=["发红包", "抢红包"])
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -71,7 +71,7 @@ class RedPacket(PluginBase):
             error = f"\n-----XYBot-----\n⚠️红包数量无效！最大{self.max_packet}个红包！"
         elif int(command[2]) > int(command[1]):
             error = "\n-----XYBot-----\n🔢红包数量不能大于红包积分！"
-        elif self.db.get_points(sender_wxid) < int(command[1]):
+        elif await self.db.aget_points(sender_wxid) < int(command[1]):
             error = "\n-----XYBot-----\n😭你的积分不够！"
 
         if error:
@@ -143,7 +143,7 @@ class RedPacket(PluginBase):
             "sender_nick": sender_nick
         }
 
-        self.db.add_points(sender_wxid, -points)
+        await self.db.aadd_points(sender_wxid, -points)
         logger.info(f"用户 {sender_wxid} 发了个红包 {captcha}，总计 {points} 点积分")
 
         # 发送文字消息和图片
@@ -183,7 +183,7 @@ class RedPacket(PluginBase):
             self.red_packets[captcha]["grabbed"].append(grabber_wxid)
 
             grabber_nick = await bot.get_nickname(grabber_wxid)
-            self.db.add_points(grabber_wxid, grabbed_points)
+            await self.db.aadd_points(grabber_wxid, grabbed_points)
 
             out_message = f"-----XYBot-----\n🧧恭喜 {grabber_nick} 抢到了 {grabbed_points} 点积分！👏"
             await bot.send_text_message(from_wxid, out_message)
@@ -205,7 +205,7 @@ class RedPacket(PluginBase):
                 chatroom = packet["chatroom"]
                 sender_nick = packet["sender_nick"]
 
-                self.db.add_points(sender_wxid, points_left)
+                await self.db.aadd_points(sender_wxid, points_left)
                 self.red_packets.pop(captcha)
 
                 out_message = (
@@ -5,11 +5,11 @@ from typing import List, Optional
 
 from loguru import logger
 from WechatAPI import WechatAPIClient
+from database import reminder_db
 from database.XYBotDB import XYBotDB
-from utils.decorators import on_text_message, schedule
+from utils.decorators import on_text_message
 from utils.plugin_base import PluginBase
 import os
-import sqlite3
 from datetime import datetime, timedelta
 from dateutil import parser
 import time
@@ -39,11 +39,20 @@ class Reminder(PluginBase):
         self.admin_ignore = plugin_config["admin_ignore"]
         self.whitelist_ignore = plugin_config["whitelist_ignore"]
         self.http_proxy = plugin_config["http-proxy"]
+        # 周期提醒在机器人停止期间错过的时间超过该秒数时不再补发，直接安排下一次
+        self.misfire_grace = plugin_config.get("misfire-grace", 300)
+        # 调度器最长休眠时间，兜底其他进程直接修改数据库的情况
+        self.max_sleep = plugin_config.get("max-sleep", 60)
 
         self.db = XYBotDB()
         self.processed_message_ids = set()
-        self.data_dir = "reminder_data"
+        self.data_dir = reminder_db.DATA_DIR
         os.makedirs(self.data_dir, exist_ok=True)
+        reminder_db.init_db()
+
+        self._scheduler_task = None
+        self._wakeup = None
+        self._loop = None
 
         self.store_command = "记录"
         self.query_command = ["我的记录"]
@@ -58,117 +67,27 @@ class Reminder(PluginBase):
             # ... 添加其他插件的触发命令
         ]
 
-    def get_db_path(self, wxid: str) -> str:
-        db_name = f"user_{wxid}.db"
-        return os.path.join(self.data_dir, db_name)
-
-    def create_table(self, db_path: str):
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        try:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS reminders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    wxid TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    reminder_type TEXT NOT NULL,
-                    reminder_time TEXT NOT NULL,
-                    chat_id TEXT NOT NULL,  -- 新增字段，存储创建时的聊天ID
-                    is_done INTEGER NOT NULL DEFAULT 0
-                )
-            """)
-            conn.commit()
-        except sqlite3.Error as e:
-            logger.exception(f"创建数据库表失败: {e}")
-        finally:
-            conn.close()
-
     async def store_reminder(self, wxid: str, content: str, reminder_type: str, reminder_time: str, chat_id: str) -> Optional[int]:
-        db_path = self.get_db_path(wxid)
-        self.create_table(db_path)
-        
-        # 如果是相对时间类型，计算绝对时间并转换为 one_time
-        if reminder_type in ["minutes_later", "hours_later", "days_later"]:
-            now = datetime.now()
-            if reminder_type == "minutes_later":
-                minutes = int(reminder_time.replace("分钟后", ""))
-                absolute_time = now + timedelta(minutes=minutes)
-            elif reminder_type == "hours_later":
-                hours = int(reminder_time.replace("小时后", ""))
-                absolute_time = now + timedelta(hours=hours)
-            elif reminder_type == "days_later":
-                days = int(reminder_time.replace("天后", ""))
-                absolute_time = now + timedelta(days=days)
-            reminder_time = absolute_time.strftime('%Y-%m-%d %H:%M:%S')
-            reminder_type = "one_time"
-
-        try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO reminders (wxid, content, reminder_type, reminder_time, chat_id) VALUES (?, ?, ?, ?, ?)",
-                           (wxid, content, reminder_type, reminder_time, chat_id))
-            new_id = cursor.lastrowid
-            conn.commit()
+        new_id = await asyncio.to_thread(reminder_db.add_reminder, wxid, content, reminder_type, reminder_time, chat_id)
+        if new_id is not None:
             logger.info(f"用户 {wxid} 存储备忘录成功: {content}, {reminder_type}, {reminder_time}, chat_id={chat_id}")
-            return new_id
-        except sqlite3.Error as e:
-            logger.exception(f"存储备忘录失败: {e}")
-            return None
-        finally:
-            conn.close()
+        return new_id
 
     async def query_reminders(self, wxid: str) -> List[tuple]:
-        db_path = self.get_db_path(wxid)
-        if not os.path.exists(db_path):
-            return []
-        try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, content, reminder_type, reminder_time, chat_id FROM reminders WHERE wxid = ? AND is_done = 0", (wxid,))
-            results = cursor.fetchall()
-            conn.close()
-            return results
-        except sqlite3.Error as e:
-            logger.exception(f"查询用户 {wxid} 的备忘录失败: {e}")
-            return []
-        finally:
-            conn.close()
+        reminders = await asyncio.to_thread(reminder_db.get_reminders, wxid)
+        return [(r["id"], r["content"], r["reminder_type"], r["reminder_time"], r["chat_id"]) for r in reminders]
 
     async def delete_reminder(self, wxid: str, reminder_id: int) -> bool:
-        db_path = self.get_db_path(wxid)
-        if not os.path.exists(db_path):
-            logger.warning(f"用户 {wxid} 的数据库不存在")
-            return False
-        try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM reminders WHERE id = ? AND wxid = ?", (reminder_id, wxid))
-            conn.commit()
+        if await asyncio.to_thread(reminder_db.delete_reminder, reminder_id, wxid):
             logger.info(f"删除备忘录 {reminder_id} 成功")
             return True
-        except sqlite3.Error as e:
-            logger.exception(f"删除备忘录失败: {e}")
-            return False
-        finally:
-            conn.close()
+        return False
 
     async def delete_all_reminders(self, wxid: str) -> bool:
-        db_path = self.get_db_path(wxid)
-        if not os.path.exists(db_path):
-            logger.warning(f"用户 {wxid} 的数据库不存在")
-            return False
-        try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM reminders WHERE wxid = ?", (wxid,))
-            conn.commit()
+        count = await asyncio.to_thread(reminder_db.delete_all_reminders, wxid)
+        if count:
             logger.info(f"删除用户 {wxid} 的所有备忘录成功")
-            return True
-        except sqlite3.Error as e:
-            logger.exception(f"删除所有备忘录失败: {e}")
-            return False
-        finally:
-            conn.close()
+        return count > 0
 
     @on_text_message(priority=90)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
@@ -453,59 +372,70 @@ class Reminder(PluginBase):
 
         return True
 
-    @schedule('interval', seconds=30)
-    async def check_reminders(self, bot: WechatAPIClient):
-        now = datetime.now()
-        buffer_time = timedelta(seconds=30)
-        check_start = now - buffer_time
-        check_end = now + buffer_time
-        
-        wxids = set()
-
-        for filename in os.listdir(self.data_dir):
-            if filename.startswith("user_") and filename.endswith(".db"):
-                wxid = filename[5:-3]
-                wxids.add(wxid)
-
-        for wxid in wxids:
+    async def on_enable(self, bot=None):
+        await super().on_enable(bot)
+        if bot is not None and self._scheduler_task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            reminder_db.add_write_listener(self._on_reminders_changed)
+            self._scheduler_task = asyncio.create_task(self._run_scheduler(bot))
+
+    async def on_disable(self):
+        await super().on_disable()
+        reminder_db.remove_write_listener(self._on_reminders_changed)
+        if self._scheduler_task is not None:
+            self._scheduler_task.cancel()
+            await asyncio.gather(self._scheduler_task, return_exceptions=True)
+            self._scheduler_task = None
+
+    def _on_reminders_changed(self, reminder_ids):
+        """提醒被新增、修改或删除时唤醒调度器重新计算休眠时间（管理后台可能在其他线程中调用）"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run_scheduler(self, bot: WechatAPIClient):
+        """休眠到最早的下一次提醒时间，触发到期的提醒并安排周期提醒的下一次时间"""
+        while True:
+            self._wakeup.clear()
+            next_fire = None
             try:
-                reminders = await self.query_reminders(wxid)
-                if reminders:
-                    for id, content, reminder_type, reminder_time, chat_id in reminders:
-                        try:
-                            if reminder_type == "every_day":
-                                next_time = await self.calculate_remind_time("every_day", reminder_time)
-                            else:
-                                next_time = await self.calculate_remind_time(reminder_type, reminder_time)
-                            
-                            if next_time and check_start <= next_time <= check_end:
-                                await self.send_reminder(bot, wxid, content, id, chat_id)
-                                
-                                if reminder_type in ["daily", "weekly", "monthly", "yearly", "every_hour", "every_day", "every_week"]:
-                                    new_next_time = await self.calculate_remind_time(reminder_type, reminder_time)
-                                    if new_next_time:
-                                        db_path = self.get_db_path(wxid)
-                                        conn = sqlite3.connect(db_path)
-                                        cursor = conn.cursor()
-                                        try:
-                                            cursor.execute(
-                                                "UPDATE reminders SET reminder_time = ? WHERE id = ?",
-                                                (reminder_time, id)
-                                            )
-                                            conn.commit()
-                                            logger.info(f"已更新提醒 {id} 的下次提醒时间为 {new_next_time}")
-                                        except sqlite3.Error as e:
-                                            logger.error(f"更新提醒时间失败: {e}")
-                                        finally:
-                                            conn.close()
-                                else:
-                                    await self.delete_reminder(wxid, id)
-                                
-                        except ValueError as e:
-                            logger.warning(f"时间格式错误，无法执行提醒 {id}: {e}")
-                            
+                due = await asyncio.to_thread(reminder_db.get_due_reminders, time.time())
+                for reminder in due:
+                    await self._fire_reminder(bot, reminder)
+                next_fire = await asyncio.to_thread(reminder_db.get_next_fire)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                logger.exception(f"处理用户 {wxid} 的提醒时出错: {e}")
+                logger.exception(f"处理到期提醒时出错: {e}")
+
+            delay = self.max_sleep
+            if next_fire is not None:
+                delay = min(max(0.0, next_fire - time.time()), self.max_sleep)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire_reminder(self, bot: WechatAPIClient, reminder: dict):
+        now = time.time()
+        reminder_id = reminder["id"]
+        reminder_type = reminder["reminder_type"]
+        late = now - reminder["next_fire"]
+
+        # 先更新数据库再发送，发送过程中重启也不会重复提醒
+        if reminder_type in reminder_db.RECURRING_TYPES:
+            base = datetime.fromtimestamp(max(now, reminder["next_fire"]))
+            new_next_time = reminder_db.next_fire_time(reminder_type, reminder["reminder_time"], base)
+            await asyncio.to_thread(reminder_db.reschedule_reminder, reminder_id,
+                                    new_next_time.timestamp() if new_next_time else None)
+            logger.info(f"已更新提醒 {reminder_id} 的下次提醒时间为 {new_next_time}")
+            if late > self.misfire_grace:
+                logger.info(f"提醒 {reminder_id} 已错过 {int(late)} 秒，跳过本次提醒")
+                return
+        else:
+            await asyncio.to_thread(reminder_db.delete_reminder, reminder_id)
+
+        await self.send_reminder(bot, reminder["wxid"], reminder["content"], reminder_id, reminder["chat_id"])
 
     async def send_reminder(self, bot: WechatAPIClient, wxid: str, content: str, reminder_id: int, chat_id: str):
         try:
@@ -598,83 +528,7 @@ class Reminder(PluginBase):
             return True
 
     async def calculate_remind_time(self, reminder_type: str, reminder_time: str) -> Optional[datetime]:
-        now = datetime.now()
-        try:
-            if reminder_type == "one_time":
-                if isinstance(reminder_time, str):
-                    try:
-                        return datetime.strptime(reminder_time, '%Y-%m-%d %H:%M:%S')
-                    except ValueError:
-                        logger.warning(f"无法解析 one_time 时间格式: {reminder_time}")
-                        return None
-                return None
-                
-            elif reminder_type == "every_day":
-                if not reminder_time:
-                    return None
-                hour, minute = map(int, reminder_time.split(":"))
-                next_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-                if next_time <= now:
-                    next_time += timedelta(days=1)
-                return next_time
-            
-            elif reminder_type == "daily":
-                hour, minute = map(int, reminder_time.split(":"))
-                next_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-                if next_time <= now:
-                    next_time += timedelta(days=1)
-                return next_time
-            
-            elif reminder_type == "weekly":
-                weekday, time_str = reminder_time.split()
-                weekday = int(weekday)
-                hour, minute = map(int, time_str.split(":"))
-                days_ahead = weekday - now.weekday()
-                if days_ahead <= 0:
-                    days_ahead += 7
-                next_time = now + timedelta(days=days_ahead)
-                return next_time.replace(hour=hour, minute=minute, second=0, microsecond=0)
-            
-            elif reminder_type == "monthly":
-                day, time_str = reminder_time.split()
-                day = int(day)
-                hour, minute = map(int, time_str.split(":"))
-                next_time = now.replace(day=day, hour=hour, minute=minute, second=0, microsecond=0)
-                if next_time <= now:
-                    month = next_time.month + 1
-                    year = next_time.year
-                    if month > 12:
-                        month = 1
-                        year += 1
-                    next_time = next_time.replace(year=year, month=month)
-                return next_time
-            
-            elif reminder_type == "yearly":
-                month, day, time_str = reminder_time.split()
-                month, day = int(month), int(day)
-                hour, minute = map(int, time_str.split(":"))
-                next_time = now.replace(month=month, day=day, hour=hour, minute=minute, second=0, microsecond=0)
-                if next_time <= now:
-                    next_time = next_time.replace(year=now.year + 1)
-                return next_time
-            
-            elif reminder_type == "every_hour":
-                next_time = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
-                return next_time
-            
-            elif reminder_type == "every_week":
-                hour, minute = map(int, reminder_time.split(":"))
-                next_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-                if next_time <= now:
-                    next_time += timedelta(days=7)
-                return next_time
-            
-            else:
-                logger.warning(f"未知的提醒类型: {reminder_type}")
-                return None
-        except ValueError as e:
-            logger.warning(f"时间格式错误: {reminder_time}, 错误信息: {e}")
-            return None
+        return reminder_db.next_fire_time(reminder_type, reminder_time)
 
     async def create_reminder_task(self, bot: WechatAPIClient, wxid: str, content: str, remind_time: datetime, message_id: int, new_id: int):
         now = datetime.now()
@@ -12,6 +12,7 @@ from loguru import logger
 # 导入重启函数
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from admin.restart_api import restart_system
+from utils.bot_status import bot_status_registry
 from utils.notification_service import get_notification_service
 
 class AutoRestartMonitor:
@@ -43,9 +44,10 @@ class AutoRestartMonitor:
             self.restart_cooldown = auto_restart_config.get("restart-cooldown", restart_cooldown)
             self.check_offline_trace = auto_restart_config.get("check-offline-trace", True)
             self.failure_count_threshold = auto_restart_config.get("failure-count-threshold", failure_count_threshold)
-            self.reset_threshold_multiplier = auto_restart_config.get("reset-threshold-multiplier", 3)
+            self.sync_stale_threshold = auto_restart_config.get("sync-stale-threshold", offline_threshold)
+            self.message_silence_threshold = auto_restart_config.get("message-silence-threshold", 0)
 
-            logger.info(f"从配置文件加载自动重启设置: 启用={self.enabled}, 检查间隔={self.check_interval}秒, 离线阈值={self.offline_threshold}秒, 检查掉线追踪={self.check_offline_trace}, 连续失败阈值={self.failure_count_threshold}, 重置阈值倍数={self.reset_threshold_multiplier}")
+            logger.info(f"从配置文件加载自动重启设置: 启用={self.enabled}, 检查间隔={self.check_interval}秒, 离线阈值={self.offline_threshold}秒, 检查掉线追踪={self.check_offline_trace}, 连续失败阈值={self.failure_count_threshold}, 同步停滞阈值={self.sync_stale_threshold}秒, 消息静默阈值={self.message_silence_threshold}秒")
         except Exception as e:
             logger.error(f"加载自动重启配置失败: {e}")
             # 使用默认值
@@ -54,11 +56,12 @@ class AutoRestartMonitor:
             self.offline_threshold = offline_threshold
             self.max_restart_attempts = max_restart_attempts
             self.restart_cooldown = restart_cooldown
+            self.check_offline_trace = True
+            self.failure_count_threshold = failure_count_threshold
+            self.sync_stale_threshold = offline_threshold
+            self.message_silence_threshold = 0
 
-        # 状态文件路径
         self.admin_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        self.status_file = Path(self.admin_path) / "admin" / "bot_status.json"
-        self.root_status_file = Path(self.admin_path) / "bot_status.json"
 
         # 重启记录文件
         self.restart_record_file = Path(self.admin_path) / "admin" / "restart_record.json"
@@ -69,13 +72,15 @@ class AutoRestartMonitor:
         # 监控任务
         self.monitor_task = None
         self.running = False
+        # 订阅状态注册表，状态变化时唤醒监控循环
+        self._loop = None
+        self._wakeup = None
+        self._last_status = None
 
-        # 失败计数器
-        self.failure_count = 0
-        self.last_failure_time = 0
+        # 同步健康状态来源（bot_core 的 SyncScheduler），提供 health() 方法
+        self.sync_health = None
+        self._started_at = 0.0
 
-        # 已处理的日志行哈希集合，用于避免重复计数
-        self.processed_log_hashes = set()
         # 最后一次检查的时间
         self.last_check_time = 0
 
@@ -109,25 +114,21 @@ class AutoRestartMonitor:
             logger.error(f"保存重启记录失败: {e}")
 
     def _get_bot_status(self):
-        """获取机器人状态"""
-        # 优先使用admin目录下的状态文件
-        if self.status_file.exists():
-            try:
-                with open(self.status_file, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.error(f"读取状态文件失败: {e}")
+        """获取机器人状态（读取进程内的状态注册表）"""
+        return bot_status_registry.get() or None
 
-        # 尝试使用根目录下的状态文件
-        if self.root_status_file.exists():
+    def _on_status_change(self, status_data):
+        """状态注册表的订阅回调，状态值变化时立即唤醒监控循环，不等到下一个检查间隔"""
+        status = status_data.get("status")
+        if status == self._last_status:
+            return
+        self._last_status = status
+        if self._loop is not None and self._wakeup is not None:
             try:
-                with open(self.root_status_file, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.error(f"读取根目录状态文件失败: {e}")
-
-        # 无法获取状态
-        return None
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
 
     def _can_restart(self):
         """检查是否可以重启"""
@@ -179,23 +180,37 @@ class AutoRestartMonitor:
         # 保存记录
         self._save_restart_records()
 
-    def _reset_failure_count_if_needed(self):
-        """如果距离上次失败时间超过重置时间，重置失败计数器"""
-        current_time = time.time()
-        # 使用更长的重置时间，默认为离线阈值的指定倍数
-        reset_threshold = self.offline_threshold * self.reset_threshold_multiplier
-        # 如果距离上次失败时间超过重置时间，说明已经有一段时间没有失败了，重置计数器
-        if self.last_failure_time > 0 and current_time - self.last_failure_time > reset_threshold:
-            if self.failure_count > 0:
-                logger.info(f"距离上次失败已超过 {int(current_time - self.last_failure_time)} 秒（重置阈值: {reset_threshold} 秒），重置失败计数器（之前为 {self.failure_count}）")
-                self.failure_count = 0
+    def _check_sync_health(self, current_time):
+        """根据同步健康状态判断是否掉线
+
+        Returns:
+            掉线原因，没有掉线迹象时返回 None
+        """
+        if self.sync_health is None:
+            return None
+        health = self.sync_health.health()
+
+        consecutive_failures = health["consecutive_failures"]
+        if consecutive_failures >= self.failure_count_threshold:
+            return f"连续 {consecutive_failures} 次获取新消息失败（阈值 {self.failure_count_threshold}）: {health['last_error']}"
+
+        # 同步循环卡住时不会再有失败记录，通过最后一次成功同步的时间判断
+        # 还没有同步过时从监控开始的时间算起
+        last_success = max(health["last_success_time"], health["started_at"], self._started_at)
+        if self.sync_stale_threshold and current_time - last_success > self.sync_stale_threshold:
+            return f"已有 {int(current_time - last_success)} 秒没有成功同步消息（阈值 {self.sync_stale_threshold} 秒）"
+
+        last_message = max(health["last_message_time"], health["started_at"], self._started_at)
+        if self.message_silence_threshold and current_time - last_message > self.message_silence_threshold:
+            return f"已有 {int(current_time - last_message)} 秒没有收到新消息（阈值 {self.message_silence_threshold} 秒）"
+
+        if consecutive_failures:
+            logger.debug(f"当前连续获取消息失败 {consecutive_failures}/{self.failure_count_threshold} 次")
+        return None
 
     async def _check_and_restart(self):
         """检查状态并在需要时重启"""
         try:
-            # 检查是否需要重置失败计数器
-            self._reset_failure_count_if_needed()
-
             # 获取当前状态
             status_data = self._get_bot_status()
 
@@ -205,7 +220,6 @@ class AutoRestartMonitor:
 
             current_time = time.time()
             # 更新最后一次检查的时间
-            last_check_time = self.last_check_time
             self.last_check_time = current_time
 
             status = status_data.get("status", "unknown")
@@ -216,142 +230,27 @@ class AutoRestartMonitor:
                 # 机器人在线，检查状态更新时间
                 time_since_update = current_time - timestamp
 
-                # 检查是否有掉线追踪
-                has_offline_trace = False
-
-                # 如果配置为检查掉线追踪，则检查系统日志
-                if self.check_offline_trace:
-                    # 检查日志中是否有“获取新消息失败”的记录
-                    try:
-                        # 获取日志目录
-                        logs_dir = Path(self.admin_path) / "logs"
-
-                        # 获取最新的日志文件
-                        latest_log_file = None
-                        latest_mtime = 0
-
-                        # 遍历日志目录中的所有文件
-                        for log_file in logs_dir.glob("XYBot_*.log"):
-                            # 获取文件的修改时间
-                            mtime = os.path.getmtime(log_file)
-                            # 如果这个文件比当前找到的最新文件还新，则更新
-                            if mtime > latest_mtime:
-                                latest_log_file = log_file
-                                latest_mtime = mtime
-
-                        # 如果找到了日志文件
-                        if latest_log_file and latest_log_file.exists():
-                            logger.debug(f"检查最新的日志文件: {latest_log_file}")
-                            # 检查最近的日志条目
-                            with open(latest_log_file, "r", encoding="utf-8", errors="ignore") as f:
-                                # 读取最后1000行日志
-                                lines = f.readlines()
-                                if len(lines) > 1000:
-                                    lines = lines[-1000:]
-
-                                # 记录本次检查中发现的新失败数
-                                new_failures_this_check = 0
-
-                                # 检查最近的日志中是否有“获取新消息失败”的记录
-                                for line in reversed(lines):
-                                    # 如果找到“获取新消息失败”的记录
-                                    if "获取新消息失败" in line:
-                                        # 计算日志行的哈希值，用于唯一标识
-                                        line_hash = hash(line.strip())
-
-                                        # 如果这一行已经处理过，则跳过
-                                        if line_hash in self.processed_log_hashes:
-                                            continue
-
-                                        # 提取时间戳
-                                        try:
-                                            # XYBot 日志格式可能是多种的，尝试不同的格式
-                                            # 尝试格式 1: "YYYY-MM-DD HH:MM:SS | LEVEL | 消息内容"
-                                            if " | " in line:
-                                                timestamp_str = line.split(" | ")[0]
-                                                try:
-                                                    log_time = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
-                                                except ValueError:
-                                                    # 尝试其他格式
-                                                    raise
-                                            # 尝试格式 2: 其他可能的格式
-                                            else:
-                                                # 如果没有找到时间戳，使用文件修改时间
-                                                log_time = datetime.fromtimestamp(latest_mtime)
-                                            log_timestamp = log_time.timestamp()
-
-                                            # 检查这条日志是否在最近的离线阈值时间内
-                                            if current_time - log_timestamp < self.offline_threshold:
-                                                # 检查是否是上次检查之后的新日志
-                                                if log_timestamp > last_check_time:
-                                                    # 将这一行添加到已处理集合
-                                                    self.processed_log_hashes.add(line_hash)
-
-                                                    # 更新最后失败时间
-                                                    self.last_failure_time = log_timestamp
-                                                    # 增加失败计数
-                                                    self.failure_count += 1
-                                                    new_failures_this_check += 1
-                                                    logger.warning(f"检测到新的'获取新消息失败'记录，当前失败计数: {self.failure_count}/{self.failure_count_threshold}")
-
-                                                    # 如果达到失败阈值，标记为掉线
-                                                    if self.failure_count >= self.failure_count_threshold:
-                                                        has_offline_trace = True
-                                                        logger.warning(f"连续检测到 {self.failure_count} 次'获取新消息失败'，超过阈值 {self.failure_count_threshold}，判断为掉线状态")
-                                                        # 重置失败计数器，防止重复触发
-                                                        self.failure_count = 0
-                                                        # 立即跳出循环，不再检查其他日志
-                                                        break
-                                                else:
-                                                    # 将这一行添加到已处理集合，但不增加计数
-                                                    self.processed_log_hashes.add(line_hash)
-
-                                                # 如果已经达到阈值，则跳出循环
-                                                if has_offline_trace:
-                                                    break
-                                        except Exception as e:
-                                            logger.error(f"解析日志时间戳失败: {e}")
-
-                                # 如果本次检查没有发现新的失败，则更新最后失败时间
-                                if new_failures_this_check == 0 and self.failure_count > 0:
-                                    logger.debug(f"本次检查没有发现新的失败记录，当前失败计数保持为: {self.failure_count}")
-
-                                # 定期清理已处理的日志行集合，防止内存泄漏
-                                if len(self.processed_log_hashes) > 10000:  # 如果超过一定数量，清理旧的哈希
-                                    logger.info(f"清理已处理的日志行哈希集合，当前大小: {len(self.processed_log_hashes)}")
-                                    self.processed_log_hashes = set()
-                                    logger.info("已清理已处理的日志行哈希集合")
-                    except Exception as e:
-                        logger.error(f"检查系统日志时出错: {e}")
-
-                    # 如果没有找到掉线追踪，则还是检查状态文件更新时间
-                    if not has_offline_trace:
-                        logger.debug(f"未检测到掉线追踪，状态文件最后更新时间: {int(time_since_update)} 秒前")
-                else:
-                    # 如果配置为不检查掉线追踪，则直接根据状态文件更新时间判断
-                    logger.debug("配置为不检查掉线追踪，仅根据状态文件更新时间判断")
-
                 # 判断是否需要重启
                 need_restart = False
                 restart_reason = ""
 
-                # 判断是否需要重启
                 if self.check_offline_trace:
-                    # 如果配置为检查掉线追踪，则仅在检测到掉线追踪时触发重启
-                    if has_offline_trace:
+                    # 如果配置为检查掉线追踪，则仅在同步健康状态显示掉线时触发重启
+                    offline_reason = self._check_sync_health(current_time)
+                    if offline_reason:
                         need_restart = True
-                        restart_reason = f"连续检测到 {self.failure_count_threshold} 次'获取新消息失败'的日志"
-                        logger.warning(f"连续检测到 {self.failure_count_threshold} 次'获取新消息失败'的日志，判断为掉线状态")
+                        restart_reason = offline_reason
+                        logger.warning(f"{offline_reason}，判断为掉线状态")
                     else:
-                        logger.debug(f"未检测到掉线追踪，不触发重启")
+                        logger.debug("同步健康状态正常，不触发重启")
                 else:
-                    # 如果配置为不检查掉线追踪，则根据状态文件更新时间判断
+                    # 如果配置为不检查掉线追踪，则根据状态更新时间判断
                     if time_since_update > self.offline_threshold:
                         need_restart = True
                         restart_reason = "状态长时间未更新"
                         logger.warning(f"机器人状态长时间未更新，已有 {int(time_since_update)} 秒，可能已离线")
                     else:
-                        logger.debug(f"状态文件最后更新时间: {int(time_since_update)} 秒前，不触发重启")
+                        logger.debug(f"状态最后更新时间: {int(time_since_update)} 秒前，不触发重启")
 
                 # 如果需要重启，检查是否可以重启
                 if need_restart and self._can_restart():
@@ -412,8 +311,12 @@ class AutoRestartMonitor:
             except Exception as e:
                 logger.error(f"监控循环出错: {e}")
 
-            # 等待下一次检查
-            await asyncio.sleep(self.check_interval)
+            # 等待下一次检查，状态变化时提前检查
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.check_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
 
     def start(self):
         """启动监控"""
@@ -427,6 +330,11 @@ class AutoRestartMonitor:
             return
 
         self.running = True
+        self._started_at = time.time()
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._last_status = bot_status_registry.get().get("status")
+        bot_status_registry.subscribe(self._on_status_change)
         self.monitor_task = asyncio.create_task(self._monitor_loop())
         logger.info("自动重启监控器已启动")
 
@@ -437,6 +345,7 @@ class AutoRestartMonitor:
             return
 
         self.running = False
+        bot_status_registry.unsubscribe(self._on_status_change)
         self.monitor_task.cancel()
         logger.info("自动重启监控器已停止")
 
@@ -444,13 +353,19 @@ class AutoRestartMonitor:
 auto_restart_monitor = AutoRestartMonitor()
 
 # 提供启动和停止函数
-def start_auto_restart_monitor():
-    """启动自动重启监控"""
+def start_auto_restart_monitor(sync_health=None):
+    """启动自动重启监控
+
+    Args:
+        sync_health: 提供 health() 方法的同步健康状态来源，一般为 bot_core 的 SyncScheduler
+    """
     # 检查是否启用
     if not auto_restart_monitor.enabled:
         logger.info("自动重启监控器在配置文件中被禁用，不启动")
         return
 
+    if sync_health is not None:
+        auto_restart_monitor.sync_health = sync_health
     auto_restart_monitor.start()
 
 def stop_auto_restart_monitor():
@@ -1,12 +1,19 @@
 """
 XNBot状态管理模块
 处理机器人状态更新和共享
+
+机器人状态保存在进程内的状态注册表中，管理后台、API服务和自动重启监控直接读取注册表，
+并可以订阅状态变化；bot_status.json 只用于崩溃或重启后恢复最后的状态，
+写入经过合并（防抖）并使用临时文件替换的方式，保证文件总是完整的。
 """
 
+import atexit
 import os
 import json
+import threading
 import time
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
 from loguru import logger
 
 # 全局变量
@@ -24,6 +31,117 @@ def init_status_file():
 
     return _bot_status_file
 
+
+class BotStatusRegistry:
+    """进程内的机器人状态注册表
+
+    - update: 合并更新状态并通知订阅者，订阅者在调用 update 的线程中被调用，应只做轻量操作
+    - subscribe: 注册回调 callback(status)，status 为更新后的状态副本
+    - 持久化: 更新后等待 persist_delay 秒再写文件，期间的多次更新只写一次
+    """
+
+    def __init__(self, persist_path: Path, persist_delay: float = 1.0):
+        self.persist_path = Path(persist_path)
+        self.persist_delay = persist_delay
+        self._state: Dict[str, Any] = {}
+        self._version = 0
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._persist_timer: Optional[threading.Timer] = None
+
+    def _ensure_loaded(self):
+        """第一次使用时从状态文件恢复上次的状态"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            if self.persist_path.exists():
+                with open(self.persist_path, "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+                logger.debug(f"从状态文件恢复bot状态: {self._state.get('status')}")
+        except Exception as e:
+            logger.error(f"读取状态文件失败: {e}")
+
+    @property
+    def version(self) -> int:
+        """每次更新加一，用于判断状态是否变化"""
+        return self._version
+
+    def get(self) -> Dict[str, Any]:
+        """当前状态的副本"""
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._state)
+
+    def update(self, status: Optional[str] = None, details: Optional[str] = None,
+               extra_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """合并更新状态，status 为空时只更新附加字段（不刷新 timestamp）
+
+        Returns:
+            更新后的状态副本
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if status is not None:
+                self._state["status"] = status
+                self._state["timestamp"] = time.time()
+            if details:
+                self._state["details"] = details
+            if extra_data:
+                self._state.update(extra_data)
+            self._version += 1
+            snapshot = dict(self._state)
+            listeners = list(self._listeners)
+            self._schedule_persist()
+
+        for callback in listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error(f"bot状态订阅者处理失败: {e}")
+        return snapshot
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]):
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+        return callback
+
+    def unsubscribe(self, callback: Callable[[Dict[str, Any]], None]):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _schedule_persist(self):
+        if self._persist_timer is not None:
+            return
+        self._persist_timer = threading.Timer(self.persist_delay, self.flush)
+        self._persist_timer.daemon = True
+        self._persist_timer.start()
+
+    def flush(self):
+        """立即把状态写入文件（先写临时文件再替换）"""
+        with self._lock:
+            if self._persist_timer is not None:
+                self._persist_timer.cancel()
+                self._persist_timer = None
+            if not self._loaded:
+                return
+            try:
+                self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.persist_path.with_name(f"{self.persist_path.name}.{os.getpid()}.tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._state, f, ensure_ascii=False)
+                os.replace(tmp_path, self.persist_path)
+            except Exception as e:
+                logger.error(f"保存bot状态文件失败: {e}")
+
+
+# 全局状态注册表
+bot_status_registry = BotStatusRegistry(init_status_file())
+atexit.register(bot_status_registry.flush)
+
 def set_bot_instance(bot):
     """设置bot实例，供管理后台使用"""
     global _bot_instance
@@ -40,34 +158,13 @@ def get_bot_instance():
     global _bot_instance
     return _bot_instance
 
-def update_bot_status(status, details=None):
+def update_bot_status(status, details=None, extra_data=None):
     """更新bot状态，供管理后台读取"""
-    global _bot_status_file
-
-    # 初始化状态文件
-    status_file = init_status_file()
-
     try:
-        # 读取当前状态
-        current_status = {}
-        if status_file.exists():
-            with open(status_file, "r", encoding="utf-8") as f:
-                current_status = json.load(f)
-
-        # 更新状态
-        current_status["status"] = status
-        current_status["timestamp"] = time.time()
-        current_status["initialized"] = _bot_instance is not None
-        if details:
-            current_status["details"] = details
-
-        # 确保目录存在
-        status_file.parent.mkdir(parents=True, exist_ok=True)
-
-        # 写入文件
-        with open(status_file, "w", encoding="utf-8") as f:
-            json.dump(current_status, f)
-
+        extra = {"initialized": _bot_instance is not None}
+        if extra_data and isinstance(extra_data, dict):
+            extra.update(extra_data)
+        bot_status_registry.update(status, details, extra)
         logger.debug(f"成功更新bot状态: {status}")
     except Exception as e:
         logger.error(f"更新bot状态失败: {e}")
@@ -78,22 +175,4 @@ def get_bot_status():
     Returns:
         dict: 包含机器人状态信息的字典
     """
-    global _bot_status_file
-
-    # 初始化状态文件
-    status_file = init_status_file()
-
-    try:
-        # 如果状态文件不存在，返回空字典
-        if not status_file.exists():
-            logger.warning(f"状态文件不存在: {status_file}")
-            return {}
-
-        # 读取状态文件
-        with open(status_file, "r", encoding="utf-8") as f:
-            status_data = json.load(f)
-
-        return status_data
-    except Exception as e:
-        logger.error(f"获取机器人状态失败: {e}")
-        return {}
\ No newline at end of file
+    return bot_status_registry.get()
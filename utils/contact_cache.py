@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from loguru import logger
+
+from database.contacts_db import add_write_listener, get_contact_from_db
+
+ContactLoader = Callable[[str], Awaitable[Optional[dict]]]
+
+
+def is_complete(contact: Optional[dict]) -> bool:
+    """联系人信息是否完整：有昵称，且私聊联系人的昵称不是占位用的wxid"""
+    if not contact or not contact.get("nickname"):
+        return False
+    wxid = contact.get("wxid", "")
+    return wxid.endswith("@chatroom") or contact["nickname"] != wxid
+
+
+class ContactCache:
+    """进程内的联系人缓存，XYBot、管理后台和插件共用
+
+    - 命中缓存时不访问数据库和协议服务
+    - 未命中时先查数据库，数据库中信息不完整时调用 loader（通常是请求协议服务）
+    - loader 失败（返回 None）的结果缓存 negative_ttl 秒，期间不再重复请求
+    - 同一事件循环中同一个 wxid 同时只有一次查询，其他调用等待同一个结果
+    - 联系人数据库写入时自动使对应条目失效，读取数据库期间发生过写入时不缓存读到的旧数据
+    - get 返回联系人信息的副本，修改返回值不会影响缓存
+    """
+
+    def __init__(self, ttl: float = 600.0, negative_ttl: float = 60.0, max_size: int = 5000):
+        self.ttl = float(ttl)
+        self.negative_ttl = float(negative_ttl)
+        self.max_size = max(1, int(max_size))
+
+        self._lock = threading.Lock()
+        # wxid -> (联系人信息, 过期时间, 是否为负缓存)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        # 每次失效都会增加，用来判断读取数据库期间是否发生过写入
+        self._epoch = 0
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.db_loads = 0
+        self.remote_loads = 0
+        self.remote_failures = 0
+        self.deduplicated = 0
+
+        add_write_listener(self.invalidate_many)
+
+    def configure(self, config: dict):
+        """根据 main_config.toml 的 [ContactCache] 配置调整参数"""
+        cache_config = config.get("ContactCache", {})
+        self.ttl = float(cache_config.get("ttl", self.ttl))
+        self.negative_ttl = float(cache_config.get("negative-ttl", self.negative_ttl))
+        self.max_size = max(1, int(cache_config.get("max-size", self.max_size)))
+
+    def peek(self, wxid: str, count: bool = False) -> tuple:
+        """只查缓存
+
+        Returns:
+            (是否命中, 联系人信息)，命中负缓存时返回数据库中已有的（不完整的）信息或 None
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(wxid)
+            if entry is not None:
+                contact, expires, negative = entry
+                if expires > now:
+                    self._entries.move_to_end(wxid)
+                    if count:
+                        if negative:
+                            self.negative_hits += 1
+                        else:
+                            self.hits += 1
+                    return True, contact
+                del self._entries[wxid]
+            if count:
+                self.misses += 1
+            return False, None
+
+    def put(self, wxid: str, contact: Optional[dict], negative: bool = False, epoch: Optional[int] = None):
+        """写入缓存，negative 为 True 时表示查询失败，只缓存 negative_ttl 秒
+
+        epoch 为读取前的 _epoch，之后发生过失效时不写入
+        """
+        ttl = self.negative_ttl if negative else self.ttl
+        with self._lock:
+            if epoch is not None and epoch != self._epoch:
+                return
+            self._entries[wxid] = (dict(contact) if contact is not None else None,
+                                   time.monotonic() + ttl, negative)
+            self._entries.move_to_end(wxid)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, wxid: str):
+        with self._lock:
+            self._epoch += 1
+            self._entries.pop(wxid, None)
+
+    def invalidate_many(self, wxids: Iterable[str]):
+        with self._lock:
+            self._epoch += 1
+            for wxid in wxids:
+                self._entries.pop(wxid, None)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    async def get(self, wxid: str, loader: Optional[ContactLoader] = None) -> Optional[dict]:
+        """获取联系人信息
+
+        Args:
+            wxid: 联系人wxid
+            loader: 数据库中没有完整信息时调用，返回联系人信息（并负责写入数据库），失败返回 None
+
+        Returns:
+            联系人信息的副本，找不到时返回 None
+        """
+        hit, contact = self.peek(wxid, count=True)
+        if not hit:
+            # 事件循环之间不能共享 Future，按事件循环分别去重
+            key = (asyncio.get_running_loop(), wxid)
+            future = self._inflight.get(key)
+            if future is not None:
+                self.deduplicated += 1
+            else:
+                future = asyncio.ensure_future(self._load(wxid, loader))
+                self._inflight[key] = future
+                future.add_done_callback(lambda _: self._inflight.pop(key, None))
+            contact = await asyncio.shield(future)
+        return dict(contact) if contact is not None else None
+
+    async def _load(self, wxid: str, loader: Optional[ContactLoader]) -> Optional[dict]:
+        self.db_loads += 1
+        with self._lock:
+            epoch = self._epoch
+        contact = await asyncio.to_thread(get_contact_from_db, wxid)
+        if is_complete(contact) or loader is None:
+            self.put(wxid, contact, epoch=epoch)
+            return contact
+
+        self.remote_loads += 1
+        try:
+            loaded = await loader(wxid)
+        except Exception as e:
+            logger.warning("获取联系人 {} 信息失败: {}", wxid, e)
+            loaded = None
+        # loader 内部写数据库时会使缓存失效，所以在 loader 返回后再写入
+        if loaded is None:
+            self.remote_failures += 1
+            self.put(wxid, contact, negative=True, epoch=epoch)
+            return contact
+        # 协议服务返回的是最新信息，不受读取数据库期间的写入影响
+        self.put(wxid, loaded)
+        return loaded
+
+    async def get_nickname(self, wxid: str, loader: Optional[ContactLoader] = None) -> str:
+        """获取联系人昵称，找不到时返回 wxid"""
+        contact = await self.get(wxid, loader)
+        return (contact or {}).get("nickname") or wxid
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            size = len(self._entries)
+            negative = sum(1 for _, _, negative in self._entries.values() if negative)
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": size,
+            "negative_entries": negative,
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "negative_ttl": self.negative_ttl,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+            "deduplicated": self.deduplicated,
+            "db_loads": self.db_loads,
+            "remote_loads": self.remote_loads,
+            "remote_failures": self.remote_failures,
+        }
+
+
+# 全局联系人缓存
+contact_cache = ContactCache()
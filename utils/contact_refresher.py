@@ -0,0 +1,242 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from loguru import logger
+
+from database.contacts_db import get_all_contacts, save_contacts_to_db
+
+
+def _text(value) -> str:
+    """协议返回的字符串字段可能是 {"string": "..."} 格式"""
+    if isinstance(value, dict):
+        return value.get("string") or ""
+    return str(value) if value else ""
+
+
+def parse_contact_detail(detail: dict, wxid: str = None) -> Optional[dict]:
+    """把 get_contract_detail 返回的一项转换为联系人数据库的格式，缺少wxid时返回 None
+
+    Args:
+        detail: 协议返回的联系人详情
+        wxid: 已知的wxid，为 None 时从详情中读取
+    """
+    wxid = wxid or _text(detail.get("UserName") or detail.get("Username") or detail.get("wxid"))
+    if not wxid:
+        return None
+
+    if wxid.endswith("@chatroom"):
+        contact_type = "group"
+    elif wxid.startswith("gh_"):
+        contact_type = "official"
+    else:
+        contact_type = "friend"
+
+    return {
+        "wxid": wxid,
+        "nickname": _text(detail.get("NickName") or detail.get("nickname")) or wxid,
+        "avatar": detail.get("BigHeadImgUrl") or detail.get("SmallHeadImgUrl") or detail.get("avatar") or "",
+        "remark": _text(detail.get("Remark") or detail.get("remark")),
+        "alias": _text(detail.get("Alias") or detail.get("alias")),
+        "type": contact_type,
+    }
+
+
+class ContactRefresher:
+    """批量刷新联系人详情
+
+    - 每次调用 get_contract_detail 查询一批 wxid（协议最多支持20个），最多同时进行 concurrency 批
+    - 查询结果先缓存，每满 write-batch 条在一个事务中批量写入数据库
+    - 每次写入后把尚未完成的 wxid 保存到检查点文件，中断后再次刷新会从检查点继续
+    """
+
+    def __init__(self, bot,
+                 batch_size: int = 20,
+                 concurrency: int = 2,
+                 write_batch: int = 500,
+                 retries: int = 2,
+                 checkpoint_path: str = os.path.join("database", "contact_refresh.json")):
+        self.bot = bot
+        self.batch_size = max(1, min(20, int(batch_size)))
+        self.concurrency = max(1, int(concurrency))
+        self.write_batch = max(1, int(write_batch))
+        self.retries = max(0, int(retries))
+        self.checkpoint_path = checkpoint_path
+
+        self._task: Optional[asyncio.Task] = None
+        self._pending: set = set()
+        self._buffer: List[dict] = []
+        self._buffered_wxids: List[str] = []
+        self.progress: Dict[str, Any] = {"state": "idle"}
+
+    @classmethod
+    def from_config(cls, config: dict, bot) -> "ContactRefresher":
+        """根据 main_config.toml 的 [ContactRefresh] 配置创建"""
+        refresh_config = config.get("ContactRefresh", {})
+        return cls(
+            bot,
+            batch_size=refresh_config.get("batch-size", 20),
+            concurrency=refresh_config.get("concurrency", 2),
+            write_batch=refresh_config.get("write-batch", 500),
+            retries=refresh_config.get("retries", 2),
+            checkpoint_path=refresh_config.get("checkpoint-path", os.path.join("database", "contact_refresh.json")),
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def get_progress(self) -> Dict[str, Any]:
+        """获取当前（或最近一次）刷新的进度"""
+        progress = dict(self.progress)
+        if progress.get("started_at"):
+            end = progress.get("finished_at") or time.time()
+            progress["elapsed"] = round(end - progress["started_at"], 2)
+        progress["resumable"] = os.path.exists(self.checkpoint_path)
+        return progress
+
+    def start(self, wxids: Optional[Iterable[str]] = None, resume: bool = True) -> asyncio.Task:
+        """在后台开始刷新，已经在刷新时返回正在进行的任务"""
+        if not self.running:
+            self._task = asyncio.create_task(self.refresh(wxids, resume))
+        return self._task
+
+    async def refresh(self, wxids: Optional[Iterable[str]] = None, resume: bool = True) -> Dict[str, Any]:
+        """刷新联系人详情
+
+        Args:
+            wxids: 要刷新的wxid，为 None 时刷新数据库中的所有联系人
+            resume: 存在检查点时是否从检查点继续（忽略 wxids）
+
+        Returns:
+            刷新进度
+        """
+        checkpoint = self._load_checkpoint() if resume else None
+        if checkpoint:
+            wxids = checkpoint
+            logger.info("从检查点继续刷新联系人，剩余 {} 个", len(wxids))
+        elif wxids is None:
+            contacts = await asyncio.to_thread(get_all_contacts)
+            wxids = [contact["wxid"] for contact in contacts if contact.get("wxid")]
+        wxids = list(dict.fromkeys(wxids))
+
+        # 尚未成功写入数据库的wxid，即检查点的内容
+        self._pending = set(wxids)
+        self._buffer, self._buffered_wxids = [], []
+        self.progress = {
+            "state": "running",
+            "total": len(wxids),
+            "done": 0,
+            "updated": 0,
+            "failed": 0,
+            "resumed": bool(checkpoint),
+            "started_at": time.time(),
+            "finished_at": None,
+        }
+        await self._checkpoint()
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        batches = [wxids[i:i + self.batch_size] for i in range(0, len(wxids), self.batch_size)]
+        try:
+            await asyncio.gather(*(self._refresh_batch(semaphore, batch) for batch in batches))
+            await self._flush()
+            self.progress["state"] = "finished"
+        except asyncio.CancelledError:
+            self.progress["state"] = "cancelled"
+            raise
+        except Exception as e:
+            self.progress["state"] = "failed"
+            self.progress["error"] = str(e)
+            logger.error("刷新联系人失败: {}", e)
+        finally:
+            self.progress["finished_at"] = time.time()
+            # 查询或写入失败的wxid留在检查点中，下次刷新时重试
+            await self._checkpoint()
+
+        logger.info("联系人刷新完成: 共 {} 个，更新 {} 个，失败 {} 个，耗时 {:.1f}秒",
+                    self.progress["total"], self.progress["updated"], self.progress["failed"],
+                    self.progress["finished_at"] - self.progress["started_at"])
+        return self.get_progress()
+
+    async def _fetch(self, batch: List[str]) -> Optional[list]:
+        for attempt in range(self.retries + 1):
+            try:
+                return await self.bot.get_contract_detail(batch) or []
+            except Exception as e:
+                logger.warning("获取联系人详情失败 第{}次 ({}个): {}", attempt + 1, len(batch), e)
+                if attempt < self.retries:
+                    await asyncio.sleep(1 * (attempt + 1))
+        return None
+
+    async def _refresh_batch(self, semaphore: asyncio.Semaphore, batch: List[str]):
+        async with semaphore:
+            details = await self._fetch(batch)
+
+        if details is None:
+            self.progress["failed"] += len(batch)
+            self.progress["done"] += len(batch)
+            return
+
+        # 协议没有返回的wxid（如已删除的联系人）不再重试
+        returned = set()
+        for detail in details:
+            contact = parse_contact_detail(detail) if isinstance(detail, dict) else None
+            if contact:
+                returned.add(contact["wxid"])
+                self._buffer.append(contact)
+        missing = len(set(batch) - returned)
+
+        self._buffered_wxids.extend(batch)
+        self.progress["done"] += len(batch)
+        self.progress["failed"] += missing
+
+        if len(self._buffer) >= self.write_batch:
+            await self._flush()
+
+    async def _flush(self):
+        """把缓存的查询结果写入数据库并更新检查点"""
+        if not self._buffered_wxids:
+            return
+        rows, self._buffer = self._buffer, []
+        wxids, self._buffered_wxids = self._buffered_wxids, []
+
+        if rows and not await asyncio.to_thread(save_contacts_to_db, rows):
+            # 写入失败，这些wxid留在检查点中
+            self.progress["failed"] += len(rows)
+            return
+
+        self.progress["updated"] += len(rows)
+        self._pending.difference_update(wxids)
+        await self._checkpoint()
+
+    async def _checkpoint(self):
+        # 在事件循环线程中复制，避免写文件时其他协程修改集合
+        await asyncio.to_thread(self._save_checkpoint, list(self._pending))
+
+    def _load_checkpoint(self) -> Optional[List[str]]:
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("pending") or None
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("读取联系人刷新检查点失败: {}", e)
+            return None
+
+    def _save_checkpoint(self, pending: List[str]):
+        try:
+            if not pending:
+                if os.path.exists(self.checkpoint_path):
+                    os.remove(self.checkpoint_path)
+                return
+            directory = os.path.dirname(self.checkpoint_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.checkpoint_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"pending": pending, "updated_at": int(time.time())}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.checkpoint_path)
+        except Exception as e:
+            logger.warning("保存联系人刷新检查点失败: {}", e)
@@ -0,0 +1,131 @@
+import copy
+from typing import Any, Dict, FrozenSet, Optional
+
+# 需要在写入前复制的可变类型，str/bytes/int 等不可变值直接共享
+_MUTABLE_TYPES = (dict, list, set, bytearray)
+
+_MISSING = object()
+
+
+class CowMessage(dict):
+    """写时复制的消息字典
+
+    每个事件处理函数拿到一个 CowMessage。创建时只做一次浅拷贝，图片的 base64、
+    语音的 wav 字节等大字段在所有处理函数间共享；嵌套的 dict/list 等可变值在
+    第一次被取出时才深拷贝到当前视图中。这样处理函数之间的隔离效果和每次
+    deepcopy 一致，但没有被访问的嵌套结构不会产生任何复制。
+
+    仍然是 dict 的子类，插件里的 isinstance(message, dict)、json.dumps(message)
+    等用法不受影响。
+
+    图片、语音等媒体消息的 media 属性是延迟下载句柄（utils.media.MediaHandle），
+    它不在字典的键里，不影响序列化；其他消息为 None。
+    """
+
+    __slots__ = ("_shared", "media")
+
+    def __init__(self, base: Dict[str, Any], shared_keys: Optional[FrozenSet] = None, media=None):
+        super().__init__(base)
+        self.media = media
+        # 仍与原消息共享、尚未复制的可变字段。同一条消息的多个视图共用同一个 frozenset，
+        # 只有视图真正复制或覆盖字段时才生成新的集合
+        self._shared = self.mutable_keys(base) if shared_keys is None else shared_keys
+
+    @staticmethod
+    def mutable_keys(message: Dict[str, Any]) -> FrozenSet:
+        """找出消息中需要写时复制的字段，同一条消息只需计算一次"""
+        return frozenset(key for key, value in dict.items(message) if isinstance(value, _MUTABLE_TYPES))
+
+    def _release(self, key):
+        """字段不再与原消息共享"""
+        if key in self._shared:
+            self._shared = self._shared - {key}
+
+    def _own(self, key):
+        """把共享的可变字段复制成当前视图独有的"""
+        if key in self._shared:
+            self._release(key)
+            dict.__setitem__(self, key, copy.deepcopy(dict.__getitem__(self, key)))
+
+    def _own_all(self):
+        for key in list(self._shared):
+            self._own(key)
+
+    def __getitem__(self, key):
+        self._own(key)
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def __setitem__(self, key, value):
+        self._release(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self._release(key)
+        dict.__delitem__(self, key)
+
+    def pop(self, key, default=_MISSING):
+        if key in self:
+            self._own(key)
+        self._release(key)
+        if default is _MISSING:
+            return dict.pop(self, key)
+        return dict.pop(self, key, default)
+
+    def popitem(self):
+        self._own_all()
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        dict.__setitem__(self, key, default)
+        return default
+
+    def update(self, *args, **kwargs):
+        other = dict(*args, **kwargs)
+        if self._shared:
+            self._shared = self._shared.difference(other)
+        dict.update(self, other)
+
+    def clear(self):
+        self._shared = frozenset()
+        dict.clear(self)
+
+    # dict(view)、{**view}、dict.update(view) 在类型没有重写 __iter__ 时会直接按 C 层
+    # 复制条目，绕过 __getitem__，把仍与原消息共享的嵌套字段交出去。重写 __iter__ 后
+    # 这些操作改为调用 keys() 和 __getitem__，共享字段在复制前会先被复制到当前视图
+    def __iter__(self):
+        return dict.__iter__(self)
+
+    def keys(self):
+        return dict.keys(self)
+
+    def values(self):
+        self._own_all()
+        return dict.values(self)
+
+    def items(self):
+        self._own_all()
+        return dict.items(self)
+
+    def copy(self):
+        return CowMessage(self.to_dict(), media=self.media)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """返回普通 dict（嵌套可变字段已复制）"""
+        self._own_all()
+        return dict(dict.items(self))
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self.to_dict(), memo)
+
+    def __reduce__(self):
+        return dict, (self.to_dict(),)
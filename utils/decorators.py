@@ -56,197 +56,176 @@ def remove_job_safe(scheduler: AsyncIOScheduler, job_id: str):
         pass
 
 
-def on_text_message(priority=50):
+def _mark_handler(func, event_type: str, priority=50, commands=None, patterns=None,
+                  parallel: bool = False, timeout: float = None, lazy_media: bool = False):
+    """给处理函数打上事件标记，供 EventManager 绑定
+
+    Args:
+        func: 处理函数
+        event_type: 事件类型
+        priority: 优先级，0-99，越大越先执行
+        commands: 命令关键词列表，或以插件实例为参数、返回关键词列表的函数（如 lambda self: self.command），
+            声明后只有消息第一个词命中时才调用
+        patterns: 正则列表（或返回正则列表的函数），内容匹配时才调用
+        parallel: 是否为并行处理函数。并行处理函数不参与"返回 False 阻止后续插件"的逻辑，
+            与其他处理函数并发执行，适合只做记录、统计等不需要拦截消息的插件
+        timeout: 并行处理函数的超时时间（秒），不设置时使用全局默认值
+        lazy_media: 图片、语音、视频、文件消息专用。声明后框架不会在调用前下载媒体，
+            需要时通过 await message.media.bytes() 获取，Content 等字段保持原始 XML
+    """
+    setattr(func, '_event_type', event_type)
+    setattr(func, '_priority', min(max(priority, 0), 99))
+    if commands is not None:
+        setattr(func, '_commands', commands)
+    if patterns is not None:
+        setattr(func, '_patterns', patterns)
+    if parallel:
+        setattr(func, '_parallel', True)
+    if timeout is not None:
+        setattr(func, '_timeout', timeout)
+    if lazy_media:
+        setattr(func, '_lazy_media', True)
+    return func
+
+
+def on_text_message(priority=50, commands=None, patterns=None, parallel=False, timeout=None):
     """文本消息装饰器"""
     def decorator(func):
         if callable(priority):  # 无参数调用时
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'text_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
+            return _mark_handler(priority, 'text_message')
         # 有参数调用时
-        setattr(func, '_event_type', 'text_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
+        return _mark_handler(func, 'text_message', priority, commands=commands, patterns=patterns, parallel=parallel, timeout=timeout)
 
     return decorator if not callable(priority) else decorator(priority)
 
 
-def on_image_message(priority=50):
+def on_image_message(priority=50, parallel=False, timeout=None, lazy_media=False):
     """图片消息装饰器"""
     def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'image_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'image_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
+        if callable(priority):  # 无参数调用时
+            return _mark_handler(priority, 'image_message')
+        # 有参数调用时
+        return _mark_handler(func, 'image_message', priority, parallel=parallel, timeout=timeout, lazy_media=lazy_media)
 
     return decorator if not callable(priority) else decorator(priority)
 
 
-def on_voice_message(priority=50):
+def on_voice_message(priority=50, parallel=False, timeout=None, lazy_media=False):
     """语音消息装饰器"""
     def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'voice_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'voice_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
+        if callable(priority):  # 无参数调用时
+            return _mark_handler(priority, 'voice_message')
+        # 有参数调用时
+        return _mark_handler(func, 'voice_message', priority, parallel=parallel, timeout=timeout, lazy_media=lazy_media)
 
     return decorator if not callable(priority) else decorator(priority)
 
 
-def on_emoji_message(priority=50):
+def on_emoji_message(priority=50, parallel=False, timeout=None):
     """表情消息装饰器"""
     def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'emoji_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'emoji_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
+        if callable(priority):  # 无参数调用时
+            return _mark_handler(priority, 'emoji_message')
+        # 有参数调用时
+        return _mark_handler(func, 'emoji_message', priority, parallel=parallel, timeout=timeout)
 
     return decorator if not callable(priority) else decorator(priority)
 
 
-def on_file_message(priority=50):
+def on_file_message(priority=50, parallel=False, timeout=None, lazy_media=False):
     """文件消息装饰器"""
     def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'file_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'file_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
+        if callable(priority):  # 无参数调用时
+            return _mark_handler(priority, 'file_message')
+        # 有参数调用时
+        return _mark_handler(func, 'file_message', priority, parallel=parallel, timeout=timeout, lazy_media=lazy_media)
 
     return decorator if not callable(priority) else decorator(priority)
 
 
-def on_quote_message(priority=50):
+def on_quote_message(priority=50, commands=None, patterns=None, parallel=False, timeout=None):
     """引用消息装饰器"""
     def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'quote_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'quote_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
+        if callable(priority):  # 无参数调用时
+            return _mark_handler(priority, 'quote_message')
+        # 有参数调用时
+        return _mark_handler(func, 'quote_message', priority, commands=commands, patterns=patterns, parallel=parallel, timeout=timeout)
 
     return decorator if not callable(priority) else decorator(priority)
 
 
-def on_video_message(priority=50):
+def on_video_message(priority=50, parallel=False, timeout=None, lazy_media=False):
     """视频消息装饰器"""
     def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'video_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'video_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
+        if callable(priority):  # 无参数调用时
+            return _mark_handler(priority, 'video_message')
+        # 有参数调用时
+        return _mark_handler(func, 'video_message', priority, parallel=parallel, timeout=timeout, lazy_media=lazy_media)
 
     return decorator if not callable(priority) else decorator(priority)
 
 
-def on_pat_message(priority=50):
+def on_pat_message(priority=50, parallel=False, timeout=None):
     """拍一拍消息装饰器"""
     def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'pat_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'pat_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
+        if callable(priority):  # 无参数调用时
+            return _mark_handler(priority, 'pat_message')
+        # 有参数调用时
+        return _mark_handler(func, 'pat_message', priority, parallel=parallel, timeout=timeout)
 
     return decorator if not callable(priority) else decorator(priority)
 
 
-def on_at_message(priority=50):
+def on_at_message(priority=50, commands=None, patterns=None, parallel=False, timeout=None):
     """被@消息装饰器"""
     def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'at_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'at_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
+        if callable(priority):  # 无参数调用时
+            return _mark_handler(priority, 'at_message')
+        # 有参数调用时
+        return _mark_handler(func, 'at_message', priority, commands=commands, patterns=patterns, parallel=parallel, timeout=timeout)
 
     return decorator if not callable(priority) else decorator(priority)
 
 
-def on_system_message(priority=50):
+def on_system_message(priority=50, parallel=False, timeout=None):
     """系统消息装饰器"""
     def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'system_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'system_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
+        if callable(priority):  # 无参数调用时
+            return _mark_handler(priority, 'system_message')
+        # 有参数调用时
+        return _mark_handler(func, 'system_message', priority, parallel=parallel, timeout=timeout)
 
     return decorator if not callable(priority) else decorator(priority)
 
 
-def on_other_message(priority=50):
+def on_other_message(priority=50, parallel=False, timeout=None):
     """其他消息装饰器"""
     def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'other_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'other_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
+        if callable(priority):  # 无参数调用时
+            return _mark_handler(priority, 'other_message')
+        # 有参数调用时
+        return _mark_handler(func, 'other_message', priority, parallel=parallel, timeout=timeout)
 
     return decorator if not callable(priority) else decorator(priority)
 
 
-def on_article_message(priority=50):
+def on_article_message(priority=50, parallel=False, timeout=None):
     """公众号文章消息装饰器"""
     def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'article_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'article_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
+        if callable(priority):  # 无参数调用时
+            return _mark_handler(priority, 'article_message')
+        # 有参数调用时
+        return _mark_handler(func, 'article_message', priority, parallel=parallel, timeout=timeout)
 
     return decorator if not callable(priority) else decorator(priority)
 
 
-def on_xml_message(priority=50):
+def on_xml_message(priority=50, parallel=False, timeout=None):
     """XML消息装饰器"""
     def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'xml_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'xml_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
\ No newline at end of file
+        if callable(priority):  # 无参数调用时
+            return _mark_handler(priority, 'xml_message')
+        # 有参数调用时
+        return _mark_handler(func, 'xml_message', priority, parallel=parallel, timeout=timeout)
+
+    return decorator if not callable(priority) else decorator(priority)
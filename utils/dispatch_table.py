@@ -0,0 +1,84 @@
+import re
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple
+
+from loguru import logger
+
+# 和插件里常见的 content.split(" ") / re.split(r'[\s\u2005]+') 一致，取第一个词作为命令
+_TOKEN_SPLIT = re.compile(r'[\s\u2005]+')
+
+
+def first_token(content: str) -> str:
+    """取消息内容的第一个词"""
+    return _TOKEN_SPLIT.split(content.strip(), 1)[0]
+
+
+def _resolve(value: Any, instance: object) -> Any:
+    """装饰器参数可以是以插件实例为参数的函数，在绑定时求值（命令通常来自插件配置）"""
+    if callable(value):
+        try:
+            return value(instance)
+        except Exception as e:
+            logger.error("解析插件 {} 的命令声明失败: {}", instance.__class__.__name__, e)
+            return None
+    return value
+
+
+class DispatchTable:
+    """某个事件类型的预编译分发表
+
+    插件可以在装饰器里声明命令关键词(commands)或正则(patterns)，
+    分发时只调用命令匹配的处理函数和没有声明过滤条件的"兜底"处理函数，
+    调用顺序仍然是原来的优先级顺序。
+    """
+
+    def __init__(self, handlers: List[Tuple[Callable, object, int]]):
+        self.handlers = handlers
+        self.catch_all: List[int] = []
+        self.keywords: Dict[str, List[int]] = {}
+        self.patterns: List[Tuple[Pattern, int]] = []
+
+        for position, (handler, instance, _priority) in enumerate(handlers):
+            commands = _resolve(getattr(handler, '_commands', None), instance)
+            patterns = _resolve(getattr(handler, '_patterns', None), instance)
+
+            if isinstance(commands, str):
+                commands = [commands]
+            if isinstance(patterns, (str, Pattern)):
+                patterns = [patterns]
+
+            if not commands and not patterns:
+                self.catch_all.append(position)
+                continue
+
+            for command in commands or ():
+                self.keywords.setdefault(str(command), []).append(position)
+            for pattern in patterns or ():
+                try:
+                    self.patterns.append((re.compile(pattern) if isinstance(pattern, str) else pattern, position))
+                except re.error as e:
+                    # 正则写错时退化为兜底处理函数，保证插件仍然能收到消息
+                    logger.error("处理函数 {} 的正则 {} 无效: {}", getattr(handler, '__qualname__', handler), pattern, e)
+                    self.catch_all.append(position)
+
+        self.indexed = len(self.catch_all) != len(handlers)
+        self._catch_all_handlers = [handlers[i] for i in self.catch_all]
+
+    def select(self, message: Optional[dict]) -> List[Tuple[Callable, object, int]]:
+        """返回这条消息需要调用的处理函数（按优先级排序）"""
+        if not self.indexed:
+            return self.handlers
+
+        content = message.get("Content") if isinstance(message, dict) else None
+        if not isinstance(content, str):
+            return self._catch_all_handlers
+
+        matched = set(self.keywords.get(first_token(content), ()))
+        for pattern, position in self.patterns:
+            if position not in matched and pattern.search(content):
+                matched.add(position)
+
+        if not matched:
+            return self._catch_all_handlers
+
+        matched.update(self.catch_all)
+        return [self.handlers[i] for i in sorted(matched)]
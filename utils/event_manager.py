@@ -1,9 +1,26 @@
+import asyncio
 import copy
+import time
 from typing import Callable, Dict, List
 
+from loguru import logger
+
+from utils.cow_message import CowMessage
+from utils.dispatch_table import DispatchTable
+from utils.handler_metrics import handler_metrics
+
 
 class EventManager:
     _handlers: Dict[str, List[tuple[Callable, object, int]]] = {}
+    _dispatch_tables: Dict[str, DispatchTable] = {}
+    # 并行处理函数的默认超时时间（秒）
+    parallel_timeout: float = 60.0
+
+    @classmethod
+    def configure(cls, config: dict):
+        """从 main_config.toml 读取事件分发设置"""
+        dispatch_config = config.get("MessageDispatch", {})
+        cls.parallel_timeout = float(dispatch_config.get("parallel-handler-timeout", cls.parallel_timeout))
 
     @classmethod
     def bind_instance(cls, instance: object):
@@ -19,27 +36,104 @@ class EventManager:
                 cls._handlers[event_type].append((method, instance, priority))
                 # 按优先级排序，优先级高的在前
                 cls._handlers[event_type].sort(key=lambda x: x[2], reverse=True)
+                cls._rebuild_dispatch_table(event_type)
 
     @classmethod
-    async def emit(cls, event_type: str, *args, **kwargs) -> None:
-        """触发事件"""
+    def _rebuild_dispatch_table(cls, event_type: str):
+        """处理函数变化后重新生成命令索引"""
+        cls._dispatch_tables[event_type] = DispatchTable(cls._handlers[event_type])
+
+    @classmethod
+    async def emit(cls, event_type: str, *args, media=None, **kwargs) -> None:
+        """触发事件
+
+        Args:
+            media: 媒体消息的延迟下载句柄（MediaHandle），处理函数通过 message.media 访问
+        """
         if event_type not in cls._handlers:
             return
 
         api_client, message = args
-        for handler, instance, priority in cls._handlers[event_type]:
-            # 只对 message 进行深拷贝，api_client 保持不变
-            handler_args = (api_client, copy.deepcopy(message))
-            new_kwargs = {k: copy.deepcopy(v) for k, v in kwargs.items()}
 
-            result = await handler(*handler_args, **new_kwargs)
+        # 只调用命令匹配的处理函数和兜底处理函数
+        table = cls._dispatch_tables.get(event_type)
+        handlers = table.select(message) if table is not None else cls._handlers[event_type]
+
+        shared_keys = CowMessage.mutable_keys(message)
+        parallel_tasks = []
+        try:
+            for handler, instance, priority in handlers:
+                if media is not None and not media.materialized and not getattr(handler, '_lazy_media', False):
+                    # 旧插件直接读取 Content 等字段，调用前先下载媒体
+                    await media.materialize(message)
+
+                # 每个处理函数拿到独立的写时复制消息，api_client 保持不变
+                handler_args = (api_client, CowMessage(message, shared_keys, media))
+                new_kwargs = {k: copy.deepcopy(v) for k, v in kwargs.items()}
 
-            if isinstance(result, bool):
-                # True 继续执行 False 停止执行
-                if not result:
-                    break
-            else:
-                continue  # 我也不知道你返回了个啥玩意，反正继续执行就是了
+                if getattr(handler, '_parallel', False):
+                    # 并行处理函数不影响处理链，立即启动后继续调用下一个处理函数
+                    parallel_tasks.append(asyncio.create_task(
+                        cls._run_parallel(event_type, handler, handler_args, new_kwargs)
+                    ))
+                    continue
+
+                result = await cls._run_handler(event_type, handler, handler_args, new_kwargs)
+
+                if isinstance(result, bool):
+                    # True 继续执行 False 停止执行
+                    if not result:
+                        break
+                else:
+                    continue  # 我也不知道你返回了个啥玩意，反正继续执行就是了
+        finally:
+            # 顺序处理函数抛出异常时也要等待已启动的并行处理函数
+            if parallel_tasks:
+                await asyncio.gather(*parallel_tasks)
+
+    @staticmethod
+    def _handler_name(handler: Callable) -> str:
+        instance = getattr(handler, '__self__', None)
+        if instance is not None:
+            return f"{instance.__class__.__name__}.{handler.__name__}"
+        return getattr(handler, '__qualname__', repr(handler))
+
+    @staticmethod
+    def _plugin_name(handler: Callable) -> str:
+        instance = getattr(handler, '__self__', None)
+        if instance is not None:
+            return instance.__class__.__name__
+        return getattr(handler, '__module__', None) or repr(handler)
+
+    @classmethod
+    async def _run_handler(cls, event_type: str, handler: Callable, args: tuple, kwargs: dict):
+        """调用处理函数并记录调用次数、错误、耗时和并发数"""
+        stats = handler_metrics.get(cls._plugin_name(handler), event_type)
+        stats.in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await handler(*args, **kwargs)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+            stats.calls += 1
+            stats.latency.record(time.perf_counter() - start)
+
+    @classmethod
+    async def _run_parallel(cls, event_type: str, handler: Callable, args: tuple, kwargs: dict):
+        """运行并行处理函数，超时或出错只记录日志，不影响其他处理函数"""
+        timeout = getattr(handler, '_timeout', None) or cls.parallel_timeout
+        try:
+            await asyncio.wait_for(cls._run_handler(event_type, handler, args, kwargs), timeout=timeout)
+        except asyncio.TimeoutError:
+            stats = handler_metrics.get(cls._plugin_name(handler), event_type)
+            stats.timeouts += 1
+            stats.errors += 1
+            logger.warning("并行处理函数 {} 处理 {} 超时（{}秒）", cls._handler_name(handler), event_type, timeout)
+        except Exception as e:
+            logger.exception("并行处理函数 {} 处理 {} 出错: {}", cls._handler_name(handler), event_type, e)
 
     @classmethod
     def unbind_instance(cls, instance: object):
@@ -50,3 +144,4 @@ class EventManager:
                 for handler, inst, priority in cls._handlers[event_type]
                 if inst is not instance
             ]
+            cls._rebuild_dispatch_table(event_type)
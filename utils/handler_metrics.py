@@ -0,0 +1,104 @@
+from typing import Dict, List, Optional, Tuple
+
+from utils.metrics import Histogram
+
+
+class HandlerStats:
+    """单个插件在某个事件类型上的处理统计"""
+
+    __slots__ = ("plugin", "event_type", "calls", "errors", "timeouts", "in_flight", "latency")
+
+    def __init__(self, plugin: str, event_type: str):
+        self.plugin = plugin
+        self.event_type = event_type
+        self.calls = 0
+        self.errors = 0  # 包含超时
+        self.timeouts = 0
+        self.in_flight = 0
+        self.latency = Histogram()
+
+    def snapshot(self) -> dict:
+        return {
+            "plugin": self.plugin,
+            "event_type": self.event_type,
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "in_flight": self.in_flight,
+            "latency_ms": self.latency.snapshot(),
+        }
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+class HandlerMetrics:
+    """插件事件处理函数的调用次数、错误数、延迟和并发数统计
+
+    由 EventManager 在每次调用处理函数时记录，不输出任何日志。
+    """
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str], HandlerStats] = {}
+
+    def get(self, plugin: str, event_type: str) -> HandlerStats:
+        """获取（不存在时创建）统计对象"""
+        key = (plugin, event_type)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = HandlerStats(plugin, event_type)
+        return stats
+
+    def snapshot(self, plugin: Optional[str] = None) -> List[dict]:
+        """获取统计快照，按累计耗时从高到低排序
+
+        Args:
+            plugin: 只返回指定插件的统计
+        """
+        stats = [s for s in list(self._stats.values()) if plugin is None or s.plugin == plugin]
+        stats.sort(key=lambda s: s.latency.sum, reverse=True)
+        return [s.snapshot() for s in stats]
+
+    def reset(self):
+        """清空统计"""
+        self._stats.clear()
+
+    def to_prometheus(self) -> str:
+        """导出 Prometheus 文本格式"""
+        stats = list(self._stats.values())
+        lines = []
+
+        def labels(s: HandlerStats) -> str:
+            return f'plugin="{_escape_label(s.plugin)}",event_type="{_escape_label(s.event_type)}"'
+
+        for name, help_text, kind, attr in (
+                ("xybot_handler_calls_total", "插件处理函数调用次数", "counter", "calls"),
+                ("xybot_handler_errors_total", "插件处理函数出错次数（含超时）", "counter", "errors"),
+                ("xybot_handler_timeouts_total", "并行处理函数超时次数", "counter", "timeouts"),
+                ("xybot_handler_in_flight", "正在执行的处理函数数量", "gauge", "in_flight"),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for s in stats:
+                lines.append(f"{name}{{{labels(s)}}} {getattr(s, attr)}")
+
+        name = "xybot_handler_duration_seconds"
+        lines.append(f"# HELP {name} 插件处理函数耗时")
+        lines.append(f"# TYPE {name} histogram")
+        for s in stats:
+            label = labels(s)
+            for bound, count in s.latency.cumulative():
+                lines.append(f'{name}_bucket{{{label},le="{_format_bound(bound)}"}} {count}')
+            lines.append(f"{name}_sum{{{label}}} {s.latency.sum}")
+            lines.append(f"{name}_count{{{label}}} {s.latency.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+# 全局统计实例
+handler_metrics = HandlerMetrics()
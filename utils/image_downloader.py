@@ -0,0 +1,146 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from utils.metrics import LatencyWindow
+
+
+class ImageDownloader:
+    """分段并发下载消息图片
+
+    - 第一段单独下载，根据协议服务实际返回的长度确定分段大小（服务端可能限制每段长度）
+    - 其余分段在固定大小的窗口内并发下载，单个分段失败时只重试这一段
+    - 所有分段直接写入预先分配的 bytearray，不产生拼接时的中间拷贝
+    """
+
+    def __init__(self, bot,
+                 concurrency: int = 4,
+                 chunk_size: int = 64 * 1024,
+                 max_chunk_size: int = 256 * 1024,
+                 retries: int = 2):
+        self.bot = bot
+        self.concurrency = max(1, int(concurrency))
+        self.chunk_size = max(1, int(chunk_size))
+        self.max_chunk_size = max(self.chunk_size, int(max_chunk_size))
+        self.retries = max(0, int(retries))
+
+        self.download_time = LatencyWindow()
+        self.downloads = 0
+        self.failures = 0
+        self.bytes = 0
+
+    @classmethod
+    def from_config(cls, config: dict, bot) -> "ImageDownloader":
+        """根据 main_config.toml 的 [ImageDownload] 配置创建下载器"""
+        download_config = config.get("ImageDownload", {})
+        return cls(
+            bot,
+            concurrency=download_config.get("concurrency", 4),
+            chunk_size=download_config.get("chunk-size", 64 * 1024),
+            max_chunk_size=download_config.get("max-chunk-size", 256 * 1024),
+            retries=download_config.get("retries", 2),
+        )
+
+    def _initial_chunk_size(self, length: int) -> int:
+        """按图片大小选择分段大小：小图尽量一次下载完，大图大约分成并发数个分段"""
+        target = -(-length // self.concurrency)
+        return max(self.chunk_size, min(self.max_chunk_size, target))
+
+    async def _fetch(self, msg_id, to_wxid: str, length: int, start_pos: int, size: int) -> bytes:
+        """下载一个分段，失败时重试"""
+        for attempt in range(self.retries + 1):
+            try:
+                data = await self.bot.get_msg_image(msg_id, to_wxid, length, start_pos=start_pos, chunk_size=size)
+                if data:
+                    return data
+            except Exception as e:
+                logger.debug("下载图片分段出错: MsgId={} StartPos={} 第{}次: {}", msg_id, start_pos, attempt + 1, e)
+            if attempt < self.retries:
+                await asyncio.sleep(0.2 * (attempt + 1))
+        return b""
+
+    async def download(self, msg_id, to_wxid: str, length: int) -> Tuple[Optional[bytearray], float]:
+        """下载图片
+
+        Args:
+            msg_id: 消息ID
+            to_wxid: 消息来源wxid
+            length: 图片大小（字节），来自图片XML
+
+        Returns:
+            (图片数据, 耗时秒数)，下载失败时图片数据为 None
+        """
+        start_time = time.perf_counter()
+        buffer = bytearray(length)
+        view = memoryview(buffer)
+        failed = False
+
+        def write(pos: int, data: bytes, end: int) -> int:
+            size = min(len(data), end - pos)
+            view[pos:pos + size] = memoryview(data)[:size]
+            return size
+
+        async def fetch_range(semaphore: asyncio.Semaphore, pos: int, end: int) -> bool:
+            nonlocal failed
+            async with semaphore:
+                # 服务端返回的数据比请求的短时，继续下载剩余部分
+                while pos < end and not failed:
+                    data = await self._fetch(msg_id, to_wxid, length, pos, end - pos)
+                    if not data:
+                        failed = True
+                        logger.error("图片分段下载失败: MsgId={} StartPos={}", msg_id, pos)
+                        return False
+                    pos += write(pos, data, end)
+            return not failed
+
+        try:
+            chunk_size = self._initial_chunk_size(length)
+            first = await self._fetch(msg_id, to_wxid, length, 0, chunk_size)
+            if not first and chunk_size > self.chunk_size:
+                # 大分段不被支持时退回默认分段大小
+                chunk_size = self.chunk_size
+                first = await self._fetch(msg_id, to_wxid, length, 0, chunk_size)
+            if not first:
+                return None, self._finish(start_time, 0, False)
+
+            received = write(0, first, length)
+            if received < chunk_size:
+                chunk_size = received
+
+            if received < length:
+                semaphore = asyncio.Semaphore(self.concurrency)
+                results = await asyncio.gather(*(
+                    fetch_range(semaphore, pos, min(pos + chunk_size, length))
+                    for pos in range(received, length, chunk_size)
+                ))
+                if not all(results):
+                    return None, self._finish(start_time, 0, False)
+
+            logger.debug("图片分段下载完成: MsgId={} 大小={} 分段大小={}", msg_id, length, chunk_size)
+            return buffer, self._finish(start_time, length, True)
+        finally:
+            view.release()
+
+    def _finish(self, start_time: float, size: int, success: bool) -> float:
+        elapsed = time.perf_counter() - start_time
+        self.download_time.record(elapsed)
+        self.downloads += 1
+        if success:
+            self.bytes += size
+        else:
+            self.failures += 1
+        return elapsed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取图片下载统计"""
+        return {
+            "concurrency": self.concurrency,
+            "chunk_size": self.chunk_size,
+            "max_chunk_size": self.max_chunk_size,
+            "downloads": self.downloads,
+            "failures": self.failures,
+            "bytes": self.bytes,
+            "download_ms": self.download_time.snapshot(),
+        }
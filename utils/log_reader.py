@@ -0,0 +1,287 @@
+import bisect
+import glob
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.log_stream import level_number
+
+# main.py 写入日志文件的格式: "{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}"
+TIMESTAMP_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})')
+LEVEL_PATTERN = re.compile(r'\|\s*(TRACE|DEBUG|INFO|SUCCESS|WARNING|ERROR|CRITICAL)\s*\|\s*(.*)')
+LEADING_TIMESTAMP = re.compile(rb'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})')
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_line(line: str) -> Dict[str, Any]:
+    """解析一行日志，返回 raw、level、timestamp、message，没有级别的行（如异常堆栈）按 info 处理"""
+    entry = {"raw": line}
+    level_match = LEVEL_PATTERN.search(line)
+    if level_match:
+        entry["level"] = level_match.group(1).lower()
+        entry["message"] = level_match.group(2).strip()
+    else:
+        entry["level"] = "info"
+        entry["message"] = line
+    time_match = TIMESTAMP_PATTERN.search(line)
+    if time_match:
+        entry["timestamp"] = time_match.group(1)
+    return entry
+
+
+def _level_filter(level: Optional[str], min_level: Optional[str]):
+    """返回按级别过滤的函数，level 只保留该级别，min_level 保留该级别及以上（与实时日志流一致）"""
+    level = level.lower() if level else None
+    min_no = level_number(min_level)
+    if not level and not min_no:
+        return None
+    return lambda entry: ((not level or entry["level"] == level)
+                          and (not min_no or level_number(entry["level"]) >= min_no))
+
+
+def parse_time(value: str) -> float:
+    """把 "YYYY-MM-DD HH:MM:SS" 转换为时间戳"""
+    return datetime.strptime(value.strip(), TIME_FORMAT).timestamp()
+
+
+def _line_time(line: bytes) -> Optional[float]:
+    match = LEADING_TIMESTAMP.match(line)
+    if not match:
+        return None
+    try:
+        return datetime.strptime(match.group(1).decode(), TIME_FORMAT).timestamp()
+    except ValueError:
+        return None
+
+
+def find_log_files(patterns: Iterable[str]) -> List[str]:
+    """按 glob 模式查找存在的日志文件，去重后按修改时间从新到旧排序"""
+    found = {}
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            if os.path.isfile(path):
+                found.setdefault(os.path.realpath(path), path)
+    return sorted(found.values(), key=os.path.getmtime, reverse=True)
+
+
+def iter_lines_backward(path: str, end: Optional[int] = None,
+                        block_size: int = 64 * 1024) -> Iterator[Tuple[int, bytes]]:
+    """从 end（默认文件末尾）开始按块倒序读取，逐行返回 (行首偏移, 行内容)，不读取整个文件"""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell() if end is None else min(end, f.tell())
+        remainder = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            chunk = f.read(read_size) + remainder
+            lines = chunk.split(b"\n")
+            # 第一段可能是不完整的行，留到读取前一个块时拼接
+            remainder = lines[0]
+            offset = position + len(chunk)
+            for line in reversed(lines[1:]):
+                offset -= len(line) + 1
+                yield offset + 1, line
+        if remainder:
+            yield 0, remainder
+
+
+def iter_lines_forward(path: str, start: int = 0) -> Iterator[Tuple[int, bytes]]:
+    """从 start 开始顺序读取，逐行返回 (行首偏移, 行内容)"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            yield offset, line.rstrip(b"\n")
+            offset += len(line)
+
+
+class LogIndex:
+    """单个日志文件的稀疏索引：每隔 step 字节记录一个 (时间, 行首偏移)
+
+    建索引时只在每个间隔处 seek 并读取几行，不扫描整个文件；文件增长时只补充新增部分，
+    文件变小或被替换（日志轮转）时重建。
+    """
+
+    def __init__(self, path: str, step: int = 1024 * 1024):
+        self.path = path
+        self.step = step
+        self.times: List[float] = []
+        self.offsets: List[int] = []
+        self._indexed_size = 0
+        self._identity = None
+
+    def refresh(self):
+        stat = os.stat(self.path)
+        identity = (stat.st_dev, stat.st_ino)
+        if identity != self._identity or stat.st_size < self._indexed_size:
+            self.times, self.offsets = [], []
+            self._indexed_size = 0
+            self._identity = identity
+
+        with open(self.path, "rb") as f:
+            position = self.offsets[-1] + self.step if self.offsets else 0
+            while position < stat.st_size:
+                f.seek(position)
+                if position:
+                    # 跳到下一个完整行
+                    f.readline()
+                for _ in range(64):
+                    line_offset = f.tell()
+                    line = f.readline()
+                    if not line:
+                        break
+                    line_time = _line_time(line)
+                    if line_time is not None:
+                        if not self.times or line_time >= self.times[-1]:
+                            self.times.append(line_time)
+                            self.offsets.append(line_offset)
+                        break
+                position += self.step
+        self._indexed_size = stat.st_size
+
+    def seek_offset(self, timestamp: float) -> int:
+        """返回一个不晚于 timestamp 的第一行的偏移，从这里顺序读取即可"""
+        index = bisect.bisect_left(self.times, timestamp) - 1
+        return self.offsets[index] if index >= 0 else 0
+
+
+class LogReader:
+    """日志文件读取，供管理后台和自动重启监控使用
+
+    - tail: 从文件末尾按块倒序读取最近的日志，按级别流式过滤，通过游标继续向前翻页
+    - read_range: 用稀疏索引定位到开始时间附近，顺序读取时间范围内的日志
+    """
+
+    def __init__(self, index_step: int = 1024 * 1024, block_size: int = 64 * 1024, max_limit: int = 5000):
+        self.index_step = index_step
+        self.block_size = block_size
+        self.max_limit = max_limit
+        self._indexes: Dict[str, LogIndex] = {}
+        self._lock = threading.Lock()
+
+    def _clamp(self, limit: int) -> int:
+        return self.max_limit if limit <= 0 else min(limit, self.max_limit)
+
+    def get_index(self, path: str) -> LogIndex:
+        key = os.path.realpath(path)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._indexes[key] = LogIndex(path, self.index_step)
+            index.refresh()
+            return index
+
+    def tail_lines(self, path: str, limit: int = 1000, contains: Optional[str] = None,
+                   end: Optional[int] = None) -> List[str]:
+        """最近的 limit 行原始日志（按时间顺序），contains 不为空时只返回包含该文本的行"""
+        needle = contains.encode("utf-8") if contains else None
+        lines = []
+        for _, line in iter_lines_backward(path, end, self.block_size):
+            if needle is None or needle in line:
+                lines.append(line.decode("utf-8", errors="ignore").rstrip("\r"))
+                if len(lines) >= limit:
+                    break
+        lines.reverse()
+        return lines
+
+    def tail(self, path: str, limit: int = 1000, level: Optional[str] = None,
+             cursor: Optional[int] = None, min_level: Optional[str] = None) -> Dict[str, Any]:
+        """读取 cursor（默认文件末尾）之前最近的日志
+
+        Args:
+            path: 日志文件
+            limit: 返回的条数（过滤后），0 表示 max_limit
+            level: 只返回该级别的日志
+            cursor: 上一页返回的 next_cursor，用于继续读取更早的日志
+            min_level: 只返回该级别及以上的日志
+
+        Returns:
+            {"entries": 按时间顺序的日志, "next_cursor": 更早一页的游标，没有更多时为 None}
+        """
+        limit = self._clamp(limit)
+        accept = _level_filter(level, min_level)
+        entries = []
+        oldest = None
+        for offset, line in iter_lines_backward(path, cursor, self.block_size):
+            oldest = offset
+            text = line.decode("utf-8", errors="ignore").strip()
+            if not text:
+                continue
+            entry = parse_line(text)
+            if accept and not accept(entry):
+                continue
+            entries.append(entry)
+            if len(entries) >= limit:
+                break
+        entries.reverse()
+        next_cursor = oldest if oldest and len(entries) >= limit else None
+        return {"entries": entries, "next_cursor": next_cursor}
+
+    def read_range(self, path: str, start_time: Optional[float] = None, end_time: Optional[float] = None,
+                   limit: int = 1000, level: Optional[str] = None,
+                   cursor: Optional[int] = None, min_level: Optional[str] = None) -> Dict[str, Any]:
+        """按时间顺序读取 [start_time, end_time] 内的日志
+
+        没有时间戳的行（如异常堆栈）跟随前一行的时间，级别过滤参数与 tail 相同。
+
+        Returns:
+            {"entries": [...], "next_cursor": 下一页的游标，没有更多时为 None}
+        """
+        limit = self._clamp(limit)
+        accept = _level_filter(level, min_level)
+        if cursor is not None:
+            start = cursor
+        elif start_time is not None:
+            start = self.get_index(path).seek_offset(start_time)
+        else:
+            start = 0
+
+        entries = []
+        current_time = None
+        for offset, line in iter_lines_forward(path, start):
+            line_time = _line_time(line)
+            if line_time is not None:
+                current_time = line_time
+            if end_time is not None and current_time is not None and current_time > end_time:
+                return {"entries": entries, "next_cursor": None}
+            if start_time is not None and (current_time is None or current_time < start_time):
+                continue
+            if len(entries) >= limit:
+                return {"entries": entries, "next_cursor": offset}
+            text = line.decode("utf-8", errors="ignore").strip()
+            if not text:
+                continue
+            entry = parse_line(text)
+            if accept and not accept(entry):
+                continue
+            entries.append(entry)
+        return {"entries": entries, "next_cursor": None}
+
+    def iter_range_bytes(self, path: str, start_time: Optional[float] = None,
+                         end_time: Optional[float] = None) -> Iterator[bytes]:
+        """按时间范围逐块返回原始日志内容，用于下载"""
+        start = self.get_index(path).seek_offset(start_time) if start_time is not None else 0
+        current_time = None
+        buffer = []
+        for _, line in iter_lines_forward(path, start):
+            line_time = _line_time(line)
+            if line_time is not None:
+                current_time = line_time
+            if end_time is not None and current_time is not None and current_time > end_time:
+                break
+            if start_time is not None and (current_time is None or current_time < start_time):
+                continue
+            buffer.append(line + b"\n")
+            if len(buffer) >= 1000:
+                yield b"".join(buffer)
+                buffer = []
+        if buffer:
+            yield b"".join(buffer)
+
+
+# 全局日志读取器，同一个文件的索引在多次请求之间复用
+log_reader = LogReader()
@@ -0,0 +1,180 @@
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Dict, Optional, Set
+
+# loguru 内置级别的数值，用于"某级别及以上"的过滤
+LEVEL_NUMBERS = {
+    "trace": 5,
+    "debug": 10,
+    "info": 20,
+    "success": 25,
+    "warning": 30,
+    "error": 40,
+    "critical": 50,
+}
+
+
+def level_number(level: Optional[str]) -> int:
+    """把级别名转换为数值，为空或 "all" 时返回 0（不过滤）"""
+    if not level or level.lower() == "all":
+        return 0
+    return LEVEL_NUMBERS.get(level.lower(), 0)
+
+
+class LogSubscriber:
+    """一个日志流订阅者（一个 WebSocket 连接）
+
+    每个订阅者有自己的有界队列，客户端发送太慢时丢弃最旧的日志并记录丢弃数量，
+    不会阻塞写日志的线程，也不会影响其他订阅者。
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue_size: int,
+                 level: Optional[str] = None, keyword: Optional[str] = None):
+        self.loop = loop
+        self.queue = deque(maxlen=queue_size)
+        self.dropped = 0
+        self.min_level = level_number(level)
+        self.keyword = keyword or None
+        self._event = asyncio.Event()
+        self._wake_pending = False
+        self._lock = threading.Lock()
+
+    def set_filter(self, level: Optional[str] = None, keyword: Optional[str] = None):
+        self.min_level = level_number(level)
+        self.keyword = keyword or None
+
+    def matches(self, entry: Dict[str, Any]) -> bool:
+        if entry["level_no"] < self.min_level:
+            return False
+        if self.keyword and self.keyword not in entry["raw"]:
+            return False
+        return True
+
+    def push(self, entry: Dict[str, Any]):
+        """在写日志的线程中调用，只做入队和唤醒"""
+        with self._lock:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(entry)
+            if self._wake_pending:
+                return
+            self._wake_pending = True
+        try:
+            self.loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # 事件循环已关闭，连接马上会被清理
+            pass
+
+    async def get_batch(self, max_size: int = 200) -> Dict[str, Any]:
+        """等待新日志，返回 {"entries": [...], "dropped": 自上次以来丢弃的条数}"""
+        while True:
+            with self._lock:
+                if self.queue:
+                    count = min(max_size, len(self.queue))
+                    entries = [self.queue.popleft() for _ in range(count)]
+                    dropped, self.dropped = self.dropped, 0
+                    return {"entries": entries, "dropped": dropped}
+                self._wake_pending = False
+                self._event.clear()
+            await self._event.wait()
+
+
+class LogStream:
+    """实时日志流
+
+    作为 loguru 的 sink 接收日志，保存在带序号的环形缓冲区中，并推送给订阅的 WebSocket 客户端。
+    客户端断线重连时带上最后收到的序号即可补齐缓冲区中错过的日志，缓冲区已经覆盖掉的部分
+    通过 gap 告知客户端，由客户端改用 /api/system/logs 读取。
+    """
+
+    def __init__(self, buffer_size: int = 2000, queue_size: int = 1000):
+        self.buffer_size = max(1, int(buffer_size))
+        self.queue_size = max(1, int(queue_size))
+        self._buffer = deque(maxlen=self.buffer_size)
+        self._seq = 0
+        self._subscribers: Set[LogSubscriber] = set()
+        self._lock = threading.Lock()
+
+    def configure(self, config: dict):
+        """根据 main_config.toml 的 [LogStream] 配置调整参数"""
+        stream_config = config.get("LogStream", {})
+        self.queue_size = max(1, int(stream_config.get("client-queue-size", self.queue_size)))
+        buffer_size = max(1, int(stream_config.get("buffer-size", self.buffer_size)))
+        if buffer_size != self.buffer_size:
+            with self._lock:
+                self.buffer_size = buffer_size
+                self._buffer = deque(self._buffer, maxlen=buffer_size)
+
+    def sink(self, message):
+        """loguru sink，message 为格式化后的日志文本，message.record 为日志记录"""
+        record = message.record
+        with self._lock:
+            self._seq += 1
+            entry = {
+                "seq": self._seq,
+                "timestamp": record["time"].strftime("%Y-%m-%d %H:%M:%S"),
+                "level": record["level"].name.lower(),
+                "level_no": record["level"].no,
+                "message": record["message"],
+                "raw": str(message).rstrip("\n"),
+            }
+            self._buffer.append(entry)
+            # 在锁内推送，多个线程同时写日志时每个订阅者收到的顺序与序号一致
+            for subscriber in self._subscribers:
+                if subscriber.matches(entry):
+                    subscriber.push(entry)
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def subscribe(self, level: Optional[str] = None, keyword: Optional[str] = None,
+                  since: Optional[int] = None, backlog: int = 0) -> Dict[str, Any]:
+        """订阅日志流，必须在事件循环中调用
+
+        Args:
+            level: 只接收该级别及以上的日志
+            keyword: 只接收包含该文本的日志
+            since: 上次收到的最后一个序号，补发之后的日志
+            backlog: 未指定 since 时，先补发缓冲区中最近多少条日志
+
+        Returns:
+            {"subscriber": LogSubscriber, "gap": 是否有日志已经不在缓冲区中, "last_seq": 当前序号}
+        """
+        subscriber = LogSubscriber(asyncio.get_running_loop(), self.queue_size, level, keyword)
+        gap = False
+        with self._lock:
+            # 在同一把锁内补发并注册，保证补发和实时推送之间不重复、不遗漏、不乱序
+            if since is not None:
+                oldest = self._buffer[0]["seq"] if self._buffer else self._seq + 1
+                gap = since + 1 < oldest and since < self._seq
+                missed = [entry for entry in self._buffer if entry["seq"] > since and subscriber.matches(entry)]
+            elif backlog > 0:
+                missed = [entry for entry in self._buffer if subscriber.matches(entry)][-backlog:]
+            else:
+                missed = []
+            for entry in missed:
+                subscriber.push(entry)
+            self._subscribers.add(subscriber)
+            last_seq = self._seq
+
+        return {"subscriber": subscriber, "gap": gap, "last_seq": last_seq}
+
+    def unsubscribe(self, subscriber: LogSubscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "last_seq": self._seq,
+                "buffered": len(self._buffer),
+                "buffer_size": self.buffer_size,
+                "subscribers": len(self._subscribers),
+                "client_queue_size": self.queue_size,
+            }
+
+
+# 全局日志流，main.py 把它注册为 loguru 的 sink
+log_stream = LogStream()
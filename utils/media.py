@@ -0,0 +1,97 @@
+import asyncio
+import base64
+import time
+from typing import Awaitable, Callable, Optional, Union
+
+from loguru import logger
+
+MediaData = Union[bytes, bytearray, str]
+
+
+class MediaHandle:
+    """消息中图片、语音、视频、文件的延迟下载句柄
+
+    XYBot 不再在分发事件前下载媒体，而是给消息附带一个 MediaHandle，
+    处理函数通过 ``await message.media.bytes()`` 取得数据。同一条消息只下载一次，
+    所有处理函数共用结果；没有处理函数需要时完全不下载。
+
+    为了兼容直接读取 ``message["Content"]``（或 "Video"、"File"）的旧插件，
+    EventManager 在调用没有声明 lazy_media=True 的处理函数之前，会先下载并把
+    旧格式的数据写回这个字段。
+    """
+
+    def __init__(self, kind: str, loader: Callable[[], Awaitable[Optional[MediaData]]],
+                 field: str = "Content", legacy_base64: bool = True):
+        """
+        Args:
+            kind: 媒体类型，image/voice/video/file
+            loader: 下载函数，返回原始字节或 base64 字符串，失败返回 None
+            field: 旧插件读取数据的消息字段
+            legacy_base64: 旧字段保存 base64 字符串(True)还是原始字节(False)
+        """
+        self.kind = kind
+        self.field = field
+        self.legacy_base64 = legacy_base64
+        self._loader = loader
+        self._task: Optional[asyncio.Task] = None
+        self._bytes: Optional[Union[bytes, bytearray]] = None
+        self._base64: Optional[str] = None
+        self.materialized = False
+        self.elapsed: Optional[float] = None  # 下载耗时（秒）
+
+    @property
+    def loaded(self) -> bool:
+        """是否已经下载完成（不论成功与否）"""
+        return self._task is not None and self._task.done()
+
+    async def _load(self) -> Optional[MediaData]:
+        start = time.perf_counter()
+        try:
+            return await self._loader()
+        except Exception as e:
+            logger.error("下载{}失败: {}", self.kind, e)
+            return None
+        finally:
+            self.elapsed = time.perf_counter() - start
+
+    async def _data(self) -> Optional[MediaData]:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._load())
+        # 某个处理函数被取消（如并行处理函数超时）时不影响其他处理函数等待同一个下载
+        return await asyncio.shield(self._task)
+
+    async def bytes(self) -> Optional[Union[bytes, bytearray]]:
+        """获取媒体的原始字节，下载失败返回 None"""
+        if self._bytes is None:
+            data = await self._data()
+            if isinstance(data, str):
+                self._base64 = data
+                data = base64.b64decode(data)
+            self._bytes = data
+        return self._bytes
+
+    async def base64(self) -> Optional[str]:
+        """获取媒体的 base64 字符串，下载失败返回 None"""
+        if self._base64 is None:
+            data = await self._data()
+            if isinstance(data, str):
+                self._base64 = data
+            elif data is not None:
+                self._base64 = base64.b64encode(data).decode('utf-8')
+        return self._base64
+
+    async def materialize(self, message: dict):
+        """把旧格式的数据写入消息字段，供直接读取字段的旧插件使用"""
+        if self.materialized:
+            return
+        self.materialized = True
+        value = await (self.base64() if self.legacy_base64 else self.bytes())
+        if value is not None:
+            message[self.field] = value
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # 句柄在处理函数之间共享
+        return self
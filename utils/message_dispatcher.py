@@ -0,0 +1,236 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+
+from loguru import logger
+
+from utils.metrics import LatencyWindow
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_new")
+
+
+def _wxid_of(value: Any) -> str:
+    """从协议返回的 {"string": ...} 结构或字符串中取出wxid"""
+    if isinstance(value, dict):
+        return value.get("string", "") or ""
+    return str(value) if value else ""
+
+
+def conversation_key(message: Dict[str, Any], self_wxid: Optional[str] = None) -> str:
+    """计算消息所属会话，同一会话的消息按顺序处理
+
+    在消息预处理之前调用，所以同时兼容原始的 FromUserName/ToUserName 字段
+    和预处理后的 FromWxid/ToWxid 字段。
+    """
+    from_wxid = message.get("FromWxid") or _wxid_of(message.get("FromUserName"))
+    to_wxid = message.get("ToWxid")
+    if not isinstance(to_wxid, str):
+        to_wxid = _wxid_of(to_wxid if to_wxid is not None else message.get("ToUserName"))
+
+    # 自己发出的消息归到对方（或群聊）的会话里
+    if to_wxid.endswith("@chatroom") or (self_wxid and from_wxid == self_wxid):
+        return to_wxid or from_wxid
+    return from_wxid or to_wxid
+
+
+class MessageDispatcher:
+    """有界的消息分发队列
+
+    - 总待处理消息数有上限，超过上限时按 overflow_policy 处理
+    - 固定数量的 worker 并发处理消息
+    - 同一会话（FromWxid）的消息严格按到达顺序处理，不同会话之间并行
+    """
+
+    def __init__(self,
+                 handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 workers: int = 8,
+                 max_queue_size: int = 1000,
+                 overflow_policy: str = "block",
+                 block_timeout: float = 5.0,
+                 key_func: Optional[Callable[[Dict[str, Any]], str]] = None,
+                 on_dispatch: Optional[Callable[[Dict[str, Any]], None]] = None):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            logger.warning("未知的消息队列溢出策略 {}，使用 block", overflow_policy)
+            overflow_policy = "block"
+
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.max_queue_size = max(1, int(max_queue_size))
+        self.overflow_policy = overflow_policy
+        self.block_timeout = float(block_timeout)
+        self.key_func = key_func or conversation_key
+        # 消息即将交给处理函数时调用，用于统计端到端延迟
+        self.on_dispatch = on_dispatch
+
+        # 每个会话一个待处理队列，元素为 (入队时间, 消息)
+        self._pending: Dict[str, Deque[Tuple[float, Dict[str, Any]]]] = {}
+        # 已经在就绪队列中或正在被处理的会话
+        self._scheduled: Set[str] = set()
+        self._ready: Optional[asyncio.Queue] = None
+        self._not_full: Optional[asyncio.Condition] = None
+        self._tasks = []
+        self._size = 0
+        self._busy = 0
+
+        self.wait_time = LatencyWindow()
+        self.submitted = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    @classmethod
+    def from_config(cls, config: dict, handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+                    key_func: Optional[Callable[[Dict[str, Any]], str]] = None,
+                    on_dispatch: Optional[Callable[[Dict[str, Any]], None]] = None) -> "MessageDispatcher":
+        """根据 main_config.toml 的 [MessageDispatch] 配置创建分发器"""
+        dispatch_config = config.get("MessageDispatch", {})
+        return cls(
+            handler,
+            workers=dispatch_config.get("workers", 8),
+            max_queue_size=dispatch_config.get("max-queue-size", 1000),
+            overflow_policy=dispatch_config.get("overflow-policy", "block"),
+            block_timeout=dispatch_config.get("block-timeout", 5.0),
+            key_func=key_func,
+            on_dispatch=on_dispatch,
+        )
+
+    @property
+    def depth(self) -> int:
+        """当前排队中的消息数"""
+        return self._size
+
+    def start(self):
+        """启动 worker"""
+        if self._tasks:
+            return
+        self._ready = asyncio.Queue()
+        self._not_full = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.success("消息分发队列已启动，worker数: {}，队列上限: {}，溢出策略: {}",
+                       self.workers, self.max_queue_size, self.overflow_policy)
+
+    async def stop(self, drain: bool = True, timeout: float = 10.0):
+        """停止 worker
+
+        Args:
+            drain: 是否先等待队列中的消息处理完
+            timeout: 等待处理完的最长时间（秒）
+        """
+        if drain and self._size:
+            deadline = time.monotonic() + timeout
+            while self._size and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, message: Dict[str, Any]) -> bool:
+        """把消息放入队列
+
+        Returns:
+            bool: 消息被接收返回 True，被丢弃返回 False
+        """
+        if not self._tasks:
+            self.start()
+
+        self.submitted += 1
+        if self._size >= self.max_queue_size and not await self._make_room():
+            self.dropped += 1
+            logger.warning("消息队列已满({})，丢弃新消息: {}", self._size, message.get("MsgId", ""))
+            return False
+
+        key = self.key_func(message)
+        queue = self._pending.get(key)
+        if queue is None:
+            queue = self._pending[key] = deque()
+        queue.append((time.monotonic(), message))
+        self._size += 1
+        if self._size > self.max_depth:
+            self.max_depth = self._size
+
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._ready.put_nowait(key)
+        return True
+
+    async def _make_room(self) -> bool:
+        """队列满时按溢出策略腾出空间，成功返回 True"""
+        if self.overflow_policy == "block":
+            try:
+                async with self._not_full:
+                    await asyncio.wait_for(
+                        self._not_full.wait_for(lambda: self._size < self.max_queue_size),
+                        timeout=self.block_timeout
+                    )
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+        if self.overflow_policy == "drop_oldest":
+            # 合并积压最多的会话：丢掉它最早的一条消息
+            key = max(self._pending, key=lambda k: len(self._pending[k]), default=None)
+            if key is None or not self._pending[key]:
+                return False
+            _, old_message = self._pending[key].popleft()
+            self._size -= 1
+            self.dropped += 1
+            logger.warning("消息队列已满，丢弃会话 {} 的旧消息: {}", key, old_message.get("MsgId", ""))
+            return True
+
+        return False
+
+    async def _worker(self, index: int):
+        while True:
+            key = await self._ready.get()
+            queue = self._pending.get(key)
+            if not queue:
+                self._pending.pop(key, None)
+                self._scheduled.discard(key)
+                continue
+
+            enqueued_at, message = queue.popleft()
+            self._size -= 1
+            self.wait_time.record(time.monotonic() - enqueued_at)
+            async with self._not_full:
+                self._not_full.notify()
+
+            self._busy += 1
+            try:
+                if self.on_dispatch is not None:
+                    self.on_dispatch(message)
+                await self.handler(message)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.exception("处理消息失败 (worker {}): {}", index, e)
+            finally:
+                self._busy -= 1
+
+            # 会话还有消息就重新排到就绪队列末尾，让其他会话也有机会被处理
+            if queue:
+                self._ready.put_nowait(key)
+            else:
+                self._pending.pop(key, None)
+                self._scheduled.discard(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取分发队列统计"""
+        return {
+            "workers": self.workers,
+            "busy_workers": self._busy,
+            "depth": self._size,
+            "max_depth": self.max_depth,
+            "max_queue_size": self.max_queue_size,
+            "conversations": len(self._pending),
+            "overflow_policy": self.overflow_policy,
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "wait_ms": self.wait_time.snapshot(),
+        }
@@ -0,0 +1,133 @@
+import threading
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# 默认分桶上界（秒），对数刻度，覆盖 0.5ms 到 60s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    """从已排序的样本中取分位数（最近秩法）
+
+    Args:
+        sorted_samples: 已升序排序的样本
+        q: 分位数，取值 0-100
+
+    Returns:
+        float: 分位数值，没有样本时返回 0.0
+    """
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, int(round(q / 100 * (len(sorted_samples) - 1)))))
+    return sorted_samples[index]
+
+
+class LatencyWindow:
+    """固定容量的延迟采样窗口
+
+    只保留最近 size 个样本，用于计算 p50/p99 等分位数。
+    记录操作是 O(1) 的，只有在读取统计时才排序。
+    """
+
+    def __init__(self, size: int = 1024):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float):
+        """记录一个样本（单位由调用方决定，一般为秒）"""
+        with self._lock:
+            self._samples.append(value)
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def percentiles(self, qs: Iterable[float] = (50, 99)) -> Dict[str, float]:
+        """计算最近样本的分位数"""
+        with self._lock:
+            samples = sorted(self._samples)
+        return {f"p{int(q) if float(q).is_integer() else q}": percentile(samples, q) for q in qs}
+
+    def snapshot(self, qs: Iterable[float] = (50, 99)) -> Dict[str, float]:
+        """获取统计快照，延迟以毫秒返回"""
+        stats = {k: round(v * 1000, 3) for k, v in self.percentiles(qs).items()}
+        stats["count"] = self.count
+        stats["avg"] = round(self.total / self.count * 1000, 3) if self.count else 0.0
+        stats["max"] = round(self.max * 1000, 3)
+        return stats
+
+
+
+class Histogram:
+    """固定分桶的直方图
+
+    记录时只做一次二分查找和计数，不保存样本，内存占用固定，适合在每次
+    处理函数调用时记录。分位数通过桶内线性插值估算，精度取决于分桶。
+    只在事件循环线程中写入，其他线程读取时可能看到略微不一致的快照，不影响统计用途。
+    """
+
+    __slots__ = ("bounds", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        # 最后一个桶是 +Inf
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, value: float):
+        """记录一个样本（秒）"""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """估算分位数
+
+        Args:
+            q: 分位数，取值 0-100
+
+        Returns:
+            float: 估算值，没有样本时返回 0.0
+        """
+        counts = list(self.counts)
+        total = sum(counts)
+        if not total:
+            return 0.0
+
+        rank = q / 100 * total
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if not bucket_count or cumulative + bucket_count < rank:
+                cumulative += bucket_count
+                continue
+            lower = self.bounds[index - 1] if index > 0 else 0.0
+            upper = self.bounds[index] if index < len(self.bounds) else self.max
+            value = lower + (upper - lower) * (rank - cumulative) / bucket_count
+            return min(value, self.max)
+        return self.max
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """返回 (上界, 累计数量) 列表，最后一项上界为 inf，用于 Prometheus 输出"""
+        result = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.bounds + (float("inf"),), list(self.counts)):
+            cumulative += bucket_count
+            result.append((bound, cumulative))
+        return result
+
+    def snapshot(self, qs: Iterable[float] = (50, 95, 99)) -> Dict[str, float]:
+        """获取统计快照，延迟以毫秒返回"""
+        stats = {f"p{int(q) if float(q).is_integer() else q}": round(self.quantile(q) * 1000, 3) for q in qs}
+        stats["count"] = self.count
+        stats["avg"] = round(self.sum / self.count * 1000, 3) if self.count else 0.0
+        stats["max"] = round(self.max * 1000, 3)
+        return stats
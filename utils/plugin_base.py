@@ -3,6 +3,7 @@ from abc import ABC
 from loguru import logger
 
 from .decorators import scheduler, add_job_safe, remove_job_safe
+from .handler_metrics import handler_metrics
 
 
 class PluginBase(ABC):
@@ -46,3 +47,7 @@ class PluginBase(ABC):
     async def async_init(self):
         """插件异步初始化"""
         return
+
+    def get_handler_stats(self) -> list:
+        """获取本插件各事件处理函数的调用次数、错误数、耗时等统计"""
+        return handler_metrics.snapshot(self.__class__.__name__)
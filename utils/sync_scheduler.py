@@ -0,0 +1,138 @@
+import random
+import time
+from typing import Any, Dict
+
+from utils.metrics import LatencyWindow
+
+
+class SyncScheduler:
+    """消息同步轮询间隔调度
+
+    - 拉到消息后立即再次拉取
+    - 空闲时从 min_interval 开始按 backoff_factor 指数退避，最多到 max_interval
+    - 失败时从 failure_min_interval 开始指数退避，最多到 failure_max_interval
+    - 所有等待时间都加上 ±jitter 比例的随机抖动，避免和其他轮询同步
+
+    同时记录同步健康状态（连续失败次数、最后一次成功同步和收到消息的时间），
+    自动重启监控器通过 health() 直接读取，不需要扫描日志。
+    """
+
+    def __init__(self,
+                 min_interval: float = 0.1,
+                 max_interval: float = 1.0,
+                 backoff_factor: float = 2.0,
+                 jitter: float = 0.1,
+                 failure_min_interval: float = 1.0,
+                 failure_max_interval: float = 30.0):
+        self.min_interval = max(0.0, float(min_interval))
+        self.max_interval = max(self.min_interval, float(max_interval))
+        self.backoff_factor = max(1.0, float(backoff_factor))
+        self.jitter = min(max(float(jitter), 0.0), 1.0)
+        self.failure_min_interval = max(0.0, float(failure_min_interval))
+        self.failure_max_interval = max(self.failure_min_interval, float(failure_max_interval))
+
+        self._idle_interval = 0.0
+        self._failure_interval = 0.0
+
+        # 消息从 CreateTime 到被分发给处理函数的延迟
+        self.ingest_latency = LatencyWindow()
+        self.polls = 0
+        self.empty_polls = 0
+        self.failures = 0
+        self.last_delay = 0.0
+
+        # 同步健康状态
+        self.started_at = time.time()
+        self.consecutive_failures = 0
+        self.last_success_time = 0.0
+        self.last_failure_time = 0.0
+        self.last_message_time = 0.0
+        self.last_error = ""
+
+    @classmethod
+    def from_config(cls, config: dict) -> "SyncScheduler":
+        """根据 main_config.toml 的 [SyncLoop] 配置创建调度器"""
+        sync_config = config.get("SyncLoop", {})
+        return cls(
+            min_interval=sync_config.get("min-interval", 0.1),
+            max_interval=sync_config.get("max-interval", 1.0),
+            backoff_factor=sync_config.get("backoff-factor", 2.0),
+            jitter=sync_config.get("jitter", 0.1),
+            failure_min_interval=sync_config.get("failure-min-interval", 1.0),
+            failure_max_interval=sync_config.get("failure-max-interval", 30.0),
+        )
+
+    def _with_jitter(self, delay: float) -> float:
+        if delay <= 0 or not self.jitter:
+            return delay
+        return max(0.0, delay * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def on_messages(self, count: int) -> float:
+        """本次同步成功，返回下次同步前需要等待的秒数"""
+        self.polls += 1
+        self._failure_interval = 0.0
+        self.consecutive_failures = 0
+        self.last_success_time = time.time()
+        if count > 0:
+            self.last_message_time = self.last_success_time
+            self._idle_interval = 0.0
+            self.last_delay = 0.0
+            return 0.0
+
+        self.empty_polls += 1
+        if self._idle_interval <= 0:
+            self._idle_interval = self.min_interval
+        else:
+            self._idle_interval = min(self.max_interval, self._idle_interval * self.backoff_factor)
+        self.last_delay = self._with_jitter(self._idle_interval)
+        return self.last_delay
+
+    def on_failure(self, error: Any = None) -> float:
+        """本次同步失败，返回下次重试前需要等待的秒数"""
+        self.polls += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_failure_time = time.time()
+        if error is not None:
+            self.last_error = str(error)[:200]
+        if self._failure_interval <= 0:
+            self._failure_interval = self.failure_min_interval
+        else:
+            self._failure_interval = min(self.failure_max_interval, self._failure_interval * self.backoff_factor)
+        self.last_delay = self._with_jitter(self._failure_interval)
+        return self.last_delay
+
+    def record_ingest(self, message: Dict[str, Any]):
+        """记录消息从 CreateTime 到被分发的延迟"""
+        create_time = message.get("CreateTime")
+        if not create_time:
+            return
+        try:
+            latency = time.time() - float(create_time)
+        except (TypeError, ValueError):
+            return
+        self.ingest_latency.record(max(0.0, latency))
+
+    def health(self) -> Dict[str, Any]:
+        """同步健康状态，时间均为时间戳，从未发生时为 0"""
+        return {
+            "started_at": self.started_at,
+            "consecutive_failures": self.consecutive_failures,
+            "last_success_time": self.last_success_time,
+            "last_failure_time": self.last_failure_time,
+            "last_message_time": self.last_message_time,
+            "last_error": self.last_error,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取同步统计"""
+        return {
+            "polls": self.polls,
+            "empty_polls": self.empty_polls,
+            "failures": self.failures,
+            "last_delay_ms": round(self.last_delay * 1000, 3),
+            "min_interval": self.min_interval,
+            "max_interval": self.max_interval,
+            "ingest_latency_ms": self.ingest_latency.snapshot(),
+            "health": self.health(),
+        }
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+from loguru import logger
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+class SystemMetricsSampler:
+    """后台系统指标采样器
+
+    在独立线程中按固定间隔采集 CPU、内存、磁盘、网络和本进程的指标，保存在环形缓冲区中。
+    CPU 使用率用两次采样之间的差值计算（cpu_percent(interval=None)），不需要阻塞等待，
+    管理后台的接口直接读取最近一次采样，不会卡住事件循环。
+    """
+
+    def __init__(self, interval: float = 5.0, history_size: int = 720, disk_path: str = "/"):
+        self.interval = max(0.5, float(interval))
+        self.history_size = max(1, int(history_size))
+        self.disk_path = disk_path
+
+        self._samples = deque(maxlen=self.history_size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._process = None
+
+    def configure(self, config: dict):
+        """根据 main_config.toml 的 [SystemMetrics] 配置调整参数"""
+        metrics_config = config.get("SystemMetrics", {})
+        self.interval = max(0.5, float(metrics_config.get("interval", self.interval)))
+        self.disk_path = metrics_config.get("disk-path", self.disk_path)
+        history_size = max(1, int(metrics_config.get("history-size", self.history_size)))
+        if history_size != self.history_size:
+            with self._lock:
+                self.history_size = history_size
+                self._samples = deque(self._samples, maxlen=history_size)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """启动采样线程，已经在运行时不做任何事"""
+        if psutil is None or self.running:
+            return
+        self._stop.clear()
+        self._process = psutil.Process(os.getpid())
+        # 第一次调用只记录基准值，之后每次返回与上一次调用之间的使用率
+        psutil.cpu_percent(interval=None)
+        self._process.cpu_percent(interval=None)
+        self._thread = threading.Thread(target=self._run, name="system-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _run(self):
+        # 第一个样本在一个较短的间隔后采集，让 CPU 使用率有意义
+        self._stop.wait(min(1.0, self.interval))
+        while not self._stop.is_set():
+            try:
+                sample = self.sample()
+                with self._lock:
+                    self._samples.append(sample)
+            except Exception as e:
+                logger.warning("采集系统指标失败: {}", e)
+            self._stop.wait(self.interval)
+
+    def sample(self) -> Dict[str, Any]:
+        """采集一次指标（不阻塞，耗时在毫秒级）"""
+        sample = {"timestamp": time.time(), "cpu_percent": psutil.cpu_percent(interval=None)}
+
+        memory = psutil.virtual_memory()
+        sample.update(memory_percent=memory.percent, memory_used=memory.used,
+                      memory_total=memory.total, memory_available=memory.available)
+
+        try:
+            disk = psutil.disk_usage(self.disk_path)
+            sample.update(disk_percent=disk.percent, disk_used=disk.used,
+                          disk_total=disk.total, disk_free=disk.free)
+        except OSError as e:
+            logger.debug("获取磁盘信息失败: {}", e)
+
+        try:
+            net = psutil.net_io_counters()
+            sample.update(bytes_sent=net.bytes_sent, bytes_recv=net.bytes_recv)
+        except Exception as e:
+            logger.debug("获取网络信息失败: {}", e)
+
+        process = self._process or psutil.Process(os.getpid())
+        with process.oneshot():
+            sample.update(process_cpu_percent=process.cpu_percent(interval=None),
+                          process_rss=process.memory_info().rss,
+                          process_threads=process.num_threads())
+        return sample
+
+    def latest(self) -> Dict[str, Any]:
+        """最近一次采样，采样线程未运行时启动它；还没有样本时返回空字典"""
+        if not self.running:
+            self.start()
+        with self._lock:
+            return dict(self._samples[-1]) if self._samples else {}
+
+    def history(self, seconds: Optional[float] = None,
+                fields: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """获取历史样本，按时间升序
+
+        Args:
+            seconds: 只返回最近多少秒的样本，为 None 时返回全部
+            fields: 只返回这些字段（timestamp 总会返回）
+        """
+        with self._lock:
+            samples = list(self._samples)
+        if seconds is not None:
+            since = time.time() - seconds
+            samples = [sample for sample in samples if sample["timestamp"] >= since]
+        if fields:
+            keys = {"timestamp", *fields}
+            samples = [{key: value for key, value in sample.items() if key in keys} for sample in samples]
+        return samples
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._samples)
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "history_size": self.history_size,
+            "samples": size,
+        }
+
+
+# 全局系统指标采样器
+system_metrics = SystemMetricsSampler()
@@ -1,6 +1,6 @@
 import tomllib
 import xml.etree.ElementTree as ET
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import asyncio
 import io
 import html
@@ -10,9 +10,14 @@ from loguru import logger
 
 from WechatAPI import WechatAPIClient
 from WechatAPI.Client.protect import protector
+from WechatAPI.send_scheduler import use_send_lane, LANE_INTERACTIVE
 from database.messsagDB import MessageDB
-from database.contacts_db import update_contact_in_db, get_contact_from_db
+from database.contacts_db import update_contact_in_db
 from utils.event_manager import EventManager
+from utils.contact_cache import contact_cache
+from utils.contact_refresher import ContactRefresher, parse_contact_detail
+from utils.image_downloader import ImageDownloader
+from utils.media import MediaHandle
 
 
 class XYBot:
@@ -73,6 +78,16 @@ class XYBot:
 
         self.msg_db = MessageDB()
 
+        # 图片分段并发下载
+        self.image_downloader = ImageDownloader.from_config(main_config, bot_client)
+
+        # 联系人批量刷新
+        self.contact_refresher = ContactRefresher.from_config(main_config, bot_client)
+
+        # 消息分发队列和同步调度器，由 bot_core 启动后设置
+        self.dispatcher = None
+        self.sync_scheduler = None
+
     def update_profile(self, wxid: str, nickname: str, alias: str, phone: str):
         """更新机器人信息"""
         self.wxid = wxid
@@ -231,213 +246,67 @@ class XYBot:
     async def update_contact_info(self, wxid: str):
         """更新联系人信息
 
+        先查进程内的联系人缓存，缓存和数据库中都没有完整信息时才请求协议服务。
+        同一联系人同时到达的多条消息只会触发一次查询，查询失败后一段时间内不再重试。
+
         Args:
             wxid: 联系人的wxid
         """
         try:
-            # 先检查数据库中是否已有该联系人的信息
-            existing_contact = get_contact_from_db(wxid)
-
-            # 如果数据库中没有该联系人的信息，或者信息不完整，则从 API 获取
-            if not existing_contact or not existing_contact.get('nickname'):
-                # 从 API 获取联系人信息
-                try:
-                    # 如果是群聊，不获取详细信息
-                    if wxid.endswith("@chatroom"):
-                        contact_info = {
-                            'wxid': wxid,
-                            'nickname': wxid,
-                            'type': 'group'
-                        }
-                        # 更新到数据库
-                        update_contact_in_db(contact_info)
-                        logger.debug(f"已在消息处理中更新群聊 {wxid} 的基本信息")
-                    else:
-                        # 获取联系人详细信息
-                        logger.debug(f"开始获取联系人 {wxid} 的详细信息")
-                        try:
-                            detail = await self.bot.get_contract_detail(wxid)
-                            logger.debug(f"获取到联系人 {wxid} 的详细信息: {detail}")
-
-                            if detail:
-                                # 处理返回结果
-                                if isinstance(detail, list) and len(detail) > 0:
-                                    detail_item = detail[0]
-                                    logger.debug(f"联系人 {wxid} 详情项类型: {type(detail_item)}")
-
-                                    if isinstance(detail_item, dict):
-                                        # 记录详细的字段信息，帮助调试
-                                        logger.debug(f"联系人 {wxid} 详情字段: {list(detail_item.keys())}")
-
-                                        # 检查nickname字段的类型和值
-                                        nickname_value = detail_item.get('nickname')
-                                        if nickname_value is None:
-                                            # 尝试其他可能的字段名
-                                            nickname_value = detail_item.get('NickName')
-                                            if nickname_value is None:
-                                                logger.warning(f"联系人 {wxid} 没有找到nickname或NickName字段")
-                                            else:
-                                                logger.debug(f"联系人 {wxid} 使用NickName字段: {nickname_value}")
-                                        else:
-                                            logger.debug(f"联系人 {wxid} 使用nickname字段: {nickname_value}")
-
-                                        # 如果nickname是字典类型，尝试获取其中的string字段
-                                        if isinstance(nickname_value, dict):
-                                            logger.debug(f"联系人 {wxid} 的nickname是字典类型: {nickname_value}")
-                                            nickname_string = nickname_value.get('string')
-                                            if nickname_string:
-                                                nickname_value = nickname_string
-                                                logger.debug(f"从字典中提取nickname.string: {nickname_string}")
-
-                                        # 处理头像字段 - 优先使用BigHeadImgUrl或SmallHeadImgUrl
-                                        avatar_value = detail_item.get('BigHeadImgUrl', '')
-                                        if not avatar_value:
-                                            avatar_value = detail_item.get('SmallHeadImgUrl', '')
-                                        if not avatar_value:
-                                            # 如果没有直接的URL，尝试使用avatar字段
-                                            avatar_value = detail_item.get('avatar', '')
-                                            if isinstance(avatar_value, dict):
-                                                avatar_value = avatar_value.get('string', '')
-
-                                        logger.debug(f"联系人 {wxid} 的头像地址: {avatar_value}")
-
-                                        # 处理备注字段
-                                        remark_value = detail_item.get('remark', '')
-                                        if remark_value is None or not remark_value:
-                                            remark_value = detail_item.get('Remark', '')
-                                        if isinstance(remark_value, dict):
-                                            remark_value = remark_value.get('string', '')
-
-                                        # 处理微信号字段
-                                        alias_value = detail_item.get('alias', '')
-                                        if alias_value is None or not alias_value:
-                                            alias_value = detail_item.get('Alias', '')
-                                        if isinstance(alias_value, dict):
-                                            alias_value = alias_value.get('string', '')
-
-                                        # 构建联系人信息
-                                        contact_info = {
-                                            'wxid': wxid,
-                                            'nickname': nickname_value if nickname_value else wxid,
-                                            'avatar': avatar_value,
-                                            'remark': remark_value,
-                                            'alias': alias_value
-                                        }
-                                        logger.debug(f"解析联系人 {wxid} 详情成功: {contact_info}")
-                                    else:
-                                        logger.warning(f"联系人 {wxid} 详情格式不是字典: {detail_item}")
-                                        # 创建基本联系人信息
-                                        contact_info = {
-                                            'wxid': wxid,
-                                            'nickname': wxid,
-                                            'type': 'friend'
-                                        }
-                                elif isinstance(detail, dict):
-                                    # 记录详细的字段信息，帮助调试
-                                    logger.debug(f"联系人 {wxid} 详情字段(字典格式): {list(detail.keys())}")
-
-                                    # 检查nickname字段的类型和值
-                                    nickname_value = detail.get('nickname')
-                                    if nickname_value is None:
-                                        # 尝试其他可能的字段名
-                                        nickname_value = detail.get('NickName')
-                                        if nickname_value is None:
-                                            logger.warning(f"联系人 {wxid} 没有找到nickname或NickName字段")
-                                        else:
-                                            logger.debug(f"联系人 {wxid} 使用NickName字段: {nickname_value}")
-                                    else:
-                                        logger.debug(f"联系人 {wxid} 使用nickname字段: {nickname_value}")
-
-                                    # 如果nickname是字典类型，尝试获取其中的string字段
-                                    if isinstance(nickname_value, dict):
-                                        logger.debug(f"联系人 {wxid} 的nickname是字典类型: {nickname_value}")
-                                        nickname_string = nickname_value.get('string')
-                                        if nickname_string:
-                                            nickname_value = nickname_string
-                                            logger.debug(f"从字典中提取nickname.string: {nickname_string}")
-
-                                    # 处理头像字段 - 优先使用BigHeadImgUrl或SmallHeadImgUrl
-                                    avatar_value = detail.get('BigHeadImgUrl', '')
-                                    if not avatar_value:
-                                        avatar_value = detail.get('SmallHeadImgUrl', '')
-                                    if not avatar_value:
-                                        # 如果没有直接的URL，尝试使用avatar字段
-                                        avatar_value = detail.get('avatar', '')
-                                        if isinstance(avatar_value, dict):
-                                            avatar_value = avatar_value.get('string', '')
-
-                                    logger.debug(f"联系人 {wxid} 的头像地址(字典格式): {avatar_value}")
-
-                                    # 处理备注字段
-                                    remark_value = detail.get('remark', '')
-                                    if remark_value is None or not remark_value:
-                                        remark_value = detail.get('Remark', '')
-                                    if isinstance(remark_value, dict):
-                                        remark_value = remark_value.get('string', '')
-
-                                    # 处理微信号字段
-                                    alias_value = detail.get('alias', '')
-                                    if alias_value is None or not alias_value:
-                                        alias_value = detail.get('Alias', '')
-                                    if isinstance(alias_value, dict):
-                                        alias_value = alias_value.get('string', '')
-
-                                    # 构建联系人信息
-                                    contact_info = {
-                                        'wxid': wxid,
-                                        'nickname': nickname_value if nickname_value else wxid,
-                                        'avatar': avatar_value,
-                                        'remark': remark_value,
-                                        'alias': alias_value
-                                    }
-                                    logger.debug(f"解析联系人 {wxid} 详情成功(字典格式): {contact_info}")
-                                else:
-                                    logger.warning(f"联系人 {wxid} 详情格式不支持: {type(detail)}")
-                                    # 创建基本联系人信息
-                                    contact_info = {
-                                        'wxid': wxid,
-                                        'nickname': wxid,
-                                        'type': 'friend'
-                                    }
-                            else:
-                                logger.warning(f"无法获取联系人 {wxid} 的详细信息，API返回空数据")
-                                # 创建基本联系人信息
-                                contact_info = {
-                                    'wxid': wxid,
-                                    'nickname': wxid,
-                                    'type': 'friend'
-                                }
-
-                            # 更新到数据库
-                            update_contact_in_db(contact_info)
-                            logger.debug(f"已在消息处理中更新联系人 {wxid} 的信息")
-                        except Exception as e:
-                            logger.error(f"调用API获取联系人 {wxid} 详情失败: {str(e)}")
-                            # 创建基本联系人信息
-                            contact_info = {
-                                'wxid': wxid,
-                                'nickname': wxid,
-                                'type': 'friend'
-                            }
-                            # 仍然更新到数据库，确保至少有基本信息
-                            update_contact_in_db(contact_info)
-                            logger.debug(f"已在消息处理中更新联系人 {wxid} 的基本信息")
-                except Exception as e:
-                    logger.error(f"在消息处理中获取联系人 {wxid} 信息失败: {str(e)}")
-                    # 创建基本联系人信息并保存
-                    contact_info = {
-                        'wxid': wxid,
-                        'nickname': wxid,
-                        'type': 'friend' if not wxid.endswith("@chatroom") else 'group'
-                    }
-                    update_contact_in_db(contact_info)
-                    logger.debug(f"已在消息处理中更新联系人 {wxid} 的基本信息(异常处理)")
+            await contact_cache.get(wxid, loader=self._fetch_contact_info)
         except Exception as e:
             logger.error(f"更新联系人信息时发生异常: {str(e)}")
 
+    async def _fetch_contact_info(self, wxid: str) -> Optional[dict]:
+        """从协议服务获取联系人信息并写入数据库，获取失败时返回 None"""
+        # 如果是群聊，不获取详细信息
+        if wxid.endswith("@chatroom"):
+            contact_info = {
+                'wxid': wxid,
+                'nickname': wxid,
+                'type': 'group'
+            }
+            await asyncio.to_thread(update_contact_in_db, contact_info)
+            logger.debug(f"已在消息处理中更新群聊 {wxid} 的基本信息")
+            return contact_info
+
+        contact_info = None
+        logger.debug(f"开始获取联系人 {wxid} 的详细信息")
+        try:
+            detail = await self.bot.get_contract_detail(wxid)
+            logger.debug(f"获取到联系人 {wxid} 的详细信息: {detail}")
+
+            if isinstance(detail, list) and len(detail) > 0:
+                detail = detail[0]
+            if isinstance(detail, dict):
+                contact_info = parse_contact_detail(detail, wxid)
+            else:
+                logger.warning(f"无法获取联系人 {wxid} 的详细信息，API返回: {detail}")
+        except Exception as e:
+            logger.error(f"调用API获取联系人 {wxid} 详情失败: {str(e)}")
+
+        if contact_info is None:
+            # 仍然更新到数据库，确保至少有基本信息
+            await asyncio.to_thread(update_contact_in_db, {
+                'wxid': wxid,
+                'nickname': wxid,
+                'type': 'friend'
+            })
+            logger.debug(f"已在消息处理中更新联系人 {wxid} 的基本信息")
+            return None
+
+        await asyncio.to_thread(update_contact_in_db, contact_info)
+        logger.debug(f"已在消息处理中更新联系人 {wxid} 的信息")
+        return contact_info
+
     async def process_message(self, message: Dict[str, Any]):
         """处理接收到的消息"""
+        # 处理消息过程中发送的都是交互回复，优先于插件推送和批量发送；
+        # 处理完后恢复，分发协程之后创建的任务不会继承交互通道
+        with use_send_lane(LANE_INTERACTIVE):
+            await self._process_message(message)
 
+    async def _process_message(self, message: Dict[str, Any]):
         msg_type = message.get("MsgType")
 
         # 预处理消息
@@ -620,77 +489,61 @@ class XYBot:
             logger.error("解析图片消息失败: {}, 内容: {}", e, message["Content"])
             return
 
+        if not self.ignore_check(message["FromWxid"], message["SenderWxid"]):
+            return
+        if not self.ignore_protection and protector.check(14400):
+            logger.warning("风控保护: 新设备登录后4小时内请挂机")
+            return
+
+        msg_id, from_wxid = message.get('MsgId'), message["FromWxid"]
+
+        async def load_image():
+            return await self._download_image(msg_id, from_wxid, aeskey, cdnmidimgurl, length)
+
+        # 图片在有处理函数需要时才下载
+        await EventManager.emit("image_message", self.bot, message, media=MediaHandle("image", load_image))
+
+    async def _download_image(self, msg_id, from_wxid: str, aeskey: str, cdnmidimgurl: str, length: str):
+        """下载图片，返回图片字节或 base64 字符串，失败返回 None"""
         # 尝试使用新的get_msg_image方法分段下载图片
         try:
             if length and length.isdigit():
                 img_length = int(length)
-                logger.debug(f"尝试使用get_msg_image下载图片: MsgId={message.get('MsgId')}, length={img_length}")
-
-                # 分段下载图片
-                chunk_size = 64 * 1024  # 64KB
-                chunks = (img_length + chunk_size - 1) // chunk_size  # 向上取整
-                full_image_data = bytearray()
-
-                logger.info(f"开始分段下载图片，总大小: {img_length} 字节，分 {chunks} 段下载")
+                logger.debug(f"尝试使用get_msg_image下载图片: MsgId={msg_id}, length={img_length}")
 
-                download_success = True
-                for i in range(chunks):
-                    try:
-                        # 下载当前段
-                        start_pos = i * chunk_size
-                        chunk_data = await self.bot.get_msg_image(message.get('MsgId'), message["FromWxid"], img_length, start_pos=start_pos)
-                        if chunk_data and len(chunk_data) > 0:
-                            full_image_data.extend(chunk_data)
-                            logger.debug(f"第 {i+1}/{chunks} 段下载成功，大小: {len(chunk_data)} 字节")
-                        else:
-                            logger.error(f"第 {i+1}/{chunks} 段下载失败，数据为空")
-                            download_success = False
-                            break
-                    except Exception as e:
-                        logger.error(f"下载第 {i+1}/{chunks} 段时出错: {e}")
-                        download_success = False
-                        break
+                # 分段并发下载图片
+                full_image_data, elapsed = await self.image_downloader.download(msg_id, from_wxid, img_length)
+                logger.info(f"分段下载图片耗时 {elapsed * 1000:.0f} 毫秒，总大小: {img_length} 字节")
 
-                if download_success and len(full_image_data) > 0:
+                if full_image_data:
                     # 验证图片数据
                     try:
-                        import base64
                         from PIL import Image, ImageFile
                         ImageFile.LOAD_TRUNCATED_IMAGES = True  # 允许加载截断的图片
 
-                        image_data = bytes(full_image_data)
-                        # 验证图片数据
-                        Image.open(io.BytesIO(image_data))
-                        message["Content"] = base64.b64encode(image_data).decode('utf-8')
-                        logger.info(f"分段下载图片成功，总大小: {len(image_data)} 字节")
+                        Image.open(io.BytesIO(full_image_data))
+                        logger.info(f"分段下载图片成功，总大小: {len(full_image_data)} 字节")
+                        return full_image_data
                     except Exception as img_error:
                         logger.error(f"验证分段下载的图片数据失败: {img_error}")
-                        # 如果验证失败，尝试使用download_image
-                        if aeskey and cdnmidimgurl:
-                            logger.warning("尝试使用download_image下载图片")
-                            message["Content"] = await self.bot.download_image(aeskey, cdnmidimgurl)
                 else:
-                    logger.warning(f"分段下载图片失败，已下载: {len(full_image_data)}/{img_length} 字节")
-                    # 如果分段下载失败，尝试使用download_image
-                    if aeskey and cdnmidimgurl:
-                        logger.warning("尝试使用download_image下载图片")
-                        message["Content"] = await self.bot.download_image(aeskey, cdnmidimgurl)
+                    logger.warning(f"分段下载图片失败，图片大小: {img_length} 字节")
+
+                # 如果分段下载失败，尝试使用download_image
+                if aeskey and cdnmidimgurl:
+                    logger.warning("尝试使用download_image下载图片")
+                    return await self.bot.download_image(aeskey, cdnmidimgurl)
             elif aeskey and cdnmidimgurl:
                 logger.debug("使用download_image下载图片")
-                message["Content"] = await self.bot.download_image(aeskey, cdnmidimgurl)
+                return await self.bot.download_image(aeskey, cdnmidimgurl)
         except Exception as e:
             logger.error(f"下载图片失败: {e}")
             if aeskey and cdnmidimgurl:
                 try:
-                    message["Content"] = await self.bot.download_image(aeskey, cdnmidimgurl)
+                    return await self.bot.download_image(aeskey, cdnmidimgurl)
                 except Exception as e2:
                     logger.error(f"备用方法下载图片也失败: {e2}")
-
-        if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-            if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("image_message", self.bot, message)
-            else:
-                logger.warning("风控保护: 新设备登录后4小时内请挂机")
+        return None
 
     async def process_voice_message(self, message: Dict[str, Any]):
         """处理语音消息"""
@@ -727,8 +580,8 @@ class XYBot:
             is_group=message["IsGroup"]
         )
 
+        voiceurl, length, silk_base64 = None, None, None
         if message["IsGroup"] or not message.get("ImgBuf", {}).get("buffer", ""):
-            voiceurl, length = None, None
             try:
                 root = ET.fromstring(message["Content"])
                 voicemsg_element = root.find('voicemsg')
@@ -738,19 +591,29 @@ class XYBot:
             except Exception as e:
                 logger.error("解析语音消息失败: {}, 内容: {}", e, message["Content"])
                 return
-
-            if voiceurl and length:
-                silk_base64 = await self.bot.download_voice(message["MsgId"], voiceurl, length)
-                message["Content"] = await self.bot.silk_base64_to_wav_byte(silk_base64)
         else:
             silk_base64 = message.get("ImgBuf", {}).get("buffer", "")
-            message["Content"] = await self.bot.silk_base64_to_wav_byte(silk_base64)
 
-        if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-            if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("voice_message", self.bot, message)
-            else:
-                logger.warning("风控保护: 新设备登录后4小时内请挂机")
+        if not self.ignore_check(message["FromWxid"], message["SenderWxid"]):
+            return
+        if not self.ignore_protection and protector.check(14400):
+            logger.warning("风控保护: 新设备登录后4小时内请挂机")
+            return
+
+        msg_id = message["MsgId"]
+
+        async def load_voice():
+            # 下载并转换为 wav 字节
+            silk = silk_base64
+            if silk is None:
+                if not (voiceurl and length):
+                    return None
+                silk = await self.bot.download_voice(msg_id, voiceurl, length)
+            return await self.bot.silk_base64_to_wav_byte(silk)
+
+        # 语音在有处理函数需要时才下载和转换，旧插件读取的 Content 为 wav 字节
+        await EventManager.emit("voice_message", self.bot, message,
+                                media=MediaHandle("voice", load_voice, legacy_base64=False))
 
     async def process_emoji_message(self, message: Dict[str, Any]):
         """处理表情消息"""
@@ -1011,13 +874,20 @@ class XYBot:
             is_group=message["IsGroup"]
         )
 
-        message["Video"] = await self.bot.download_video(message.get("MsgId", 0))
+        if not self.ignore_check(message["FromWxid"], message["SenderWxid"]):
+            return
+        if not self.ignore_protection and protector.check(14400):
+            logger.warning("风控保护: 新设备登录后4小时内请挂机")
+            return
 
-        if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-            if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("video_message", self.bot, message)
-            else:
-                logger.warning("风控保护: 新设备登录后4小时内请挂机")
+        msg_id = message.get("MsgId", 0)
+
+        async def load_video():
+            return await self.bot.download_video(msg_id)
+
+        # 视频在有处理函数需要时才下载，旧插件读取的字段为 Video
+        await EventManager.emit("video_message", self.bot, message,
+                                media=MediaHandle("video", load_video, field="Video"))
 
     async def process_file_message(self, message: Dict[str, Any]):
         """处理文件消息"""
@@ -1046,13 +916,18 @@ class XYBot:
             is_group=message["IsGroup"]
         )
 
-        message["File"] = await self.bot.download_attach(attach_id)
+        if not self.ignore_check(message["FromWxid"], message["SenderWxid"]):
+            return
+        if not self.ignore_protection and protector.check(14400):
+            logger.warning("风控保护: 新设备登录后4小时内请挂机")
+            return
 
-        if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-            if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("file_message", self.bot, message)
-            else:
-                logger.warning("风控保护: 新设备登录后4小时内请挂机")
+        async def load_file():
+            return await self.bot.download_attach(attach_id)
+
+        # 文件在有处理函数需要时才下载，旧插件读取的字段为 File
+        await EventManager.emit("file_message", self.bot, message,
+                                media=MediaHandle("file", load_file, field="File"))
 
     async def process_system_message(self, message: Dict[str, Any]):
         """处理系统消息"""